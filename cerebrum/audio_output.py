@@ -0,0 +1,134 @@
+# cerebrum/audio_output.py
+# Speech output subsystem: the pygame mixer is initialized once and clips are played straight from
+# memory. A player thread feeds clips into the channel's queue slot, so consecutive clips play back to
+# back without a gap. play() returns a handle that can be waited on or cancelled (barge-in).
+
+import io
+import threading
+from collections import deque
+
+import pygame
+
+
+class PlaybackHandle:
+    def __init__(self, output, sound):
+        self.output = output
+        self.sound = sound
+        self.cancelled = False
+        self.done_event = threading.Event()
+
+    @property
+    def done(self):
+        return self.done_event.is_set()
+
+    def wait(self, timeout=None):
+        # True once the clip finished playing (or was cancelled)
+        return self.done_event.wait(timeout)
+
+    def cancel(self):
+        self.output.cancel(self)
+
+
+class AudioOutput:
+    shared_instance = None
+    shared_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        # One mixer and one player thread per process, however many lobes speak
+        with cls.shared_lock:
+            if cls.shared_instance is None:
+                cls.shared_instance = cls()
+            return cls.shared_instance
+
+    def __init__(self, poll_interval=0.005):
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+        self.channel = pygame.mixer.Channel(0)
+        pygame.mixer.set_reserved(1)  # keep channel 0 for speech
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.pending = deque()
+        self.active = []
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def play(self, audio):
+        # audio: encoded clip bytes (MP3/WAV/OGG); decoded from memory, no temporary files
+        sound = pygame.mixer.Sound(file=io.BytesIO(audio))
+        handle = PlaybackHandle(self, sound)
+        with self.lock:
+            self.pending.append(handle)
+        self.wakeup.set()
+        return handle
+
+    def run(self):
+        while not self.stop_event.is_set():
+            with self.lock:
+                # Hand the next clip over as soon as the channel's queue slot is free, so it starts
+                # the moment the current one ends
+                if self.pending and self.channel.get_queue() is None:
+                    handle = self.pending.popleft()
+                    if self.channel.get_busy():
+                        self.channel.queue(handle.sound)
+                    else:
+                        self.channel.play(handle.sound)
+                    self.active.append(handle)
+
+                current = self.channel.get_sound()
+                queued = self.channel.get_queue()
+                for handle in list(self.active):
+                    if handle.sound is current and handle.cancelled:
+                        # Cancelled while it was waiting in the queue slot
+                        self.stop_current()
+                    elif handle.sound is not current and handle.sound is not queued:
+                        self.active.remove(handle)
+                        handle.done_event.set()
+
+            self.wakeup.wait(self.poll_interval)
+            self.wakeup.clear()
+
+    def cancel(self, handle):
+        with self.lock:
+            handle.cancelled = True
+            if handle in self.pending:
+                self.pending.remove(handle)
+                handle.done_event.set()
+            elif self.channel.get_sound() is handle.sound:
+                self.stop_current()
+        self.wakeup.set()
+
+    def stop_current(self):
+        # Stop the clip that is playing and start the queued one (if any) right away; depending on
+        # the SDL_mixer version stop() either starts or drops the queued clip, so restart it ourselves
+        queued = self.channel.get_queue()
+        self.channel.stop()
+        if queued is not None and not self.channel.get_busy():
+            self.channel.play(queued)
+
+    def stop_all(self):
+        # Barge-in: drop everything that is playing, queued or pending
+        with self.lock:
+            for handle in self.pending:
+                handle.cancelled = True
+                handle.done_event.set()
+            self.pending.clear()
+            for handle in self.active:
+                handle.cancelled = True
+            # A second stop covers mixers that start the queued clip when the current one is halted
+            self.channel.stop()
+            self.channel.stop()
+        self.wakeup.set()
+
+    @property
+    def busy(self):
+        with self.lock:
+            return bool(self.pending or self.active)
+
+    def close(self):
+        self.stop_all()
+        self.stop_event.set()
+        self.wakeup.set()
+        self.thread.join(timeout=1)
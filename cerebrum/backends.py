@@ -0,0 +1,246 @@
+# cerebrum/backends.py
+# Pluggable backends for the hear -> think -> speak loop. Each kind has one small interface:
+#   TTS           synthesize(text) -> encoded audio bytes, cache_params() -> JSON-serializable voice description
+#   LLM           complete(prompt, use_cache=True, messages=None) -> str, stream(...) -> text fragments, report()
+#   STT           start_utterance(sample_rate, on_partial) -> session with feed(chunk) and finish() -> str
+#   audio output  play(audio) -> handle with wait() / cancel() / done, stop_all(), busy, close()
+# Google Cloud, OpenAI (cerebrum/llm_client.py) and the pygame mixer (cerebrum/audio_output.py) are the
+# real backends. The Fake* and Simulated* ones run locally with configurable latency and jitter, so the
+# loop can be run and profiled without network services or a sound card.
+
+import io
+import os
+import random
+import threading
+import time
+import wave
+from collections import deque
+
+import numpy as np
+
+from cerebrum.speech_pipeline import OfflineRecognizer, OfflineSession
+
+
+class SimulatedLatency:
+    # A delay of `latency` seconds with normally distributed jitter (standard deviation `jitter`), never negative
+    def __init__(self, latency=0.0, jitter=0.0, rng=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = rng or random.Random()
+
+    def sample(self):
+        if not self.jitter:
+            return self.latency
+        return max(0.0, self.rng.gauss(self.latency, self.jitter))
+
+    def wait(self):
+        delay = self.sample()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+class GoogleTTS:
+    # Google Cloud Text-to-Speech; the client is created once and reused
+    def __init__(self, service_account_file, language_code="en-US"):
+        from google.cloud import texttospeech
+        from google.oauth2 import service_account
+
+        self.texttospeech = texttospeech
+        credentials = service_account.Credentials.from_service_account_file(service_account_file)
+        self.client = texttospeech.TextToSpeechClient(credentials=credentials)
+        self.voice = texttospeech.VoiceSelectionParams(
+            language_code=language_code,
+            ssml_gender=texttospeech.SsmlVoiceGender.NEUTRAL
+        )
+        self.audio_config = texttospeech.AudioConfig(
+            audio_encoding=texttospeech.AudioEncoding.MP3
+        )
+
+    def synthesize(self, text):
+        input_text = self.texttospeech.SynthesisInput(text=text)
+        response = self.client.synthesize_speech(
+            input=input_text, voice=self.voice, audio_config=self.audio_config
+        )
+        return response.audio_content
+
+    def cache_params(self):
+        return (type(self.voice).to_dict(self.voice), type(self.audio_config).to_dict(self.audio_config))
+
+
+def wav_bytes(duration_s, sample_rate=16000, frequency=220.0, amplitude=0.1):
+    # Mono 16-bit WAV with a quiet tone, so simulated speech is audible when played for real
+    t = np.arange(int(duration_s * sample_rate)) / sample_rate
+    samples = (amplitude * 32767 * np.sin(2 * np.pi * frequency * t)).astype(np.int16)
+    out = io.BytesIO()
+    with wave.open(out, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+    return out.getvalue()
+
+
+class FakeTTS:
+    # Returns a WAV clip as long as the text would take to say, after a simulated synthesis delay
+    def __init__(self, latency=0.15, jitter=0.05, per_char=0.0005, words_per_second=2.5, sample_rate=16000, seed=None):
+        self.delay = SimulatedLatency(latency, jitter, random.Random(seed))
+        self.per_char = per_char
+        self.words_per_second = words_per_second
+        self.sample_rate = sample_rate
+        self.calls = 0
+
+    def synthesize(self, text):
+        self.calls += 1
+        self.delay.wait()
+        if self.per_char:
+            time.sleep(self.per_char * len(text))
+        duration = max(0.2, len(text.split()) / self.words_per_second)
+        return wav_bytes(duration, sample_rate=self.sample_rate)
+
+    def cache_params(self):
+        return ({'backend': 'fake', 'words_per_second': self.words_per_second, 'sample_rate': self.sample_rate},)
+
+
+class FakeLLM:
+    # Streams a canned multi-sentence reply word by word: first_token_latency before the first fragment,
+    # token_latency between fragments. replies (optional) are used in turn instead of the canned text.
+    def __init__(self, replies=None, first_token_latency=0.4, token_latency=0.03, jitter=0.1, token_jitter=0.01,
+                 sentences=3, seed=None):
+        rng = random.Random(seed)
+        self.first_token = SimulatedLatency(first_token_latency, jitter, rng)
+        self.per_token = SimulatedLatency(token_latency, token_jitter, rng)
+        self.replies = deque(replies or [])
+        self.sentences = sentences
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def reply_for(self, prompt):
+        with self.lock:
+            self.requests += 1
+            if self.replies:
+                reply = self.replies.popleft()
+                self.replies.append(reply)
+                return reply
+        parts = [f"You said {prompt.strip().rstrip('.?!')}."]
+        parts += [f"This is sentence number {i + 2} of a simulated reply." for i in range(self.sentences - 1)]
+        return " ".join(parts)
+
+    def stream(self, prompt, use_cache=True, messages=None):
+        words = self.reply_for(prompt).split(" ")
+        self.first_token.wait()
+        for i, word in enumerate(words):
+            if i:
+                self.per_token.wait()
+            yield word if i == len(words) - 1 else word + " "
+
+    def complete(self, prompt, use_cache=True, messages=None):
+        return "".join(self.stream(prompt, use_cache=use_cache, messages=messages))
+
+    def report(self):
+        return {'requests': self.requests, 'cache_hits': 0, 'coalesced': 0, 'api_calls': self.requests, 'hit_rate': 0.0}
+
+
+class FakeRecognizer(OfflineRecognizer):
+    # OfflineRecognizer plus a simulated delay between the end of an utterance and its final transcript
+    def __init__(self, transcripts=None, partial_ms=300, latency=0.2, jitter=0.05, seed=None):
+        super().__init__(transcripts, partial_ms)
+        self.delay = SimulatedLatency(latency, jitter, random.Random(seed))
+
+    def start_utterance(self, sample_rate, on_partial=None):
+        final = self.transcripts.popleft() if self.transcripts else None
+        return FakeSession(sample_rate, on_partial, final, self.partial_ms, self.delay)
+
+
+class FakeSession(OfflineSession):
+    def __init__(self, sample_rate, on_partial, final, partial_ms, delay):
+        super().__init__(sample_rate, on_partial, final, partial_ms)
+        self.delay = delay
+
+    def finish(self):
+        self.delay.wait()
+        return super().finish()
+
+
+class SimulatedPlayback:
+    def __init__(self, duration):
+        self.duration = duration
+        self.cancelled = False
+        self.done_event = threading.Event()
+
+    @property
+    def done(self):
+        return self.done_event.is_set()
+
+    def wait(self, timeout=None):
+        return self.done_event.wait(timeout)
+
+    def cancel(self):
+        self.cancelled = True
+        self.done_event.set()
+
+
+class SimulatedAudioOutput:
+    # Plays nothing: each clip occupies the output for its duration, one after another like the mixer
+    # channel. WAV clips use their real length; other formats are estimated from bytes_per_second.
+    def __init__(self, bytes_per_second=4000):
+        self.bytes_per_second = bytes_per_second
+        self.lock = threading.Lock()
+        self.pending = deque()
+        self.current = None
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def duration(self, audio):
+        try:
+            with wave.open(io.BytesIO(audio), 'rb') as wav:
+                return wav.getnframes() / wav.getframerate()
+        except (wave.Error, EOFError):
+            return len(audio) / self.bytes_per_second
+
+    def play(self, audio):
+        handle = SimulatedPlayback(self.duration(audio))
+        with self.lock:
+            self.pending.append(handle)
+        self.wakeup.set()
+        return handle
+
+    def run(self):
+        while not self.stop_event.is_set():
+            with self.lock:
+                handle = self.pending.popleft() if self.pending else None
+                self.current = handle
+            if handle is None:
+                self.wakeup.wait(0.05)
+                self.wakeup.clear()
+                continue
+            # Waiting on the handle lets a cancel end the clip early
+            handle.done_event.wait(handle.duration)
+            handle.done_event.set()
+            with self.lock:
+                self.current = None
+
+    def stop_all(self):
+        with self.lock:
+            handles = list(self.pending) + ([self.current] if self.current else [])
+            self.pending.clear()
+        for handle in handles:
+            handle.cancel()
+
+    @property
+    def busy(self):
+        with self.lock:
+            return bool(self.pending or self.current)
+
+    def close(self):
+        self.stop_all()
+        self.stop_event.set()
+        self.wakeup.set()
+        self.thread.join(timeout=1)
+
+
+def default_tts():
+    service_account_file = os.path.join(os.path.dirname(__file__), 'graym-426618-3e2d718be5f8.json')
+    return GoogleTTS(service_account_file)
@@ -0,0 +1,70 @@
+# benchmark_postprocess.py
+# Micro-benchmark for detection post-processing: the old per-box path (box.xyxy[0], box.conf[0].item(),
+# box.cls[0] for every box) against the array-based Detections path used by OccipitalLobe.draw_results.
+import time
+
+import cv2
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+from occipital_lobe import Detections, class_label, draw_detections
+
+NAMES = {i: f"class_{i}" for i in range(80)}
+
+
+def make_results(num_boxes, height=480, width=640, seed=0):
+    rng = np.random.default_rng(seed)
+    x1 = rng.uniform(0, width - 50, num_boxes)
+    y1 = rng.uniform(0, height - 50, num_boxes)
+    data = np.stack([x1, y1, x1 + rng.uniform(10, 50, num_boxes), y1 + rng.uniform(10, 50, num_boxes),
+                     rng.uniform(0.1, 1.0, num_boxes), rng.integers(0, len(NAMES), num_boxes)], axis=1)
+    img = np.zeros((height, width, 3), dtype=np.uint8)
+    return [Results(orig_img=img, path='', names=NAMES, boxes=torch.from_numpy(data).float())]
+
+
+def per_box(img, results, draw, identities):
+    # The previous draw_results body plus the separate per-box identity check
+    for r in results:
+        for box in r.boxes:
+            x1, y1, x2, y2 = box.xyxy[0]
+            x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+            confidence = box.conf[0].item()
+            cls = int(box.cls[0])
+            label = f"{class_label(NAMES, cls)} {confidence:.2f}"
+            if draw:
+                cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                cv2.putText(img, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+    return any(NAMES[int(box.cls[0])] in identities for box in results[0].boxes)
+
+
+def vectorized(img, results, draw, identities):
+    detections = Detections.from_results(results, NAMES)
+    labels = detections.labels()
+    if draw:
+        draw_detections(img, detections, (0, 255, 0), labels)
+    return bool(detections.present(identities))
+
+
+def time_it(fn, results, draw, repeats):
+    img = results[0].orig_img.copy()
+    identities = {'class_0'}
+    fn(img, results, draw, identities)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(img, results, draw, identities)
+    return 1000 * (time.perf_counter() - start) / repeats
+
+
+def run_benchmark(box_counts=(10, 100, 300, 1000), repeats=50):
+    print(f"{'boxes':>6} {'draw':>5} {'per-box ms':>11} {'arrays ms':>10} {'speed-up':>9}")
+    for num_boxes in box_counts:
+        results = make_results(num_boxes)
+        for draw in (False, True):
+            old = time_it(per_box, results, draw, repeats)
+            new = time_it(vectorized, results, draw, repeats)
+            print(f"{num_boxes:>6} {str(draw):>5} {old:>11.2f} {new:>10.2f} {old / new:>8.1f}x")
+
+
+if __name__ == "__main__":
+    run_benchmark()
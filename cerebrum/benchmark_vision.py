@@ -0,0 +1,195 @@
+# benchmark_vision.py
+# Throughput benchmark for the OccipitalLobe vision path without a webcam or a window.
+# Frames come from a synthetic generator or a video file and go through the same engine, post-processing
+# and drawing code as the live loop. Reports FPS, p50/p95/p99 latency per stage (decode, preprocess, each
+# model, post-process, draw) and peak RSS, and writes everything to JSON so runs can be diffed across commits.
+#
+# Usage:
+#   python benchmark_vision.py --frames 200 --output bench.json
+#   python benchmark_vision.py --video recording.mp4 --backend onnx --output bench_onnx.json
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from occipital_lobe import LazyModel, MultiModelEngine, Detections, MODEL_COLORS, draw_detections
+
+
+class SyntheticFrameSource:
+    # Pre-renders frames with moving shapes and keeps them JPEG-encoded, so "decode" is a real imdecode
+    def __init__(self, num_frames=200, width=640, height=480, seed=0):
+        rng = np.random.default_rng(seed)
+        background = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+        self.encoded = []
+        for i in range(num_frames):
+            img = background.copy()
+            x = (i * 7) % (width - 120)
+            y = (i * 3) % (height - 160)
+            cv2.rectangle(img, (x, y), (x + 120, y + 160), (40, 160, 220), -1)
+            cv2.circle(img, (width - x - 40, height - y - 40), 35, (200, 60, 60), -1)
+            self.encoded.append(cv2.imencode('.jpg', img)[1])
+        self.name = f"synthetic:{num_frames}x{width}x{height}"
+
+    def frames(self):
+        for buffer in self.encoded:
+            yield cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+class VideoFrameSource:
+    def __init__(self, path, max_frames=None):
+        self.path = path
+        self.max_frames = max_frames
+        self.name = f"video:{os.path.basename(path)}"
+
+    def frames(self):
+        cap = cv2.VideoCapture(self.path)
+        count = 0
+        while self.max_frames is None or count < self.max_frames:
+            success, img = cap.read()
+            if not success:
+                break
+            count += 1
+            yield img
+        cap.release()
+
+
+def percentiles(samples):
+    if not samples:
+        return None
+    values = np.asarray(samples) * 1000
+    return {
+        'count': len(values),
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+        'max_ms': round(float(values.max()), 3),
+    }
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_engine(model_configs, backend, imgsz, concurrent):
+    engine = MultiModelEngine(imgsz=imgsz, concurrent=concurrent)
+    for name, weights, conf in model_configs:
+        engine.add_model(name, LazyModel(weights, backend=backend, imgsz=imgsz, label=name), conf=conf)
+    return engine
+
+
+def run_benchmark(source, engine, warmup=5, draw=True):
+    stages = {}
+    start = None
+    frames = 0
+
+    frame_iter = source.frames()
+    while True:
+        t0 = time.perf_counter()
+        img = next(frame_iter, None)
+        decode = time.perf_counter() - t0
+        if img is None:
+            break
+
+        results = engine.infer(img)
+
+        t1 = time.perf_counter()
+        detections = {name: Detections.from_results(r) for name, r in results.items()}
+        labels = {name: d.labels() for name, d in detections.items()}
+        postprocess = time.perf_counter() - t1
+
+        t2 = time.perf_counter()
+        if draw:
+            for name, d in detections.items():
+                draw_detections(img, d, MODEL_COLORS.get(name, (0, 255, 255)), labels[name])
+        draw_time = time.perf_counter() - t2
+
+        frames += 1
+        if frames <= warmup:
+            # Lazy model loading and first-call allocations are not part of steady-state throughput
+            if frames == warmup:
+                start = time.perf_counter()
+            continue
+
+        sample = {'decode': decode, 'postprocess': postprocess, 'draw': draw_time}
+        sample.update(engine.last_timings)
+        for stage, value in sample.items():
+            stages.setdefault(stage, []).append(value)
+
+    measured = frames - warmup
+    elapsed = time.perf_counter() - start if start is not None else 0.0
+    return {
+        'frames_measured': max(measured, 0),
+        'fps': round(measured / elapsed, 2) if measured > 0 and elapsed > 0 else None,
+        'stages': {stage: percentiles(values) for stage, values in stages.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the OccipitalLobe vision pipeline")
+    parser.add_argument('--video', help="video file to replay (default: synthetic frames)")
+    parser.add_argument('--frames', type=int, default=200, help="number of frames to run")
+    parser.add_argument('--warmup', type=int, default=5, help="frames excluded from the statistics")
+    parser.add_argument('--pretrained', default='yolov8n.pt', help="pre-trained weights")
+    parser.add_argument('--custom', default='runs/detect/custom_petr_model/weights/best.pt', help="custom weights (skipped if missing)")
+    parser.add_argument('--backend', default='torch', choices=['torch', 'onnx', 'openvino', 'torchscript'])
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--sequential', action='store_true', help="run the models one after another")
+    parser.add_argument('--no-draw', action='store_true', help="skip the drawing stage")
+    parser.add_argument('--output', help="write results to this JSON file")
+    args = parser.parse_args()
+
+    model_configs = []
+    if args.custom and os.path.exists(args.custom):
+        model_configs.append(('custom', args.custom, 0.1))
+    model_configs.append(('pretrained', args.pretrained, 0.25))
+
+    if args.video:
+        source = VideoFrameSource(args.video, max_frames=args.frames)
+    else:
+        source = SyntheticFrameSource(num_frames=args.frames)
+    engine = build_engine(model_configs, args.backend, args.imgsz, concurrent=not args.sequential)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+        'config': {'source': source.name, 'backend': args.backend, 'imgsz': args.imgsz, 'models': [c[0] for c in model_configs],
+                   'concurrent': not args.sequential, 'draw': not args.no_draw, 'warmup': args.warmup},
+    }
+    report.update(run_benchmark(source, engine, warmup=args.warmup, draw=not args.no_draw))
+    report['startup_s'] = {name: round(spec.model.load_time, 3) for name, spec in engine.models.items()
+                           if spec.model.load_time is not None}
+    report['peak_rss_mb'] = peak_rss_mb()
+    engine.close()
+
+    print(f"{report['config']['source']} on {args.backend}: {report['fps']} FPS, peak RSS {report['peak_rss_mb']} MB")
+    for stage, stats in report['stages'].items():
+        if stats:
+            print(f"  {stage:<18} p50 {stats['p50_ms']:>8.2f} ms  p95 {stats['p95_ms']:>8.2f} ms  p99 {stats['p99_ms']:>8.2f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+# benchmark_voice_loop.py
+# End-to-end latency harness for the hear -> think -> speak loop. Recorded WAV prompts are replayed one
+# turn at a time through the Thalamus (speech pipeline -> event bus -> LLM -> sentence TTS -> playback),
+# and every turn is split into stages: VAD endpointing, final transcript, relay, first token, first audio
+# and total. By default every backend is a local stand-in with configurable latency and jitter
+# (cerebrum/backends.py), so runs are reproducible offline and can be diffed across commits.
+#
+# Usage:
+#   python benchmark_voice_loop.py --synthetic 5 --output voice.json
+#   python benchmark_voice_loop.py --wav prompts/*.wav --transcripts "hello" "what time is it" --output voice.json
+#   python benchmark_voice_loop.py --wav prompts/*.wav --stt google --llm openai --tts google --audio speaker
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+# Add the project root directory to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from cerebrum.backends import FakeLLM, FakeRecognizer, FakeTTS, SimulatedAudioOutput
+from cerebrum.frontal_lobe import FrontalLobe
+from cerebrum.speech_pipeline import wav_prompt_pipeline, default_recognizer
+from cerebrum.temporal_lobe import TemporalLobe
+from thalamus.events import Response, SpeechDone
+from thalamus.thalamus import Thalamus
+from telemetry.telemetry import telemetry
+
+STAGES = ('vad_endpoint', 'stt_final', 'relay', 'llm_first_token', 'tts_first_audio', 'voice_to_voice',
+          'response_total', 'turn_total')
+
+
+def synthetic_prompts(count, directory, seconds=1.5, sample_rate=16000):
+    # Tone bursts with short pauses between "words": loud enough for the energy VAD, no recordings needed
+    paths = []
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    for i in range(count):
+        envelope = (np.sin(2 * np.pi * 2.0 * t) > -0.6).astype(np.float32)
+        samples = (0.3 * 32767 * envelope * np.sin(2 * np.pi * (180 + 20 * i) * t)).astype(np.int16)
+        path = os.path.join(directory, f"prompt_{i:02d}.wav")
+        with wave.open(path, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(sample_rate)
+            wav.writeframes(samples.tobytes())
+        paths.append(path)
+    return paths
+
+
+def percentiles(samples):
+    if not samples:
+        return None
+    values = np.asarray(samples) * 1000
+    return {
+        'count': len(values),
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+        'max_ms': round(float(values.max()), 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(__file__),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_loop(args, prompts, tts_cache_dir):
+    if args.tts == 'fake':
+        tts = FakeTTS(latency=args.tts_latency, jitter=args.tts_jitter, words_per_second=args.speech_rate, seed=args.seed)
+    else:
+        tts = None  # Google Cloud TTS
+    if args.llm == 'fake':
+        llm = FakeLLM(first_token_latency=args.llm_first_token, token_latency=args.llm_token, jitter=args.llm_jitter,
+                      seed=args.seed)
+    else:
+        llm = None  # OpenAI
+    audio_output = SimulatedAudioOutput() if args.audio == 'simulated' else None
+
+    if args.stt == 'fake':
+        transcripts = list(args.transcripts or [])
+        transcripts += [f"prompt number {i + 1}" for i in range(len(transcripts), len(prompts))]
+        recognizer = FakeRecognizer(transcripts, latency=args.stt_latency, jitter=args.stt_jitter, seed=args.seed)
+    else:
+        recognizer = default_recognizer()
+
+    # Kept so the per-utterance timings can be read after the auditory lobe has stopped listening
+    pipelines = []
+
+    def pipeline_factory(recognizer, on_partial=None):
+        pipelines.append(wav_prompt_pipeline(prompts, recognizer, on_partial=on_partial))
+        return pipelines[-1]
+
+    frontal_lobe = FrontalLobe(sensory_data={}, tts_cache_dir=tts_cache_dir, tts=tts, llm=llm, audio_output=audio_output)
+    temporal_lobe = TemporalLobe(frontal_lobe=frontal_lobe, use_voice=True, recognizer=recognizer,
+                                 on_partial=lambda text: None, pipeline_factory=pipeline_factory)
+    thalamus = Thalamus(use_voice=True, vision=False, frontal_lobe=frontal_lobe, temporal_lobe=temporal_lobe)
+    return thalamus, pipelines
+
+
+async def drive(thalamus, turns, turn_timeout):
+    # Runs the auditory and response lobes; the next prompt starts once the previous reply has been spoken
+    done = thalamus.bus.subscribe((Response, SpeechDone), maxsize=2 * turns + 2)
+    runner = asyncio.ensure_future(thalamus.run(lobes=['auditory', 'response']))
+    answered = 0
+    try:
+        while answered < turns:
+            event = await done.get(timeout=turn_timeout)
+            if event is None:
+                print(f"No reply within {turn_timeout:.0f}s, stopping after {answered} turns")
+                break
+            if isinstance(event, SpeechDone):
+                answered += 1
+                print(f"Turn {answered}/{turns} done")
+                thalamus.temporal_lobe.pipeline.source.next_turn()
+    finally:
+        thalamus.request_shutdown()
+        await runner
+    return answered
+
+
+def turn_stages(prompt_times, utterance_times, response_metrics):
+    stages = {name: [] for name in STAGES}
+    for (prompt_start, prompt_end), (_, speech_end, final), metrics in zip(prompt_times, utterance_times, response_metrics):
+        started = metrics['started_at']
+        stages['vad_endpoint'].append(speech_end - prompt_end)
+        stages['stt_final'].append(final - speech_end)
+        stages['relay'].append(started - final)
+        stages['response_total'].append(metrics['total_s'])
+        stages['turn_total'].append(started + metrics['total_s'] - prompt_start)
+        if metrics['ttft_s'] is not None:
+            stages['llm_first_token'].append(metrics['ttft_s'])
+        if metrics['ttfa_s'] is not None:
+            stages['voice_to_voice'].append(started + metrics['ttfa_s'] - prompt_end)
+            if metrics['ttft_s'] is not None:
+                stages['tts_first_audio'].append(metrics['ttfa_s'] - metrics['ttft_s'])
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end voice loop latency harness")
+    parser.add_argument('--wav', nargs='+', help="Recorded prompts (mono 16-bit WAV, one sample rate)")
+    parser.add_argument('--synthetic', type=int, default=5, help="Number of generated prompts when --wav is not given")
+    parser.add_argument('--transcripts', nargs='+', help="Scripted transcripts for the fake recognizer, one per prompt")
+    parser.add_argument('--stt', choices=['fake', 'google'], default='fake')
+    parser.add_argument('--llm', choices=['fake', 'openai'], default='fake')
+    parser.add_argument('--tts', choices=['fake', 'google'], default='fake')
+    parser.add_argument('--audio', choices=['simulated', 'speaker'], default='simulated')
+    parser.add_argument('--stt-latency', type=float, default=0.2)
+    parser.add_argument('--stt-jitter', type=float, default=0.05)
+    parser.add_argument('--llm-first-token', type=float, default=0.4)
+    parser.add_argument('--llm-token', type=float, default=0.03)
+    parser.add_argument('--llm-jitter', type=float, default=0.1)
+    parser.add_argument('--tts-latency', type=float, default=0.15)
+    parser.add_argument('--tts-jitter', type=float, default=0.05)
+    parser.add_argument('--speech-rate', type=float, default=2.5, help="Words per second of simulated speech")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--turn-timeout', type=float, default=60.0)
+    parser.add_argument('--output', help="Write the report as JSON to this path")
+    parser.add_argument('--metrics-jsonl', help="Also record telemetry spans and metrics to this JSONL file")
+    args = parser.parse_args()
+    if args.metrics_jsonl:
+        telemetry.configure(jsonl_path=args.metrics_jsonl)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        prompts = args.wav or synthetic_prompts(args.synthetic, workdir)
+        # A fresh TTS cache per run, so results do not depend on earlier runs
+        thalamus, pipelines = build_loop(args, prompts, os.path.join(workdir, 'tts_cache'))
+
+        start = time.perf_counter()
+        answered = asyncio.run(drive(thalamus, len(prompts), args.turn_timeout))
+        elapsed = time.perf_counter() - start
+
+        pipeline = pipelines[0]
+        stages = turn_stages(pipeline.source.prompt_times, list(pipeline.utterance_times),
+                             list(reversed(thalamus.frontal_lobe.response_metrics)))
+        report = {
+            'commit': git_commit(),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'config': {k: v for k, v in vars(args).items() if k != 'wav'},
+            'prompts': [os.path.basename(p) for p in prompts],
+            'turns': answered,
+            'elapsed_s': round(elapsed, 3),
+            'stages': {name: percentiles(samples) for name, samples in stages.items()},
+            'llm': thalamus.frontal_lobe.llm.report(),
+            'tts_cache': thalamus.frontal_lobe.tts_cache.stats(),
+        }
+
+    print(f"\n{answered}/{len(prompts)} turns in {elapsed:.1f}s")
+    for name in STAGES:
+        summary = report['stages'][name]
+        if summary:
+            print(f"{name:>16}: p50 {summary['p50_ms']:8.1f} ms  p95 {summary['p95_ms']:8.1f} ms  "
+                  f"p99 {summary['p99_ms']:8.1f} ms  max {summary['max_ms']:8.1f} ms")
+    thalamus.frontal_lobe.close()
+    telemetry.close()
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+# cerebrum/conversation.py
+# Conversation memory for the LLM path. Recent turns are kept verbatim in a rolling window; older turns
+# are folded into a running summary on a background thread, a few turns at a time, so a request never
+# waits for summarization. Each request is assembled within a token budget: system prompt, summary,
+# as many recent turns as fit (newest first) and the new prompt. Token counts are computed once per
+# text and cached, so assembling a request only counts the new prompt.
+
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict, deque, namedtuple
+
+# Add the project root directory to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from cerebrum.llm_client import DEFAULT_SYSTEM_PROMPT
+
+Turn = namedtuple('Turn', ['role', 'text', 'tokens'])
+
+# Rough per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD = 4
+
+SUMMARY_PROMPT = (
+    "Update the running summary of a conversation between a user and an assistant. Keep names, facts, "
+    "preferences, decisions and open questions; drop greetings and small talk. Reply with the summary only, "
+    "in at most {words} words.\n\nCurrent summary:\n{summary}\n\nNew turns:\n{turns}"
+)
+
+
+class TokenCounter:
+    # Uses tiktoken when it is installed, otherwise estimates about four characters per token.
+    # Counts are cached per text (LRU), so repeated texts are never re-tokenized.
+    def __init__(self, model=None, cache_size=4096):
+        self.encoding = None
+        try:
+            import tiktoken
+            try:
+                self.encoding = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding('cl100k_base')
+            except KeyError:
+                self.encoding = tiktoken.get_encoding('cl100k_base')
+        except ImportError:
+            pass
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def count(self, text):
+        with self.lock:
+            tokens = self.cache.get(text)
+            if tokens is not None:
+                self.cache.move_to_end(text)
+                self.hits += 1
+                return tokens
+            self.misses += 1
+        if self.encoding is not None:
+            tokens = len(self.encoding.encode(text))
+        else:
+            tokens = max(1, (len(text) + 3) // 4) if text else 0
+        with self.lock:
+            self.cache[text] = tokens
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return tokens
+
+
+def trim_to_tokens(text, max_tokens, counter):
+    # Drops leading sentences until the text fits, so the most recent content is kept
+    parts = re.split(r'(?<=[.!?])\s+', text.strip())
+    while len(parts) > 1 and counter.count(" ".join(parts)) > max_tokens:
+        parts.pop(0)
+    text = " ".join(parts)
+    if counter.count(text) > max_tokens:
+        text = text[-max_tokens * 4:]
+    return text
+
+
+def extractive_summary(summary, turns, max_tokens, counter):
+    # Fallback when no LLM is available for summarizing: the first sentence of every turn, newest kept
+    parts = [summary] if summary else []
+    for turn in turns:
+        first = re.split(r'(?<=[.!?])\s+', turn.text.strip(), maxsplit=1)[0]
+        parts.append(f"{turn.role}: {first}")
+    return trim_to_tokens(" ".join(parts), max_tokens, counter)
+
+
+class ConversationContext:
+    def __init__(self, llm=None, system_prompt=DEFAULT_SYSTEM_PROMPT, token_budget=3000, reply_reserve=500,
+                 keep_recent=8, summary_tokens=300, summarize_batch=4, counter=None):
+        # token_budget: maximum tokens of a request including reply_reserve for the answer.
+        # keep_recent: turns kept verbatim; older turns are summarized summarize_batch at a time.
+        # llm: used to write summaries (complete(prompt, use_cache=False)); None uses extractive_summary.
+        self.llm = llm
+        self.system_prompt = system_prompt
+        self.token_budget = token_budget
+        self.reply_reserve = reply_reserve
+        self.keep_recent = keep_recent
+        self.summary_tokens = summary_tokens
+        self.summarize_batch = summarize_batch
+        self.counter = counter or TokenCounter(getattr(llm, 'model', None))
+        self.system_tokens = self.counter.count(system_prompt) + MESSAGE_OVERHEAD
+
+        self.lock = threading.Lock()
+        self.turns = deque()        # verbatim turns, oldest first
+        self.unsummarized = []      # evicted from the window, waiting to be folded into the summary
+        self.summary = ""
+        self.summary_token_count = 0
+        self.summarized_turns = 0
+        self.summarizer = None
+        self.generation = 0         # bumped by clear(); a summary of an older generation is discarded
+        self.last_request_tokens = 0
+
+    def add_turn(self, role, text):
+        turn = Turn(role, text, self.counter.count(text) + MESSAGE_OVERHEAD)
+        with self.lock:
+            self.turns.append(turn)
+            while len(self.turns) > self.keep_recent:
+                self.unsummarized.append(self.turns.popleft())
+            start = len(self.unsummarized) >= self.summarize_batch and self.summarizer is None
+            if start:
+                self.summarizer = threading.Thread(target=self.summarize_pending, daemon=True)
+        if start:
+            self.summarizer.start()
+
+    def record(self, prompt, reply):
+        self.add_turn('user', prompt)
+        self.add_turn('assistant', reply)
+
+    def summarize_pending(self):
+        while True:
+            with self.lock:
+                batch = list(self.unsummarized)
+                summary = self.summary
+                generation = self.generation
+                if len(batch) < self.summarize_batch:
+                    self.summarizer = None
+                    return
+            try:
+                new_summary = self.write_summary(summary, batch)
+            except Exception as e:
+                print(f"Conversation summary failed: {e}")
+                new_summary = extractive_summary(summary, batch, self.summary_tokens, self.counter)
+            # A model that ignores the length limit must not grow every later request
+            new_summary = trim_to_tokens(new_summary, self.summary_tokens, self.counter)
+            tokens = self.counter.count(new_summary) + MESSAGE_OVERHEAD
+            with self.lock:
+                if generation != self.generation:
+                    # clear() ran while this summary was written: its turns are gone, and turns added
+                    # since belong to the new conversation
+                    continue
+                self.summary = new_summary
+                self.summary_token_count = tokens
+                del self.unsummarized[:len(batch)]
+                self.summarized_turns += len(batch)
+
+    def write_summary(self, summary, turns):
+        if self.llm is None:
+            return extractive_summary(summary, turns, self.summary_tokens, self.counter)
+        prompt = SUMMARY_PROMPT.format(
+            words=int(self.summary_tokens * 0.75),
+            summary=summary or "(empty)",
+            turns="\n".join(f"{turn.role.capitalize()}: {turn.text}" for turn in turns)
+        )
+        return self.llm.complete(prompt, use_cache=False).strip()
+
+    def messages(self, prompt, notes=None):
+        # The request for prompt: system prompt, summary, related notes (e.g. memories), newest turns
+        # that fit, prompt
+        budget = self.token_budget - self.reply_reserve
+        used = self.system_tokens + self.counter.count(prompt) + MESSAGE_OVERHEAD
+        with self.lock:
+            summary, summary_tokens = self.summary, self.summary_token_count
+            # Turns waiting for summarization are still candidates, so nothing drops out in between
+            candidates = list(self.unsummarized) + list(self.turns)
+
+        messages = [{"role": "system", "content": self.system_prompt}]
+        if summary and used + summary_tokens <= budget:
+            messages.append({"role": "system", "content": f"Summary of the conversation so far: {summary}"})
+            used += summary_tokens
+        if notes:
+            content = "Related memories:\n" + "\n".join(f"- {note}" for note in notes)
+            tokens = self.counter.count(content) + MESSAGE_OVERHEAD
+            if used + tokens <= budget:
+                messages.append({"role": "system", "content": content})
+                used += tokens
+
+        recent = []
+        for turn in reversed(candidates):
+            if used + turn.tokens > budget:
+                break
+            recent.append({"role": turn.role, "content": turn.text})
+            used += turn.tokens
+        messages.extend(reversed(recent))
+        messages.append({"role": "user", "content": prompt})
+        self.last_request_tokens = used
+        return messages
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.turns.clear()
+            self.unsummarized.clear()
+            self.summary = ""
+            self.summary_token_count = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'turns': len(self.turns),
+                'unsummarized': len(self.unsummarized),
+                'summarized_turns': self.summarized_turns,
+                'summary_tokens': self.summary_token_count,
+                'last_request_tokens': self.last_request_tokens,
+                'token_cache_hits': self.counter.hits,
+                'token_cache_misses': self.counter.misses,
+            }
+
+
+# Usage example
+if __name__ == "__main__":
+    context = ConversationContext(token_budget=200, reply_reserve=50, keep_recent=4, summarize_batch=2)
+    for i in range(10):
+        context.record(f"Question {i}: what about topic {i}?", f"Answer {i}. Topic {i} is interesting. More detail.")
+    messages = context.messages("And what about the first topic?")
+    for message in messages:
+        print(message["role"], ":", message["content"])
+    print("Context stats:", context.stats())
@@ -1,37 +1,136 @@
 # cerebrum/frontal_lobe.py
 # Reasoning, Planning, Problem-solving, Voluntary movement control, Talking
 
-from google.cloud import texttospeech
-from google.oauth2 import service_account
-import openai
-from dotenv import load_dotenv
 import os
-import os
-import tempfile
-import pygame
+import queue
+import re
+import sys
+import threading
+import time
+from collections import deque
+
+# Add the project root directory to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from cerebrum.tts_cache import TTSCache
+from cerebrum.llm_client import LLMClient, DEFAULT_SYSTEM_PROMPT
+from cerebrum.conversation import ConversationContext
+from telemetry.telemetry import telemetry
+
+# A sentence ends at . ! or ? (optionally followed by closing quotes/brackets) and whitespace, or at a newline
+SENTENCE_END = re.compile(r'(?<=[.!?])["\')\]]*\s+|\n+')
+ABBREVIATIONS = ('mr.', 'mrs.', 'ms.', 'dr.', 'st.', 'e.g.', 'i.e.', 'etc.', 'vs.')
+
+
+def split_sentences(tokens, min_chars=12):
+    # Turns a stream of text fragments into a stream of sentences as soon as each one is complete.
+    # Very short fragments are merged into the next sentence so TTS isn't called for "Hi."
+    buffer = ""
+    for token in tokens:
+        buffer += token
+        start = 0
+        for match in SENTENCE_END.finditer(buffer):
+            candidate = buffer[start:match.end()].strip()
+            if len(candidate) < min_chars or candidate.lower().endswith(ABBREVIATIONS):
+                continue
+            yield candidate
+            start = match.end()
+        buffer = buffer[start:]
+    if buffer.strip():
+        yield buffer.strip()
 
 
 class FrontalLobe:
-    def __init__(self, sensory_data):
+    def __init__(self, sensory_data, tts_cache_dir=None, tts_cache_bytes=200 * 1024 * 1024, tts=None, llm=None,
+                 audio_output=None, conversation=None, semantic_memory=None, related_memories=3):
+        # tts, llm and audio_output are pluggable (see cerebrum/backends.py); by default Google Cloud TTS,
+        # OpenAI and the pygame mixer are used. The defaults are created on first use (or by warm_up()),
+        # so a text-only session never loads the speech libraries.
         self.sensory_data = sensory_data
+        self.tts_backend = tts
+        self.audio_backend = audio_output
+        self.backend_lock = threading.Lock()
 
-        # Path to your service account key JSON file
-        SERVICE_ACCOUNT_FILE = os.path.join(os.path.dirname(__file__), 'graym-426618-3e2d718be5f8.json')
+        # Synthesized clips are cached on disk by (text, voice, audio config)
+        if tts_cache_dir is None:
+            tts_cache_dir = os.path.join(os.path.dirname(__file__), 'tts_cache')
+        self.tts_cache = TTSCache(cache_dir=tts_cache_dir, max_bytes=tts_cache_bytes)
+        self.voice_params = None
 
-        # Set up Google Cloud client with credentials
-        credentials = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE)
-        self.client = texttospeech.TextToSpeechClient(credentials=credentials)
+        # Latency of streamed responses: time to first token / first audio, most recent first
+        self.response_metrics = deque(maxlen=100)
 
-        self.voice = texttospeech.VoiceSelectionParams(
-            language_code="en-US",
-            ssml_gender=texttospeech.SsmlVoiceGender.NEUTRAL
-        )
-        self.audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.MP3
+        # LLM client: reads OPENAI_API_KEY / LLM_MODEL once and keeps a pooled HTTP client
+        self.llm = llm or LLMClient()
+
+        # Conversation history sent with each request: recent turns verbatim, older ones summarized,
+        # assembled within a token budget
+        self.conversation = conversation or ConversationContext(
+            llm=self.llm, system_prompt=getattr(self.llm, 'system_prompt', DEFAULT_SYSTEM_PROMPT)
         )
 
-        # OpenAI API key
-        openai.api_key = 'your-openai-api-key'
+        # Optional memory/vector_index.SemanticMemory: the memories most related to a prompt are added
+        # to its request
+        self.semantic_memory = semantic_memory
+        self.related_memories = related_memories
+
+        # Cache statistics are sampled whenever metrics are exported, until close()
+        telemetry.register_callback(self.telemetry_gauges)
+
+    def load_tts(self):
+        with self.backend_lock:
+            if self.tts_backend is None:
+                from cerebrum.backends import default_tts
+                self.tts_backend = default_tts()
+            if self.voice_params is None:
+                self.voice_params = self.tts_backend.cache_params()
+            return self.tts_backend
+
+    def load_audio_output(self):
+        # Mixer and player thread are shared by every FrontalLobe in the process
+        with self.backend_lock:
+            if self.audio_backend is None:
+                from cerebrum.audio_output import AudioOutput
+                self.audio_backend = AudioOutput.shared()
+            return self.audio_backend
+
+    @property
+    def tts(self):
+        return self.load_tts()
+
+    @property
+    def audio_output(self):
+        return self.load_audio_output()
+
+    def warm_up(self, speech=True):
+        # Creates the clients now instead of on the first reply
+        if hasattr(self.llm, 'get_client'):
+            self.llm.get_client()
+        if speech:
+            self.load_tts()
+            self.load_audio_output()
+
+    def telemetry_gauges(self):
+        tts = self.tts_cache.stats()
+        llm = self.llm.report()
+        conversation = self.conversation.stats()
+        return [
+            ('tts_cache.hits', {}, tts['hits']),
+            ('tts_cache.misses', {}, tts['misses']),
+            ('tts_cache.bytes', {}, tts['bytes']),
+            ('llm.requests', {}, llm['requests']),
+            ('llm.cache_hits', {}, llm['cache_hits']),
+            ('llm.coalesced', {}, llm['coalesced']),
+            ('llm.api_calls', {}, llm['api_calls']),
+            ('conversation.turns', {}, conversation['turns'] + conversation['unsummarized']),
+            ('conversation.summary_tokens', {}, conversation['summary_tokens']),
+            ('conversation.request_tokens', {}, conversation['last_request_tokens']),
+        ]
+
+    def close(self):
+        # Stops reporting gauges, so the registry no longer keeps this instance alive
+        telemetry.unregister_callback(self.telemetry_gauges)
 
     def reasoning(self, inputs):
         # Basic reasoning logic using sensory data
@@ -57,60 +156,144 @@ class FrontalLobe:
         print(f"Controlling movement: {movement_command} -> {executed_movement}")
         return executed_movement
 
-    def speak(self, text):
-        # Speech synthesis using Google Cloud Text-to-Speech
-        input_text = texttospeech.SynthesisInput(text=text)
-        response = self.client.synthesize_speech(
-            input=input_text, voice=self.voice, audio_config=self.audio_config
-        )
+    def synthesize(self, text):
+        # Speech synthesis through the TTS backend, served from the cache when possible
+        self.load_tts()
+        key = TTSCache.make_key(text, *self.voice_params)
+        return self.tts_cache.get_or_synthesize(key, lambda: self.synthesize_uncached(text))
 
-        # Create a temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_file:
-            tmp_file.write(response.audio_content)
-            tmp_file_path = tmp_file.name
-            print(f"Audio content written to temporary file '{tmp_file_path}'")
+    def synthesize_uncached(self, text):
+        with telemetry.span('tts.synthesize'):
+            return self.tts.synthesize(text)
 
-        # Initialize pygame mixer
-        pygame.mixer.init()
-        pygame.mixer.music.load(tmp_file_path)
-        pygame.mixer.music.play()
+    def prewarm_speech(self, phrases):
+        # phrases: a list of strings or the path of a text file with one phrase per line
+        if isinstance(phrases, str):
+            with open(phrases, 'r') as f:
+                phrases = [line.strip() for line in f if line.strip()]
+        for phrase in phrases:
+            self.synthesize(phrase)
+        print(f"TTS cache pre-warmed with {len(phrases)} phrases: {self.tts_cache.stats()}")
 
-        # Wait for the audio to finish playing
-        while pygame.mixer.music.get_busy():
-            pygame.time.Clock().tick(10)
+    def speak(self, text, block=True):
+        # Plays from memory through the shared audio output; with block=False the returned handle
+        # can be waited on or cancelled (barge-in)
+        with telemetry.span('frontal.speak', block=block):
+            handle = self.audio_output.play(self.synthesize(text))
+            if block:
+                handle.wait()
+        return handle
 
-        # Remove the temporary file
-        os.remove(tmp_file_path)
-        print(f"Temporary file '{tmp_file_path}' deleted")
+    def stop_speaking(self):
+        if self.audio_backend is not None:
+            self.audio_backend.stop_all()
 
     ##Temporary LLMs implementation as an off-ramp to General Intelligence
-    def generate_response(self, prompt):
-        load_dotenv()
-        openai.api_key = os.getenv('OPENAI_API_KEY')
-        # Generate a response using OpenAI API
-        response = openai.chat.completions.create(
-            model=os.getenv('LLM_MODEL'),
-            messages=[{
-                "role": "system",
-                "content": "You're helpful agent"
-            }, {
-                "role": "user",
-                "content": prompt
-            }]
-        )
+    def history_messages(self, prompt):
+        notes = None
+        if self.semantic_memory is not None:
+            with telemetry.span('memory.related'):
+                related = self.semantic_memory.related(prompt, k=self.related_memories, min_score=0.1)
+            notes = [memory.data for memory, _ in related]
+        return self.conversation.messages(prompt, notes)
+
+    def generate_response(self, prompt, use_cache=True, with_history=True):
+        # Identical requests are answered from the cache or share one in-flight request;
+        # pass use_cache=False when the prompt needs a fresh answer every time.
+        # with_history=False sends the prompt on its own and keeps it out of the conversation.
+        if not with_history:
+            return self.llm.complete(prompt, use_cache=use_cache)
+        reply = self.llm.complete(prompt, use_cache=use_cache, messages=self.history_messages(prompt))
+        self.conversation.record(prompt, reply)
+        return reply
+
+    def stream_response(self, prompt, use_cache=True, with_history=True):
+        # Same request as generate_response, but yields the reply as it is generated; the turn is
+        # recorded once the reply is complete
+        if not with_history:
+            yield from self.llm.stream(prompt, use_cache=use_cache)
+            return
+        parts = []
+        for token in self.llm.stream(prompt, use_cache=use_cache, messages=self.history_messages(prompt)):
+            parts.append(token)
+            yield token
+        self.conversation.record(prompt, "".join(parts))
+
+    def generate_and_speak(self, prompt, speak=True, use_cache=True, with_history=True):
+        # Streams the reply sentence by sentence into TTS: while sentence one plays, sentence two is
+        # being synthesized and the model is still generating the rest. Returns the full reply text.
+        start = time.perf_counter()
+        metrics = {'started_at': start, 'ttft_s': None, 'ttfa_s': None, 'total_s': None, 'sentences': 0}
+        sentences = queue.Queue()
+        handles = []
 
-        # print(response.choices[0].message.content)
-        return response.choices[0].message.content
+        def speak_sentences():
+            while True:
+                sentence = sentences.get()
+                if sentence is None:
+                    return
+                try:
+                    handle = self.audio_output.play(self.synthesize(sentence))
+                except Exception as e:
+                    print(f"Speech synthesis failed: {e}")
+                    continue
+                if metrics['ttfa_s'] is None:
+                    metrics['ttfa_s'] = time.perf_counter() - start
+                handles.append(handle)
+
+        speaker = threading.Thread(target=speak_sentences, daemon=True)
+        if speak:
+            speaker.start()
+
+        def tokens():
+            for token in self.stream_response(prompt, use_cache=use_cache, with_history=with_history):
+                if metrics['ttft_s'] is None:
+                    metrics['ttft_s'] = time.perf_counter() - start
+                yield token
+
+        parts = []
+        try:
+            for sentence in split_sentences(tokens()):
+                parts.append(sentence)
+                metrics['sentences'] += 1
+                if speak:
+                    sentences.put(sentence)
+        finally:
+            if speak:
+                sentences.put(None)
+                speaker.join()
+                for handle in handles:
+                    handle.wait()
+            metrics['total_s'] = time.perf_counter() - start
+            self.response_metrics.appendleft(metrics)
+            telemetry.observe('frontal.response', metrics['total_s'], speak=speak)
+            if metrics['ttft_s'] is not None:
+                telemetry.observe('llm.first_token', metrics['ttft_s'])
+            if metrics['ttfa_s'] is not None:
+                telemetry.observe('frontal.first_audio', metrics['ttfa_s'])
+
+        ttfa = f"{metrics['ttfa_s']:.2f}s" if metrics['ttfa_s'] is not None else "n/a"
+        ttft = f"{metrics['ttft_s']:.2f}s" if metrics['ttft_s'] is not None else "n/a"
+        print(f"Response latency: first token {ttft}, first audio {ttfa}, total {metrics['total_s']:.2f}s")
+        return " ".join(parts)
 
 
 # Usage example
 if __name__ == "__main__":
     frontal_lobe = FrontalLobe(sensory_data={})
 
-    # Test speech synthesis
+    # Test speech synthesis; the second call is served from the TTS cache
+    frontal_lobe.speak("System activated. Ready to tackle today's tasks?")
     frontal_lobe.speak("System activated. Ready to tackle today's tasks?")
+    print("TTS cache stats:", frontal_lobe.tts_cache.stats())
 
     # Test generating a response using OpenAI API
     response = frontal_lobe.generate_response("How are you?")
     print("Generated response:", response)
-    frontal_lobe.speak(response)
\ No newline at end of file
+    frontal_lobe.speak(response)
+    print("LLM client report:", frontal_lobe.llm.report())
+
+    # Test streaming a response straight into speech
+    response = frontal_lobe.generate_and_speak("Tell me a short story in three sentences.")
+    print("Streamed response:", response)
+    frontal_lobe.close()
\ No newline at end of file
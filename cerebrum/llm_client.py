@@ -0,0 +1,225 @@
+# cerebrum/llm_client.py
+# Client layer for the LLM: configuration is read once, one pooled HTTP client is reused for every request,
+# identical prompts that are already in flight share a single request (streamed or not), and answers are
+# cached by exact prompt with a TTL and a size bound. Callers that want a fresh answer pass use_cache=False.
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from dotenv import load_dotenv
+
+from telemetry.telemetry import telemetry
+
+DEFAULT_SYSTEM_PROMPT = "You're helpful agent"
+
+
+class StreamAbandoned(Exception):
+    # Set on an in-flight request whose streaming caller stopped reading before the reply was complete;
+    # callers waiting on it send the request themselves instead
+    pass
+
+
+class ResponseCache:
+    # Exact-match cache with per-entry expiry; the least recently used entry goes first when full
+    def __init__(self, max_entries=256, ttl=3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, text)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, text = entry
+            if time.monotonic() >= expires_at:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return text
+
+    def put(self, key, text):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, text)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class LLMClient:
+    def __init__(self, model=None, api_key=None, system_prompt=DEFAULT_SYSTEM_PROMPT, cache_size=256, cache_ttl=3600.0,
+                 timeout=30.0, max_connections=10):
+        load_dotenv()
+        self.model = model or os.getenv('LLM_MODEL')
+        self.api_key = api_key or os.getenv('OPENAI_API_KEY')
+        self.system_prompt = system_prompt
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.client = None
+        self.client_lock = threading.Lock()
+
+        self.cache = ResponseCache(max_entries=cache_size, ttl=cache_ttl)
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.api_calls = 0
+
+    def get_client(self):
+        # Created on first use and kept for the life of the process, so connections are reused (keep-alive)
+        with self.client_lock:
+            if self.client is None:
+                import httpx
+                import openai
+                http_client = httpx.Client(
+                    timeout=self.timeout,
+                    limits=httpx.Limits(max_connections=self.max_connections,
+                                        max_keepalive_connections=self.max_connections)
+                )
+                self.client = openai.OpenAI(api_key=self.api_key, http_client=http_client)
+            return self.client
+
+    def messages(self, prompt):
+        return [{
+            "role": "system",
+            "content": self.system_prompt
+        }, {
+            "role": "user",
+            "content": prompt
+        }]
+
+    def cache_key(self, prompt, messages=None):
+        # With a full message list (conversation history) the whole context is part of the key
+        if messages is not None:
+            return (self.model,) + tuple((m["role"], m["content"]) for m in messages)
+        return (self.model, self.system_prompt, prompt)
+
+    def complete(self, prompt, use_cache=True, messages=None):
+        # messages: optional full message list to send instead of the system prompt + prompt
+        with self.lock:
+            self.requests += 1
+        if not use_cache:
+            return self.request(prompt, messages)
+
+        key = self.cache_key(prompt, messages)
+        cached = self.cache.get(key)
+        if cached is not None:
+            with self.lock:
+                self.cache_hits += 1
+            return cached
+
+        # Coalesce: if the same prompt is already being answered, wait for that answer instead
+        while True:
+            future, owner = self.join_in_flight(key)
+            if owner:
+                break
+            try:
+                return future.result()
+            except StreamAbandoned:
+                continue
+
+        try:
+            text = self.request(prompt, messages)
+            self.cache.put(key, text)
+            future.set_result(text)
+            return text
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+
+    def join_in_flight(self, key):
+        # Returns (future, True) if the caller now answers key, or (the in-flight future, False)
+        with self.lock:
+            future = self.in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self.in_flight[key] = future
+            return future, True
+
+    def request(self, prompt, messages=None):
+        with self.lock:
+            self.api_calls += 1
+        with telemetry.span('llm.request', stream=False):
+            response = self.get_client().chat.completions.create(model=self.model,
+                                                                 messages=messages or self.messages(prompt))
+        return response.choices[0].message.content
+
+    def stream(self, prompt, use_cache=True, messages=None):
+        # Yields the reply in fragments. A cached reply is yielded in one piece; a streamed one is cached
+        # once it has completed. A caller asking while the same prompt is already in flight waits for the
+        # whole reply and gets it in one piece, like a cache hit.
+        with self.lock:
+            self.requests += 1
+        if not use_cache:
+            yield from self.stream_request(prompt, messages)
+            return
+
+        key = self.cache_key(prompt, messages)
+        cached = self.cache.get(key)
+        if cached is not None:
+            with self.lock:
+                self.cache_hits += 1
+            yield cached
+            return
+
+        while True:
+            future, owner = self.join_in_flight(key)
+            if owner:
+                break
+            try:
+                text = future.result()
+            except StreamAbandoned:
+                continue
+            yield text
+            return
+
+        parts = []
+        try:
+            for fragment in self.stream_request(prompt, messages):
+                parts.append(fragment)
+                yield fragment
+        except BaseException as e:
+            # Includes the caller closing the generator early: whoever waits then asks on its own
+            future.set_exception(e if isinstance(e, Exception) else StreamAbandoned())
+            raise
+        else:
+            text = "".join(parts)
+            self.cache.put(key, text)
+            future.set_result(text)
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+
+    def stream_request(self, prompt, messages=None):
+        with self.lock:
+            self.api_calls += 1
+        stream = self.get_client().chat.completions.create(model=self.model, messages=messages or self.messages(prompt),
+                                                           stream=True)
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def report(self):
+        with self.lock:
+            saved = self.cache_hits + self.coalesced
+            return {
+                'requests': self.requests,
+                'cache_hits': self.cache_hits,
+                'coalesced': self.coalesced,
+                'api_calls': self.api_calls,
+                'hit_rate': saved / self.requests if self.requests else 0.0,
+                'cached_entries': len(self.cache),
+            }
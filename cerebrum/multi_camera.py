@@ -0,0 +1,270 @@
+# cerebrum/multi_camera.py
+# Multi-source visual ingestion: every camera (or RTSP stream / video file standing in for one) is decoded
+# in its own process and written into a shared-memory ring of frame slots. A pool of inference processes
+# reads the frames straight out of shared memory (only small slot references travel through queues, never
+# pickled arrays) and sends back plain detection records, merged into one per-source stream.
+
+import os
+import sys
+import time
+import queue
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+# Add the project root directory to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+# Slot states in a source's frame ring
+SLOT_FREE = 0
+SLOT_WRITING = 1
+SLOT_FILLED = 2
+
+# Reference to a decoded frame sitting in shared memory
+FrameRef = namedtuple('FrameRef', ['source_id', 'slot', 'frame_id', 'timestamp'])
+
+# Detections for one frame of one source, as delivered to consumers such as Thalamus
+SourceDetections = namedtuple('SourceDetections', ['source_id', 'source', 'frame_id', 'timestamp', 'latency', 'detections'])
+
+# A detector for the inference pool: engine name, weights path, confidence threshold
+ModelConfig = namedtuple('ModelConfig', ['name', 'weights', 'conf'])
+
+
+def decode_source(source_id, source, shm_name, shape, slot_states, frame_queue, stop_event, loop, pace_files):
+    # Runs in its own process: read frames as fast as the source delivers them and publish them to free slots.
+    # When every slot is still waiting for inference the frame is dropped, so slow inference never builds lag.
+    shm = shared_memory.SharedMemory(name=shm_name)
+    slots = np.ndarray((len(slot_states),) + shape, dtype=np.uint8, buffer=shm.buf)
+    height, width = shape[:2]
+    cap = cv2.VideoCapture(int(source) if str(source).isdigit() else source)
+    frame_id = 0
+    dropped = 0
+
+    # A local file standing in for a live stream is read at its own frame rate, not as fast as it decodes
+    interval = 0.0
+    if pace_files and os.path.isfile(str(source)) and cap.get(cv2.CAP_PROP_FPS) > 0:
+        interval = 1.0 / cap.get(cv2.CAP_PROP_FPS)
+    next_read = time.monotonic()
+
+    while not stop_event.is_set():
+        if interval:
+            delay = next_read - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_read += interval
+        success, img = cap.read()
+        if not success:
+            if loop and frame_id:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                continue
+            print(f"Source {source_id} ({source}) ended")
+            break
+        timestamp = time.time()
+
+        slot = None
+        with slot_states.get_lock():
+            for i in range(len(slot_states)):
+                if slot_states[i] == SLOT_FREE:
+                    slot_states[i] = SLOT_WRITING
+                    slot = i
+                    break
+        if slot is None:
+            dropped += 1
+            continue
+
+        if img.shape[:2] != (height, width):
+            img = cv2.resize(img, (width, height))
+        slots[slot] = img
+        slot_states[slot] = SLOT_FILLED
+        frame_queue.put(FrameRef(source_id, slot, frame_id, timestamp))
+        frame_id += 1
+
+    cap.release()
+    del slots
+    shm.close()
+    print(f"Source {source_id} decoder stopped after {frame_id} frames ({dropped} dropped)")
+
+
+def inference_worker(model_configs, rings, frame_queue, result_queue, stop_event, imgsz, threads):
+    # Runs in its own process with its own copy of the models; frames are read in place from shared memory
+    import torch
+    from cerebrum.occipital_lobe import LazyModel, MultiModelEngine, results_to_records
+
+    torch.set_num_threads(threads)
+    engine = MultiModelEngine(imgsz=imgsz, concurrent=False)
+    for config in model_configs:
+        engine.add_model(config.name, LazyModel(config.weights, imgsz=imgsz, label=config.name), conf=config.conf)
+
+    attached = {}
+    for source_id, (shm_name, shape, slot_states) in rings.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        attached[source_id] = (shm, np.ndarray((len(slot_states),) + shape, dtype=np.uint8, buffer=shm.buf), slot_states)
+
+    while not stop_event.is_set():
+        try:
+            ref = frame_queue.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if ref is None:
+            break
+
+        _, slots, slot_states = attached[ref.source_id]
+        try:
+            records = results_to_records(engine.infer(slots[ref.slot]))
+        except Exception as e:
+            print(f"Inference failed for source {ref.source_id} frame {ref.frame_id}: {e}")
+            records = {}
+        result_queue.put((ref.source_id, ref.frame_id, ref.timestamp, records))
+        # Detections are plain records now, the slot can be reused by the decoder
+        slot_states[ref.slot] = SLOT_FREE
+
+    for shm, slots, _ in attached.values():
+        del slots
+        shm.close()
+
+
+class MultiCameraIngest:
+    # Starts one decoder process per source and a shared pool of inference processes.
+    # sources: camera indices, RTSP URLs or video file paths. detections() yields SourceDetections
+    # in frame order per source; results that arrive after a newer frame of the same source are dropped.
+    def __init__(self, sources, model_configs, width=640, height=480, slots_per_source=4, inference_workers=2,
+                 threads_per_worker=None, imgsz=640, loop_files=False, pace_files=True):
+        self.sources = list(sources)
+        self.model_configs = list(model_configs)
+        self.shape = (height, width, 3)
+        self.slots_per_source = slots_per_source
+        self.inference_workers = inference_workers
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 2) // inference_workers)
+        self.imgsz = imgsz
+        self.loop_files = loop_files
+        self.pace_files = pace_files
+
+        # Spawn keeps the workers independent of the parent's torch / OpenCV thread state
+        self.context = mp.get_context('spawn')
+        self.stop_event = self.context.Event()
+        self.frame_queue = self.context.Queue(maxsize=inference_workers * 2 + len(self.sources) * slots_per_source)
+        self.result_queue = self.context.Queue()
+        self.shared = {}
+        self.rings = {}
+        self.decoders = []
+        self.workers = []
+        self.last_frame = {}
+        self.delivered = 0
+        self.out_of_order = 0
+
+    def start(self):
+        frame_bytes = int(np.prod(self.shape))
+        for source_id, source in enumerate(self.sources):
+            shm = shared_memory.SharedMemory(create=True, size=frame_bytes * self.slots_per_source)
+            slot_states = self.context.Array('b', self.slots_per_source)
+            self.shared[source_id] = shm
+            self.rings[source_id] = (shm.name, self.shape, slot_states)
+
+        for _ in range(self.inference_workers):
+            worker = self.context.Process(target=inference_worker, daemon=True,
+                                          args=(self.model_configs, self.rings, self.frame_queue, self.result_queue,
+                                                self.stop_event, self.imgsz, self.threads_per_worker))
+            worker.start()
+            self.workers.append(worker)
+
+        for source_id, source in enumerate(self.sources):
+            shm_name, shape, slot_states = self.rings[source_id]
+            decoder = self.context.Process(target=decode_source, daemon=True,
+                                           args=(source_id, source, shm_name, shape, slot_states, self.frame_queue,
+                                                 self.stop_event, self.loop_files, self.pace_files))
+            decoder.start()
+            self.decoders.append(decoder)
+
+        print(f"Multi-camera ingest started: {len(self.sources)} sources, {self.inference_workers} inference workers")
+        return self
+
+    def detections(self, timeout=None):
+        # Merged stream of per-source detections. Ends when every decoder has finished and the pool is drained,
+        # or when no result arrives within timeout seconds.
+        while True:
+            try:
+                result = self.result_queue.get(timeout=0.1 if timeout is None else timeout)
+            except queue.Empty:
+                if timeout is not None:
+                    return
+                if not any(d.is_alive() for d in self.decoders) and self.frames_in_flight() == 0:
+                    # A worker frees its slot before its result has left the process, so the last results
+                    # can still be on their way: stop the workers, then take everything they sent
+                    self.stop_workers()
+                    while True:
+                        try:
+                            result = self.result_queue.get(timeout=0.1)
+                        except queue.Empty:
+                            return
+                        detections = self.deliver(*result)
+                        if detections is not None:
+                            yield detections
+                continue
+
+            detections = self.deliver(*result)
+            if detections is not None:
+                yield detections
+
+    def deliver(self, source_id, frame_id, timestamp, records):
+        if frame_id <= self.last_frame.get(source_id, -1):
+            self.out_of_order += 1
+            return None
+        self.last_frame[source_id] = frame_id
+        self.delivered += 1
+        return SourceDetections(source_id, self.sources[source_id], frame_id, timestamp, time.time() - timestamp, records)
+
+    def stop_workers(self, timeout=5):
+        # Workers flush their results to the queue before they exit
+        for _ in self.workers:
+            try:
+                self.frame_queue.put(None, timeout=1)
+            except queue.Full:
+                pass
+        for worker in self.workers:
+            worker.join(timeout=timeout)
+
+    def frames_in_flight(self):
+        return sum(state != SLOT_FREE for _, _, slot_states in self.rings.values() for state in slot_states[:])
+
+    def close(self):
+        self.stop_event.set()
+        for decoder in self.decoders:
+            decoder.join(timeout=2)
+        for _ in self.workers:
+            try:
+                self.frame_queue.put_nowait(None)
+            except queue.Full:
+                pass
+        for process in self.decoders + self.workers:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for shm in self.shared.values():
+            shm.close()
+            shm.unlink()
+        self.shared = {}
+        print(f"Multi-camera ingest stopped: {self.delivered} frames delivered, {self.out_of_order} late results dropped")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+if __name__ == "__main__":
+    # Two local video files stand in for two network cameras; use 0, 1 or rtsp:// URLs for real ones
+    sources = ['camera_1.mp4', 'camera_2.mp4']
+    model_configs = [ModelConfig('pretrained', 'yolov8n.pt', 0.25)]
+    custom_model_path = 'runs/detect/custom_petr_model/weights/best.pt'
+    if os.path.exists(custom_model_path):
+        model_configs.insert(0, ModelConfig('custom', custom_model_path, 0.1))
+
+    with MultiCameraIngest(sources, model_configs) as ingest:
+        for result in ingest.detections():
+            counts = {name: len(detections) for name, detections in result.detections.items()}
+            print(f"source {result.source_id} frame {result.frame_id}: {counts} ({result.latency * 1000:.0f} ms)")
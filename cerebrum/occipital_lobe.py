@@ -1,12 +1,33 @@
 # cerebrum/occipital_lobe.py
 
 import os
+import sys
 os.environ['OPENCV_VIDEOIO_PRIORITY_MSMF'] = '0'  # To suppress the macOS warning
 
 from ultralytics import YOLO
+from ultralytics.data.augment import LetterBox
+from ultralytics.engine.results import Results
+from ultralytics.utils import ops
+from concurrent.futures import ThreadPoolExecutor
 import cv2
+import hashlib
+import json
 import logging
+import numpy as np
+import queue
+import shutil
+import torch
+import torchvision
 import yaml
+import threading
+import time
+from collections import deque, namedtuple
+
+# Add the project root directory to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from telemetry.telemetry import telemetry
 
 # Disable logging
 logging.getLogger("ultralytics").setLevel(logging.CRITICAL)
@@ -19,27 +40,840 @@ except ImportError:
     class FrontalLobe:
         def __init__(self, sensory_data):
             pass
-        def generate_response(self, prompt):
+        def generate_response(self, prompt, **kwargs):
             return "Mock response"
         def speak(self, text):
             print(f"Mock speak: {text}")
+        def close(self):
+            pass
+
+# A captured frame together with the moment it was read (or its position in a recording) and where it came from
+Frame = namedtuple('Frame', ['frame_id', 'timestamp', 'image', 'source'], defaults=[None])
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# Box colors per engine model (BGR)
+MODEL_COLORS = {'custom': (255, 0, 0), 'pretrained': (0, 255, 0)}
+
+
+class LatestFrameQueue:
+    # Bounded hand-off between pipeline stages that only keeps the newest items.
+    # When the consumer falls behind, older items are dropped instead of piling up.
+    def __init__(self, maxsize=1):
+        self.items = deque(maxlen=maxsize)
+        self.condition = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self.condition:
+            if len(self.items) == self.items.maxlen:
+                self.dropped += 1
+            self.items.append(item)
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        # Returns None when the queue is closed or the timeout expires
+        with self.condition:
+            self.condition.wait_for(lambda: self.items or self.closed, timeout)
+            if self.items:
+                return self.items.popleft()
+            return None
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class FrameCapture(threading.Thread):
+    # Reads frames from the camera as fast as it delivers them, so the device buffer never holds stale frames
+    def __init__(self, output, source=0, width=640, height=480):
+        super().__init__(daemon=True)
+        self.output = output
+        self.source = source
+        self.width = width
+        self.height = height
+        self.stop_event = threading.Event()
+        self.frames_captured = 0
+
+    def run(self):
+        cap = cv2.VideoCapture(self.source)
+        cap.set(3, self.width)
+        cap.set(4, self.height)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        while not self.stop_event.is_set():
+            success, img = cap.read()
+            if not success:
+                print("Failed to grab frame")
+                break
+            self.output.put(Frame(self.frames_captured, time.perf_counter(), img))
+            self.frames_captured += 1
+            telemetry.count('vision.frames_captured')
+
+        cap.release()
+        self.output.close()
+
+    def stop(self):
+        self.stop_event.set()
+
+
+class LatencyStats:
+    # Rolling window of per-frame latencies (in seconds)
+    def __init__(self, window=300):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+
+    def summary(self):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return {
+            'frames': self.count,
+            'mean_ms': 1000 * sum(ordered) / len(ordered),
+            'p50_ms': 1000 * ordered[len(ordered) // 2],
+            'p95_ms': 1000 * ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            'max_ms': 1000 * ordered[-1],
+        }
+
+
+# Exported artifact suffix per CPU-optimized backend (OpenVINO exports to a directory)
+EXPORT_SUFFIXES = {'onnx': '.onnx', 'openvino': '_openvino_model', 'torchscript': '.torchscript'}
+
+
+def file_hash(path, chunk_size=1 << 20):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class LazyModel:
+    # Stands in for a YOLO model and loads it on first use. With a backend other than 'torch' the
+    # weights are exported once to that format and cached under cache_dir, keyed by the weights'
+    # hash and imgsz, so later startups load the optimized artifact directly.
+    def __init__(self, weights, backend='torch', imgsz=640, cache_dir='model_cache', label=None):
+        if backend != 'torch' and backend not in EXPORT_SUFFIXES:
+            raise ValueError(f"Unknown backend '{backend}', expected 'torch' or one of {sorted(EXPORT_SUFFIXES)}")
+        self.weights = weights
+        self.backend = backend
+        self.imgsz = imgsz
+        self.cache_dir = cache_dir
+        self.label = label or os.path.basename(weights)
+        self.model = None
+        self.lock = threading.Lock()
+        self.load_time = None
+        self.latency = LatencyStats()
+
+    def load(self):
+        with self.lock:
+            if self.model is None:
+                start = time.perf_counter()
+                path = self.weights if self.backend == 'torch' else self.cached_export()
+                self.model = YOLO(path, task='detect')
+                self.load_time = time.perf_counter() - start
+                print(f"{self.label} loaded from {path} ({self.backend}) in {self.load_time:.2f}s")
+                print(f"{self.label} names: {self.model.names}")
+        return self.model
+
+    def cached_export(self):
+        if not os.path.exists(self.weights):
+            # Let ultralytics fetch the stock weights (e.g. yolov8n.pt) so they can be hashed
+            YOLO(self.weights)
+        stem = os.path.splitext(os.path.basename(self.weights))[0]
+        key = f"{stem}-{file_hash(self.weights)[:16]}-{self.imgsz}"
+        target = os.path.join(self.cache_dir, key + EXPORT_SUFFIXES[self.backend])
+        if os.path.exists(target):
+            return target
+
+        print(f"Exporting {self.weights} to {self.backend} (imgsz={self.imgsz}), this only happens once...")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Dynamic batch axes so batch mode can feed several frames at once; TorchScript is traced at batch 1
+        dynamic = self.backend in ('onnx', 'openvino')
+        exported = YOLO(self.weights).export(format=self.backend, imgsz=self.imgsz, dynamic=dynamic)
+        shutil.move(exported, target)
+        return target
+
+    @property
+    def names(self):
+        return self.load().names
+
+    @property
+    def task(self):
+        return self.load().task
+
+    def __call__(self, source, **kwargs):
+        model = self.load()
+        start = time.perf_counter()
+        if self.backend == 'torchscript' and isinstance(source, torch.Tensor) and source.shape[0] > 1:
+            results = []
+            for i in range(source.shape[0]):
+                results.extend(model(source[i:i + 1], **kwargs))
+        else:
+            results = model(source, **kwargs)
+        self.latency.add(time.perf_counter() - start)
+        return results
+
+    def describe(self):
+        if self.model is None:
+            return f"{self.label} ({self.backend}): not loaded yet"
+        summary = self.latency.summary()
+        text = f"{self.label} ({self.backend}): startup {self.load_time:.2f}s"
+        if summary:
+            text += f", per call mean {summary['mean_ms']:.1f} ms, p95 {summary['p95_ms']:.1f} ms"
+        return text
+
+
+# A detector registered with the MultiModelEngine, with its own threshold and class-name map
+ModelSpec = namedtuple('ModelSpec', ['name', 'model', 'conf', 'names'])
+
+
+class MultiModelEngine:
+    # Runs several YOLO models over the same frames while letterboxing and converting each frame
+    # to a tensor only once. The models then run on the shared tensor, concurrently when possible
+    # (PyTorch releases the GIL during inference).
+    def __init__(self, imgsz=640, concurrent=True):
+        self.imgsz = imgsz
+        self.models = {}
+        self.letterbox = LetterBox(new_shape=(imgsz, imgsz), auto=False)
+        self.concurrent = concurrent
+        self.executor = None
+        # Seconds spent per stage in the most recent infer_batch() call: preprocess, model:<name>, rescale
+        self.last_timings = {}
+
+    def add_model(self, name, model, conf=0.25, names=None):
+        # names defaults to the model's own map, resolved on first use so lazy models stay unloaded
+        self.models[name] = ModelSpec(name, model, conf, names)
+
+    def preprocess(self, images):
+        # BGR HWC uint8 frames -> one RGB BCHW float tensor in [0, 1], letterboxed to imgsz x imgsz
+        batch = np.stack([self.letterbox(image=img) for img in images])
+        batch = np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2))
+        return torch.from_numpy(batch).float().div_(255.0)
+
+    def infer(self, img, model_names=None):
+        # Returns {model name: ultralytics results list} for a single frame
+        per_model = self.infer_batch([img], model_names)
+        return {name: results[0] for name, results in per_model.items()}
+
+    def infer_batch(self, images, model_names=None):
+        # Returns {model name: [results list for each image]}; boxes are in original frame coordinates
+        specs = [self.models[name] for name in (model_names if model_names is not None else self.models)]
+        if not specs:
+            return {}
+        timings = {}
+        start = time.perf_counter()
+        tensor = self.preprocess(images)
+        timings['preprocess'] = time.perf_counter() - start
+
+        if self.concurrent and len(specs) > 1:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=len(self.models), thread_name_prefix='yolo')
+            futures = [self.executor.submit(self.run_model, spec, tensor) for spec in specs]
+            outputs = [future.result() for future in futures]
+        else:
+            outputs = [self.run_model(spec, tensor) for spec in specs]
+
+        start = time.perf_counter()
+        per_model = {}
+        for spec, (results, elapsed) in zip(specs, outputs):
+            timings[f"model:{spec.name}"] = elapsed
+            names = spec.names if spec.names is not None else spec.model.names
+            per_model[spec.name] = [[self.rescale(r, tensor, img, names)] for r, img in zip(results, images)]
+        timings['rescale'] = time.perf_counter() - start
+        self.last_timings = timings
+        if telemetry.enabled:
+            for stage, seconds in timings.items():
+                model = stage.split(':', 1)[1] if stage.startswith('model:') else None
+                if model:
+                    telemetry.observe('vision.model', seconds, model=model)
+                    telemetry.count('vision.inferences', len(images), model=model)
+                else:
+                    telemetry.observe(f'vision.{stage}', seconds)
+        return per_model
+
+    def run_model(self, spec, tensor):
+        start = time.perf_counter()
+        results = spec.model(tensor, conf=spec.conf, imgsz=self.imgsz, verbose=False)
+        return results, time.perf_counter() - start
+
+    def rescale(self, result, tensor, img, names):
+        # Map boxes from the letterboxed tensor back onto the original frame
+        data = result.boxes.data.clone()
+        if len(data):
+            data[:, :4] = ops.scale_boxes(tensor.shape[2:], data[:, :4], img.shape)
+        return Results(orig_img=img, path=result.path, names=names, boxes=data)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+
+def class_label(names, cls):
+    # names is either the {id: name} dict ultralytics uses or a plain list from data.yaml
+    if isinstance(names, dict):
+        return names.get(cls, f"Unknown ({cls})")
+    return names[cls] if cls < len(names) else f"Unknown ({cls})"
+
+
+class OfflineFrameSource:
+    # Streams frames from a video file or an image directory for headless replay.
+    # Decoding runs ahead of inference in background threads and feeds a bounded queue, so the
+    # models never wait on disk I/O or JPEG/H.264 decoding, and memory use stays flat.
+    def __init__(self, path, decode_workers=4, prefetch=64):
+        self.path = path
+        self.decode_workers = decode_workers
+        self.prefetch = prefetch
+        self.frames = queue.Queue(maxsize=prefetch)
+        self.fps = None
+        self.stop_event = threading.Event()
+
+        if os.path.isdir(path):
+            self.files = sorted(os.path.join(path, f) for f in os.listdir(path) if f.lower().endswith(IMAGE_EXTENSIONS))
+            target = self.decode_images
+        elif os.path.isfile(path):
+            self.cap = cv2.VideoCapture(path)
+            self.fps = self.cap.get(cv2.CAP_PROP_FPS) or None
+            target = self.decode_video
+        else:
+            raise FileNotFoundError(f"Offline source not found at {path}")
+
+        self.thread = threading.Thread(target=target, daemon=True)
+        self.thread.start()
+
+    def decode_images(self):
+        # cv2.imread releases the GIL, so a thread pool decodes several images at once. At most
+        # prefetch + decode_workers decodes are in flight (refilled as frames are consumed, in file
+        # order), so decoded images never pile up ahead of the queue; on stop the rest is cancelled.
+        files = iter(enumerate(self.files))
+        pending = deque()
+        window = self.prefetch + self.decode_workers
+        with ThreadPoolExecutor(max_workers=self.decode_workers, thread_name_prefix='decode') as executor:
+            for frame_id, path in files:
+                pending.append((frame_id, path, executor.submit(cv2.imread, path)))
+                if len(pending) == window:
+                    break
+            while pending and not self.stop_event.is_set():
+                frame_id, path, future = pending.popleft()
+                img = future.result()
+                next_file = next(files, None)
+                if next_file is not None:
+                    pending.append(next_file + (executor.submit(cv2.imread, next_file[1]),))
+                if img is None:
+                    print(f"Could not read image {path}")
+                    continue
+                self.put(Frame(frame_id, 0.0, img, path))
+            for _, _, future in pending:
+                future.cancel()
+        self.put(None)
+
+    def decode_video(self):
+        cap = self.cap
+        frame_id = 0
+        while not self.stop_event.is_set():
+            success, img = cap.read()
+            if not success:
+                break
+            self.put(Frame(frame_id, cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0, img, self.path))
+            frame_id += 1
+        cap.release()
+        self.put(None)
+
+    def put(self, item):
+        while not self.stop_event.is_set():
+            try:
+                self.frames.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def batches(self, batch_size):
+        batch = []
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                break
+            batch.append(frame)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def close(self):
+        self.stop_event.set()
+        self.thread.join(timeout=2)
+
+
+class Detections:
+    # Boxes, confidences, classes (and track IDs, if any) of one result as flat NumPy arrays. Pulling them out
+    # with one device-to-host copy per result replaces a tensor index plus .item() per box per attribute.
+    def __init__(self, xyxy, conf, cls, names, ids=None):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+        self.names = names
+        self.ids = ids
+
+    @classmethod
+    def from_results(cls, results, names=None):
+        # Concatenates every result in an ultralytics results list
+        arrays = [r.boxes.data.cpu().numpy() for r in results]
+        data = np.concatenate(arrays) if arrays else np.zeros((0, 6), dtype=np.float32)
+        if names is None:
+            names = results[0].names if results else {}
+        ids = data[:, 4].astype(np.int64) if data.shape[1] == 7 else None
+        return cls(data[:, :4], data[:, -2], data[:, -1].astype(np.int64), names, ids)
+
+    def __len__(self):
+        return len(self.conf)
+
+    def filter(self, min_conf=None, class_ids=None):
+        keep = np.ones(len(self), dtype=bool)
+        if min_conf is not None:
+            keep &= self.conf >= min_conf
+        if class_ids is not None:
+            keep &= np.isin(self.cls, list(class_ids))
+        return Detections(self.xyxy[keep], self.conf[keep], self.cls[keep], self.names,
+                          self.ids[keep] if self.ids is not None else None)
+
+    def class_ids_for(self, class_names):
+        return [i for i, name in (self.names.items() if isinstance(self.names, dict) else enumerate(self.names))
+                if name in class_names]
+
+    def present(self, class_names):
+        # Which of class_names occur at least once
+        found = np.unique(self.cls[np.isin(self.cls, self.class_ids_for(class_names))])
+        return {class_label(self.names, int(c)) for c in found}
+
+    def class_names(self):
+        # Names of the classes that occur at least once
+        return {class_label(self.names, int(c)) for c in np.unique(self.cls)}
+
+    def labels(self):
+        # Labels are built per unique class, then confidences are formatted in one pass
+        class_names = {int(c): class_label(self.names, int(c)) for c in np.unique(self.cls)}
+        labels = [f"{class_names[c]} {conf:.2f}" for c, conf in zip(self.cls.tolist(), self.conf.tolist())]
+        if self.ids is not None:
+            # Track ID 0 marks a box that is not tracked
+            labels = [f"#{i} {label}" if i else label for i, label in zip(self.ids.tolist(), labels)]
+        return labels
+
+    def to_records(self):
+        boxes = np.round(self.xyxy.astype(np.float64), 1).tolist()
+        confs = np.round(self.conf.astype(np.float64), 4).tolist()
+        return [{'class_id': c, 'class': class_label(self.names, c), 'confidence': conf, 'box': box}
+                for c, conf, box in zip(self.cls.tolist(), confs, boxes)]
+
+
+def draw_detections(img, detections, color, labels=None):
+    corners = detections.xyxy.astype(np.int32)
+    for (x1, y1, x2, y2), label in zip(corners.tolist(), labels if labels is not None else detections.labels()):
+        cv2.rectangle(img, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(img, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
+
+
+def results_to_records(results):
+    # {model name: results list} -> {model name: [plain dict per detection]}, safe to JSON-encode or pickle
+    return {name: Detections.from_results(model_results).to_records() for name, model_results in results.items()}
+
+
+class JsonlDetectionWriter:
+    # One JSON object per frame with the detections of every model
+    def __init__(self, path):
+        self.file = open(path, 'w')
+
+    def write(self, frame, results):
+        record = {'source': frame.source, 'frame': frame.frame_id, 'timestamp': round(frame.timestamp, 3),
+                  'detections': results_to_records(results)}
+        self.file.write(json.dumps(record) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class AnnotatedVideoWriter:
+    # Writes frames with detections drawn on them; the frame size is fixed by the first frame
+    def __init__(self, path, draw, fps=None):
+        # fps defaults to 10 when the source has no frame rate (e.g. an image directory)
+        self.path = path
+        self.draw = draw
+        self.fps = fps
+        self.writer = None
+        self.size = None
+
+    def write(self, frame, results):
+        img = frame.image.copy()
+        for name, model_results in results.items():
+            self.draw(img, model_results, model_results[0].names if model_results else {}, color=MODEL_COLORS.get(name, (0, 255, 255)))
+        if self.writer is None:
+            self.size = (img.shape[1], img.shape[0])
+            self.writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*'mp4v'), self.fps or 10.0, self.size)
+        if (img.shape[1], img.shape[0]) != self.size:
+            img = cv2.resize(img, self.size)
+        self.writer.write(img)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.release()
+
+
+class InferenceScheduler:
+    # Decides, frame by frame, which models actually need to run. A model is re-run when the scene
+    # has changed since its last run (cheap frame difference on a small grayscale copy) and its stride
+    # allows it, or when its detections are older than max_staleness seconds. Otherwise the last
+    # detections are reused and the skip is counted.
+    def __init__(self, strides=None, motion_threshold=4.0, max_staleness=1.0, motion_size=(64, 48)):
+        self.strides = strides or {}
+        self.motion_threshold = motion_threshold
+        self.max_staleness = max_staleness
+        self.motion_size = motion_size
+        self.frame_index = 0
+        self.last_results = {}
+        self.last_run_frame = {}
+        self.last_run_time = {}
+        self.reference = {}
+        self.runs = {}
+        self.skips = {}
+        self.current_small = None
+
+    def downscale(self, img):
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, self.motion_size, interpolation=cv2.INTER_AREA)
+
+    def scene_changed(self, name):
+        reference = self.reference.get(name)
+        if reference is None:
+            return True
+        return cv2.absdiff(self.current_small, reference).mean() > self.motion_threshold
+
+    def plan(self, img, model_names):
+        # Returns the subset of model_names that must run on this frame
+        self.frame_index += 1
+        self.current_small = self.downscale(img)
+        now = time.perf_counter()
+
+        to_run = []
+        for name in model_names:
+            if name not in self.last_results:
+                due = True
+            elif now - self.last_run_time[name] >= self.max_staleness:
+                due = True
+            else:
+                stride_ok = self.frame_index - self.last_run_frame[name] >= self.strides.get(name, 1)
+                due = stride_ok and self.scene_changed(name)
+
+            if due:
+                to_run.append(name)
+            else:
+                self.skips[name] = self.skips.get(name, 0) + 1
+        return to_run
+
+    def update(self, name, results):
+        self.last_results[name] = results
+        self.last_run_frame[name] = self.frame_index
+        self.last_run_time[name] = time.perf_counter()
+        self.reference[name] = self.current_small
+        self.runs[name] = self.runs.get(name, 0) + 1
+
+    def results(self):
+        return dict(self.last_results)
+
+    def summary(self):
+        parts = []
+        for name in sorted(set(self.runs) | set(self.skips)):
+            runs = self.runs.get(name, 0)
+            skips = self.skips.get(name, 0)
+            total = runs + skips
+            saved = 100.0 * skips / total if total else 0.0
+            parts.append(f"{name}: ran {runs}, skipped {skips} ({saved:.0f}% saved)")
+        return "; ".join(parts)
+
+
+def box_iou(a, b):
+    # Pairwise IoU between (N, 4) and (M, 4) xyxy arrays
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(br - tl, 0, None).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+class Track:
+    def __init__(self, track_id, box, conf, cls):
+        self.track_id = track_id
+        self.box = box
+        self.conf = conf
+        self.cls = cls
+        self.hits = 1
+        self.missed = 0
+
+    def copy(self):
+        # Boxes are replaced on update, never modified in place, so sharing the array is safe
+        track = Track(self.track_id, self.box, self.conf, self.cls)
+        track.hits, track.missed = self.hits, self.missed
+        return track
+
+
+class IoUTracker:
+    # Greedy IoU association between consecutive detections of the same class. Tracks survive up to
+    # max_missed frames without a match, which keeps their IDs stable through short detector dropouts.
+    def __init__(self, iou_threshold=0.3, max_missed=5):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.tracks = {}
+        self.next_id = 1
+
+    def update(self, data):
+        # data: (N, 6) array of x1, y1, x2, y2, conf, cls. Returns the track ID of each row and whether
+        # any previously active track went unmatched (i.e. was lost in this frame).
+        ids = np.zeros(len(data), dtype=np.int64)
+        tracks = list(self.tracks.values())
+        matched_tracks = set()
+        matched_rows = set()
+
+        if tracks and len(data):
+            iou = box_iou(np.array([t.box for t in tracks]), data[:, :4])
+            same_class = np.array([t.cls for t in tracks])[:, None] == data[None, :, 5]
+            iou = np.where(same_class, iou, 0.0)
+            for t_index, row in zip(*np.unravel_index(np.argsort(-iou, axis=None), iou.shape)):
+                if iou[t_index, row] < self.iou_threshold:
+                    break
+                if t_index in matched_tracks or row in matched_rows:
+                    continue
+                track = tracks[t_index]
+                track.box, track.conf = data[row, :4].copy(), float(data[row, 4])
+                track.hits += 1
+                track.missed = 0
+                ids[row] = track.track_id
+                matched_tracks.add(t_index)
+                matched_rows.add(row)
+
+        lost = False
+        for t_index, track in enumerate(tracks):
+            if t_index not in matched_tracks:
+                if track.missed == 0:
+                    lost = True
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    del self.tracks[track.track_id]
+
+        for row in range(len(data)):
+            if row not in matched_rows:
+                track = Track(self.next_id, data[row, :4].copy(), float(data[row, 4]), int(data[row, 5]))
+                self.tracks[track.track_id] = track
+                ids[row] = track.track_id
+                self.next_id += 1
+
+        return ids, lost
+
+    def active(self):
+        # Tracks matched in the most recent frame
+        return [t for t in self.tracks.values() if t.missed == 0]
+
+    def snapshot(self):
+        return {track_id: track.copy() for track_id, track in self.tracks.items()}, self.next_id
+
+    def restore(self, state):
+        self.tracks, self.next_id = state
+
+
+class RegionDetector:
+    # Runs a model on padded crops around tracked boxes between periodic full-frame detections.
+    # A full-frame pass happens every full_frame_interval frames, whenever there is nothing to track,
+    # and as soon as a track is lost in its crop. Only detections of track_classes (class ids, None for
+    # all) at or above track_conf become tracks, and a frame whose crops would cost more than one
+    # full-frame pass (more than max_crops crops, or crops covering over max_crop_area of the frame)
+    # runs on the full frame instead.
+    def __init__(self, full_frame_interval=15, padding=0.5, roi_imgsz=320, iou_threshold=0.3, max_missed=5,
+                 track_classes=None, track_conf=0.4, max_crops=4, max_crop_area=0.5):
+        self.full_frame_interval = full_frame_interval
+        self.padding = padding
+        self.roi_imgsz = roi_imgsz
+        self.track_classes = None if track_classes is None else list(track_classes)
+        self.track_conf = track_conf
+        self.max_crops = max_crops
+        self.max_crop_area = max_crop_area
+        self.tracker = IoUTracker(iou_threshold=iou_threshold, max_missed=max_missed)
+        self.frames_since_full = None
+        self.full_frame_runs = 0
+        self.region_runs = 0
+        self.fallbacks = 0
+
+    def needs_full_frame(self):
+        return (self.frames_since_full is None or self.frames_since_full >= self.full_frame_interval
+                or not self.tracker.active())
+
+    def update_full(self, results):
+        # Feed a full-frame result; returns it with track IDs attached
+        self.frames_since_full = 0
+        self.full_frame_runs += 1
+        result = results[0]
+        data = result.boxes.data[:, [0, 1, 2, 3, -2, -1]].cpu().numpy()
+        ids = np.zeros(len(data), dtype=np.int64)
+        keep = self.trackable(data)
+        ids[keep], _ = self.tracker.update(data[keep])
+        return [self.with_ids(result.orig_img, result.path, result.names, data, ids)]
+
+    def trackable(self, data):
+        keep = data[:, 4] >= self.track_conf
+        if self.track_classes is not None:
+            keep &= np.isin(data[:, 5].astype(np.int64), self.track_classes)
+        return keep
+
+    def detect_regions(self, img, spec, names):
+        # Returns tracked results from the crops, or None if a track was lost and a full frame is needed.
+        # In that case the tracker is left as it was, so the full-frame pass is this frame's only update.
+        self.frames_since_full += 1
+        height, width = img.shape[:2]
+        crops, offsets = [], []
+        for track in self.tracker.active():
+            x1, y1, x2, y2 = track.box
+            pad_x, pad_y = (x2 - x1) * self.padding, (y2 - y1) * self.padding
+            cx1, cy1 = max(0, int(x1 - pad_x)), max(0, int(y1 - pad_y))
+            cx2, cy2 = min(width, int(x2 + pad_x)), min(height, int(y2 + pad_y))
+            if cx2 - cx1 < 2 or cy2 - cy1 < 2:
+                continue
+            crops.append(img[cy1:cy2, cx1:cx2])
+            offsets.append((cx1, cy1))
+
+        # Past this many or this much cropped area, one full-frame pass is cheaper
+        area = sum(crop.shape[0] * crop.shape[1] for crop in crops)
+        if len(crops) > self.max_crops or area > self.max_crop_area * width * height:
+            self.fallbacks += 1
+            return None
+
+        self.region_runs += len(crops)
+        rows = []
+        if crops:
+            for result, (ox, oy) in zip(spec.model(crops, conf=spec.conf, imgsz=self.roi_imgsz, verbose=False), offsets):
+                data = result.boxes.data.cpu().numpy().copy()
+                data[:, [0, 2]] += ox
+                data[:, [1, 3]] += oy
+                rows.append(data)
+        data = np.concatenate(rows) if rows else np.zeros((0, 6), dtype=np.float32)
+        data = data[self.trackable(data)]
+
+        # Overlapping crops can find the same object twice
+        if len(data) > 1:
+            keep = torchvision.ops.nms(torch.from_numpy(data[:, :4]).float(), torch.from_numpy(data[:, 4]).float(), 0.5)
+            data = data[keep.numpy()]
+
+        state = self.tracker.snapshot()
+        ids, lost = self.tracker.update(data)
+        if lost:
+            self.tracker.restore(state)
+            self.fallbacks += 1
+            return None
+        return [self.with_ids(img, None, names, data, ids)]
+
+    def with_ids(self, img, path, names, data, ids):
+        # Boxes with 7 columns carry the track ID (x1, y1, x2, y2, id, conf, cls)
+        tracked = np.concatenate([data[:, :4], ids[:, None].astype(data.dtype), data[:, 4:6]], axis=1)
+        return Results(orig_img=img, path=path, names=names, boxes=torch.from_numpy(tracked))
+
+    def present_classes(self, min_hits=2):
+        # Classes with a confirmed track; short misses keep a track alive, so this does not flicker
+        return {t.cls for t in self.tracker.tracks.values() if t.hits >= min_hits}
+
+    def summary(self):
+        return (f"full-frame {self.full_frame_runs}, region crops {self.region_runs}, "
+                f"fallbacks {self.fallbacks}, active tracks {len(self.tracker.active())}")
+
+
+class PresenceTracker:
+    # N-of-M hysteresis per identity: an identity arrives once it was seen in at least enter_count of the
+    # last window frames, and only leaves once it was missing from the whole window. A single flickering
+    # frame therefore neither triggers nor resets a greeting. Arrivals within cooldown seconds of the
+    # previous one for the same identity are suppressed.
+    def __init__(self, enter_count=3, window=5, cooldown=60.0):
+        self.enter_count = enter_count
+        self.window = window
+        self.cooldown = cooldown
+        self.history = {}
+        self.present = set()
+        self.last_arrival = {}
+
+    def update(self, seen):
+        # seen: identities detected in this frame. Returns the identities that just arrived.
+        now = time.monotonic()
+        arrived = []
+        for identity in set(self.history) | set(seen):
+            history = self.history.setdefault(identity, deque(maxlen=self.window))
+            history.append(identity in seen)
+            hits = sum(history)
+
+            if identity not in self.present and hits >= self.enter_count:
+                self.present.add(identity)
+                last = self.last_arrival.get(identity)
+                if last is None or now - last >= self.cooldown:
+                    self.last_arrival[identity] = now
+                    arrived.append(identity)
+            elif identity in self.present and hits == 0 and len(history) == self.window:
+                self.present.discard(identity)
+        return arrived
+
+
+class ActionWorker(threading.Thread):
+    # Runs slow side effects (LLM round-trips, speech playback) off the vision thread.
+    # submit() never blocks: when the queue is full the action is dropped.
+    def __init__(self, maxsize=8):
+        super().__init__(daemon=True)
+        # The bound is enforced in submit() so the stop sentinel can always be enqueued
+        self.actions = queue.Queue()
+        self.maxsize = maxsize
+        self.dropped = 0
+
+    def submit(self, action, *args):
+        if self.actions.qsize() >= self.maxsize:
+            self.dropped += 1
+            print("Action queue full, dropping action")
+            return False
+        self.actions.put((action, args))
+        return True
+
+    def run(self):
+        while True:
+            item = self.actions.get()
+            if item is None:
+                break
+            action, args = item
+            try:
+                action(*args)
+            except Exception as e:
+                print(f"Action failed: {e}")
+
+    def stop(self):
+        # Let already queued actions finish, then exit
+        self.actions.put(None)
+
 
 class OccipitalLobe:
-    def __init__(self, custom_model_path='trained_model/best_model.pt', data_yaml_path='yolo_dataset/data.yaml'):
-        # Load custom model
+    def __init__(self, custom_model_path='trained_model/best_model.pt', data_yaml_path='yolo_dataset/data.yaml',
+                 inference_strides=None, motion_threshold=4.0, max_staleness=1.0,
+                 greeting_identities=('petr',), greeting_cooldown=60.0, backend='torch', model_cache_dir='model_cache',
+                 track_custom=True, full_frame_interval=15, episodic_log=None, frontal_lobe=None):
+        # Models are loaded lazily on the first frame; backend='onnx', 'openvino' or 'torchscript'
+        # exports them once into model_cache_dir and loads the cached artifact on later startups.
+        # frontal_lobe (used for greetings) is shared with the caller if given; otherwise one is created
+        # and closed with close().
         if os.path.exists(custom_model_path):
-            self.custom_model = YOLO(custom_model_path)
-            print(f"Custom model loaded from: {custom_model_path}")
-            print(f"Custom model task: {self.custom_model.task}")
-            print(f"Custom model names: {self.custom_model.names}")
+            self.custom_model = LazyModel(custom_model_path, backend=backend, cache_dir=model_cache_dir, label='Custom model')
+            print(f"Custom model found at: {custom_model_path}")
         else:
             print(f"Custom model not found at {custom_model_path}. Using only pre-trained model.")
             self.custom_model = None
 
-        # Load pre-trained model
-        self.pretrained_model = YOLO('yolov8n.pt')
-        print("Pre-trained YOLOv8n model loaded")
-        print(f"Pre-trained model names: {self.pretrained_model.names}")
+        # Pre-trained model
+        self.pretrained_model = LazyModel('yolov8n.pt', backend=backend, cache_dir=model_cache_dir, label='Pre-trained YOLOv8n model')
 
         # Load custom names from data.yaml
         if os.path.exists(data_yaml_path):
@@ -50,62 +884,292 @@ class OccipitalLobe:
             self.custom_names = ['petr']
         print(f"Loaded custom class names: {self.custom_names}")
 
+        # Both models share one preprocessing pass per frame
+        self.engine = MultiModelEngine(imgsz=640)
+        if self.custom_model:
+            self.engine.add_model('custom', self.custom_model, conf=0.1)
+        self.engine.add_model('pretrained', self.pretrained_model, conf=0.25)
+
+        # Per-model strides ({'custom': n, 'pretrained': m}) and motion gating for the live loop
+        self.inference_strides = inference_strides or {'custom': 1, 'pretrained': 1}
+        self.motion_threshold = motion_threshold
+        self.max_staleness = max_staleness
+        self.scheduler = None
+
+        # Between periodic full-frame passes the custom model only looks at crops around tracked faces.
+        # Crops run at the region imgsz in batches, which a TorchScript export (traced at 640, batch 1)
+        # cannot take, so that backend always runs full frames.
+        if track_custom and backend == 'torchscript':
+            print("Region tracking needs dynamic input shapes, disabled for the torchscript backend")
+        self.track_custom = track_custom and self.custom_model is not None and backend != 'torchscript'
+        self.full_frame_interval = full_frame_interval
+        self.region_detector = None
+
+        # Greetings are triggered through hysteresis and run on a worker so the vision loop never blocks
+        self.greeting_identities = set(greeting_identities)
+        self.presence = PresenceTracker(cooldown=greeting_cooldown)
+        self.action_worker = None
+        self.on_arrival = None
+
+        # Every model run's detections are appended to this memory/visual_log.VisualEpisodicLog, if set
+        self.episodic_log = episodic_log
+
         # Initialize FrontalLobe
-        self.frontal_lobe = FrontalLobe(sensory_data={})
+        self.owns_frontal_lobe = frontal_lobe is None
+        self.frontal_lobe = frontal_lobe or FrontalLobe(sensory_data={})
+
+    def close(self):
+        if self.owns_frontal_lobe:
+            self.frontal_lobe.close()
+
+    def warm_up(self):
+        # Loads (or exports and caches) every model now instead of on the first frame
+        for spec in self.engine.models.values():
+            if isinstance(spec.model, LazyModel):
+                spec.model.load()
+
+    def process_visual_input(self, source=0, report_interval=5.0, headless=False, on_detections=None, on_arrival=None,
+                             stop_event=None):
+        # Three stages: a capture thread, an inference thread and the display loop on the calling thread.
+        # Each stage hands off through a queue that only keeps the newest item, so a slow model never
+        # makes us display old frames. headless=True skips drawing and the window (stop with Ctrl+C).
+        # on_detections(frame, {model name: Detections}) is called for every displayed frame; with
+        # on_arrival(identity) arrivals are handed to the caller instead of being greeted here.
+        # Setting stop_event (a threading.Event) ends the loop from another thread.
+        self.on_arrival = on_arrival
+        frame_queue = LatestFrameQueue(maxsize=1)
+        result_queue = LatestFrameQueue(maxsize=1)
+        capture = FrameCapture(frame_queue, source=source)
+        inference = threading.Thread(target=self.run_inference_stage, args=(frame_queue, result_queue, source),
+                                     daemon=True)
+        # Greetings only run here when arrivals are not handed to the caller
+        self.action_worker = None
+        if on_arrival is None:
+            self.action_worker = ActionWorker()
+            self.action_worker.start()
+        capture.start()
+        inference.start()
+
+        lag_stats = LatencyStats()
+        last_report = time.perf_counter()
 
-    def process_visual_input(self):
-        cap = cv2.VideoCapture(0)
-        cap.set(3, 640)
-        cap.set(4, 480)
+        def queue_gauges():
+            return [
+                ('vision.queue_depth', {'queue': 'frames'}, len(frame_queue.items)),
+                ('vision.queue_depth', {'queue': 'results'}, len(result_queue.items)),
+                ('vision.queue_dropped', {'queue': 'frames'}, frame_queue.dropped),
+                ('vision.queue_dropped', {'queue': 'results'}, result_queue.dropped),
+            ]
+        telemetry.register_callback(queue_gauges)
 
-        petr_detected = False
+        try:
+            while stop_event is None or not stop_event.is_set():
+                item = result_queue.get(timeout=0.1)
+                if item is None:
+                    if result_queue.closed:
+                        break
+                    if not headless and cv2.waitKey(1) == ord('q'):
+                        break
+                    continue
+
+                frame, custom_results, pretrained_results = item
+                img = frame.image
+                detections = {}
+                if custom_results is not None:
+                    detections['custom'] = self.draw_results(img, custom_results, self.custom_model.names,
+                                                             color=(255, 0, 0), draw=not headless)
+                detections['pretrained'] = self.draw_results(img, pretrained_results, self.pretrained_model.names,
+                                                             color=(0, 255, 0), draw=not headless)
+                if on_detections is not None:
+                    on_detections(frame, detections)
+
+                # End-to-end lag: from the moment the frame was captured to the moment its detections are shown
+                lag = time.perf_counter() - frame.timestamp
+                lag_stats.add(lag)
+                telemetry.observe('vision.frame_lag', lag)
+                telemetry.count('vision.frames_displayed')
+                if not headless:
+                    cv2.putText(img, f"lag {lag * 1000:.0f} ms", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+                    cv2.imshow('Webcam', img)
+
+                now = time.perf_counter()
+                if now - last_report >= report_interval:
+                    self.report_latency(lag_stats, frame_queue, result_queue)
+                    last_report = now
+
+                if not headless and cv2.waitKey(1) == ord('q'):
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            telemetry.unregister_callback(queue_gauges)
+            capture.stop()
+            frame_queue.close()
+            capture.join(timeout=2)
+            # The inference stage exits once the closed frame queue runs dry, but a frame already in the
+            # models can take seconds on CPU; the engine and the action worker are only released after it
+            inference.join(timeout=2)
+            while inference.is_alive():
+                print("Waiting for the inference stage to finish its current frame...")
+                inference.join(timeout=5)
+            if self.action_worker is not None:
+                self.action_worker.stop()
+            self.engine.close()
+            if not headless:
+                cv2.destroyAllWindows()
+            self.report_latency(lag_stats, frame_queue, result_queue)
+
+    def run_inference_stage(self, frame_queue, result_queue, source=0):
+        self.scheduler = InferenceScheduler(strides=self.inference_strides, motion_threshold=self.motion_threshold,
+                                            max_staleness=self.max_staleness)
+        if self.track_custom:
+            # Only the identities that can be greeted are worth following between full frames
+            names = self.custom_model.names
+            names = names.items() if isinstance(names, dict) else enumerate(names)
+            self.region_detector = RegionDetector(full_frame_interval=self.full_frame_interval,
+                                                  track_classes=[i for i, name in names
+                                                                 if name in self.greeting_identities])
 
         while True:
-            success, img = cap.read()
-            if not success:
-                print("Failed to grab frame")
+            frame = frame_queue.get()
+            if frame is None:
                 break
+            img = frame.image
 
-            # Run inference with custom model
-            if self.custom_model:
-                custom_results = self.custom_model(img, conf=0.1, imgsz=640)
-                self.draw_results(img, custom_results, self.custom_model.names, color=(255, 0, 0))
-
-                # Check for petr detection
-                petr_detected_now = any(self.custom_model.names[int(box.cls[0])] == 'petr' for box in custom_results[0].boxes)
-                if petr_detected_now and not petr_detected:
-                    print("petr detected")
-                    petr_detected = True
-                    # Generate and speak greeting
-                    greeting = self.frontal_lobe.generate_response("Generate a short greeting for petr who just appeared.")
-                    print(f"Generated greeting: {greeting}")
-                    self.frontal_lobe.speak(greeting)
-                elif not petr_detected_now:
-                    petr_detected = False
-
-            # Run inference with pre-trained model
-            pretrained_results = self.pretrained_model(img, conf=0.25, imgsz=640)
-            self.draw_results(img, pretrained_results, self.pretrained_model.names, color=(0, 255, 0))
-
-            cv2.imshow('Webcam', img)
-            if cv2.waitKey(1) == ord('q'):
-                break
+            # Run only the models whose detections are out of date, on one shared preprocessed tensor
+            to_run = self.scheduler.plan(img, list(self.engine.models))
+            telemetry.count('vision.frames_processed')
+            if to_run:
+                with telemetry.span('vision.inference_stage'):
+                    fresh_results = self.run_models(img, to_run)
+                for name, model_results in fresh_results.items():
+                    self.scheduler.update(name, model_results)
+                if self.episodic_log is not None:
+                    self.log_sightings(frame, fresh_results, source)
+            results = self.scheduler.results()
+            custom_results = results.get('custom')
+            pretrained_results = results['pretrained']
 
-        cap.release()
-        cv2.destroyAllWindows()
-
-    def draw_results(self, img, results, names, color):
-        for r in results:
-            boxes = r.boxes
-            for box in boxes:
-                x1, y1, x2, y2 = box.xyxy[0]
-                x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-                cv2.rectangle(img, (x1, y1), (x2, y2), color, 2)
-                confidence = box.conf[0].item()
-                cls = int(box.cls[0])
-                class_name = names[cls] if cls < len(names) else f"Unknown ({cls})"
-                label = f"{class_name} {confidence:.2f}"
-                cv2.putText(img, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
+            # Check for greeted identities (petr); the hysteresis decides when someone has really arrived
+            seen = set()
+            if self.region_detector is not None:
+                names = self.custom_model.names
+                seen = {names[cls] for cls in self.region_detector.present_classes()} & self.greeting_identities
+            elif custom_results is not None:
+                seen = Detections.from_results(custom_results, self.custom_model.names).present(self.greeting_identities)
+            for identity in self.presence.update(seen):
+                print(f"{identity} detected")
+                telemetry.count('vision.arrivals', identity=identity)
+                if self.on_arrival is not None:
+                    self.on_arrival(identity)
+                else:
+                    self.action_worker.submit(self.greet, identity)
+
+            result_queue.put((frame, custom_results, pretrained_results))
+
+        result_queue.close()
+
+    def log_sightings(self, frame, fresh_results, source):
+        # Logged here rather than in the display loop, which only sees the newest result: every model run
+        # is a sighting, and results the scheduler reuses on later frames are not logged again
+        detections = {}
+        for name, model_results in fresh_results.items():
+            spec = self.engine.models[name]
+            detections[name] = Detections.from_results(model_results, spec.names or spec.model.names)
+        # Frame timestamps are perf_counter values; the log keeps wall-clock time
+        captured_at = time.time() - (time.perf_counter() - frame.timestamp)
+        self.episodic_log.append(captured_at, frame.source or source, detections)
+
+    def run_models(self, img, model_names):
+        # Full-frame passes share one preprocessed tensor; tracked custom detections only look at crops
+        if self.region_detector is None or 'custom' not in model_names:
+            return self.engine.infer(img, model_names)
+
+        if self.region_detector.needs_full_frame():
+            fresh = self.engine.infer(img, model_names)
+            fresh['custom'] = self.region_detector.update_full(fresh['custom'])
+            return fresh
+
+        others = [name for name in model_names if name != 'custom']
+        fresh = self.engine.infer(img, others) if others else {}
+        spec = self.engine.models['custom']
+        with telemetry.span('vision.region_detect'):
+            custom_results = self.region_detector.detect_regions(img, spec, self.custom_model.names)
+        if custom_results is None:
+            # A track was lost in its crop, fall back to a full-frame pass
+            custom_results = self.region_detector.update_full(self.engine.infer(img, ['custom'])['custom'])
+        fresh['custom'] = custom_results
+        return fresh
+
+    def greet(self, identity):
+        # Runs on the action worker: LLM round-trip and speech playback
+        with telemetry.span('vision.greet'):
+            # Greetings stay out of the conversation history, so identical ones are served from the cache
+            greeting = self.frontal_lobe.generate_response(f"Generate a short greeting for {identity} who just appeared.",
+                                                           with_history=False)
+            print(f"Generated greeting: {greeting}")
+            self.frontal_lobe.speak(greeting)
+
+    def report_latency(self, lag_stats, frame_queue, result_queue):
+        summary = lag_stats.summary()
+        if summary is None:
+            return
+        print(f"Frame lag over last {len(lag_stats.samples)} frames: "
+              f"mean {summary['mean_ms']:.1f} ms, p50 {summary['p50_ms']:.1f} ms, "
+              f"p95 {summary['p95_ms']:.1f} ms, max {summary['max_ms']:.1f} ms "
+              f"(displayed {summary['frames']}, dropped before inference {frame_queue.dropped}, "
+              f"dropped before display {result_queue.dropped})")
+        if self.scheduler is not None:
+            print(f"Inference scheduling: {self.scheduler.summary()}")
+        if self.region_detector is not None:
+            print(f"Custom model tracking: {self.region_detector.summary()}")
+        self.report_backends()
+
+    def report_backends(self):
+        for spec in self.engine.models.values():
+            if isinstance(spec.model, LazyModel):
+                print(f"Backend: {spec.model.describe()}")
+
+    def draw_results(self, img, results, names, color, draw=True):
+        # Converts the results to arrays once; returns the Detections so callers can reuse them.
+        # With draw=False (headless) only the conversion happens.
+        detections = results if isinstance(results, Detections) else Detections.from_results(results, names)
+        if not draw or not len(detections):
+            return detections
+
+        draw_detections(img, detections, color)
+        return detections
+
+    def process_offline(self, input_path, output_jsonl=None, output_video=None, batch_size=8, decode_workers=4):
+        # Headless replay of a video file or image directory: frames are decoded in parallel, run through
+        # the models batch_size at a time and written out as JSONL detections and/or an annotated video.
+        source = OfflineFrameSource(input_path, decode_workers=decode_workers, prefetch=max(2 * batch_size, 16))
+        writers = []
+        if output_jsonl:
+            writers.append(JsonlDetectionWriter(output_jsonl))
+        if output_video:
+            writers.append(AnnotatedVideoWriter(output_video, self.draw_results, fps=source.fps))
+
+        frames_done = 0
+        start = time.perf_counter()
+        try:
+            for batch in source.batches(batch_size):
+                per_model = self.engine.infer_batch([frame.image for frame in batch])
+                for i, frame in enumerate(batch):
+                    results = {name: model_results[i] for name, model_results in per_model.items()}
+                    for writer in writers:
+                        writer.write(frame, results)
+                frames_done += len(batch)
+        finally:
+            source.close()
+            for writer in writers:
+                writer.close()
+
+        elapsed = time.perf_counter() - start
+        fps = frames_done / elapsed if elapsed > 0 else 0.0
+        print(f"Processed {frames_done} frames from {input_path} in {elapsed:.1f}s ({fps:.1f} FPS)")
+        self.report_backends()
+        return frames_done
 
     def test_custom_model(self, test_image_path):
         if self.custom_model:
@@ -124,6 +1188,7 @@ if __name__ == "__main__":
     custom_model_path = 'runs/detect/custom_petr_model/weights/best.pt'
     data_yaml_path = 'yolo_dataset/data.yaml'
     test_images = False  # Set this to True if you want to run image tests
+    batch_input = None  # Set this to a video file or image directory to run headless batch mode instead of the webcam
 
     try:
         occipital_lobe = OccipitalLobe(custom_model_path=custom_model_path, data_yaml_path=data_yaml_path)
@@ -135,7 +1200,11 @@ if __name__ == "__main__":
                 print(f"\nTesting on image: {img_path}")
                 occipital_lobe.test_custom_model(img_path)
 
-        print("\nStarting live video feed...")
-        occipital_lobe.process_visual_input()
+        if batch_input:
+            occipital_lobe.process_offline(batch_input, output_jsonl='detections.jsonl', output_video='annotated.mp4')
+        else:
+            print("\nStarting live video feed...")
+            occipital_lobe.process_visual_input()
+        occipital_lobe.close()
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
\ No newline at end of file
@@ -0,0 +1,421 @@
+# cerebrum/speech_pipeline.py
+# Long-lived speech recognition pipeline: the microphone is captured continuously into a ring buffer,
+# an energy-based voice-activity detector cuts it into utterances, and each utterance is streamed chunk
+# by chunk to a recognizer backend while the user is still talking, so partial transcripts arrive early.
+# The recognizer is pluggable: Google Cloud streaming recognition for real use, a local offline stand-in
+# for tests and benchmarks.
+
+import os
+import queue
+import sys
+import threading
+import time
+import wave
+from collections import deque
+
+import numpy as np
+
+# Add the project root directory to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from telemetry.telemetry import telemetry
+
+
+class AudioRingBuffer:
+    # Fixed-capacity buffer of 16-bit PCM chunks. The writer never blocks; a reader that falls more
+    # than `capacity` chunks behind loses the oldest audio instead of growing memory.
+    def __init__(self, capacity=500):
+        self.chunks = deque(maxlen=capacity)
+        self.condition = threading.Condition()
+        self.next_seq = 0
+        self.closed = False
+
+    def write(self, chunk):
+        with self.condition:
+            self.chunks.append((self.next_seq, chunk))
+            self.next_seq += 1
+            self.condition.notify_all()
+
+    def read_after(self, seq, timeout=None):
+        # Chunks with a sequence number greater than seq, as a list of (seq, chunk)
+        with self.condition:
+            self.condition.wait_for(lambda: self.next_seq - 1 > seq or self.closed, timeout)
+            return [(s, c) for s, c in self.chunks if s > seq]
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class MicrophoneStream:
+    # Captures mono 16-bit audio with a PyAudio callback straight into a ring buffer
+    def __init__(self, buffer, sample_rate=16000, chunk_ms=30):
+        self.buffer = buffer
+        self.sample_rate = sample_rate
+        self.chunk_frames = int(sample_rate * chunk_ms / 1000)
+        self.audio = None
+        self.stream = None
+
+    def start(self):
+        import pyaudio
+        self.audio = pyaudio.PyAudio()
+        self.stream = self.audio.open(format=pyaudio.paInt16, channels=1, rate=self.sample_rate, input=True,
+                                      frames_per_buffer=self.chunk_frames, stream_callback=self.callback)
+        self.stream.start_stream()
+
+    def callback(self, in_data, frame_count, time_info, status):
+        import pyaudio
+        self.buffer.write(in_data)
+        return None, pyaudio.paContinue
+
+    def stop(self):
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.audio.terminate()
+            self.stream = None
+        self.buffer.close()
+
+
+class WavFileStream:
+    # Feeds a recorded WAV file into the ring buffer, optionally at real-time speed, followed by trailing
+    # silence so the last utterance is closed by the VAD. Stands in for the microphone in tests.
+    def __init__(self, buffer, path, chunk_ms=30, realtime=False, trailing_silence_ms=1000):
+        self.buffer = buffer
+        self.path = path
+        self.chunk_ms = chunk_ms
+        self.realtime = realtime
+        self.trailing_silence_ms = trailing_silence_ms
+        with wave.open(path, 'rb') as wav:
+            self.sample_rate = wav.getframerate()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        chunk_frames = int(self.sample_rate * self.chunk_ms / 1000)
+        with wave.open(self.path, 'rb') as wav:
+            while True:
+                chunk = wav.readframes(chunk_frames)
+                if not chunk:
+                    break
+                self.buffer.write(chunk)
+                if self.realtime:
+                    time.sleep(self.chunk_ms / 1000)
+        silence = b'\x00\x00' * chunk_frames
+        for _ in range(self.trailing_silence_ms // self.chunk_ms):
+            self.buffer.write(silence)
+            if self.realtime:
+                time.sleep(self.chunk_ms / 1000)
+
+    def stop(self):
+        self.buffer.close()
+
+
+class WavPromptStream:
+    # Replays several WAV prompts like a person taking turns: each prompt is fed at real-time speed, then
+    # silence keeps flowing until next_turn() is called (e.g. once the reply has been spoken). All prompts
+    # must share one sample rate. prompt_times records when each prompt started and finished playing.
+    # Leading silence gives the VAD a background level to start from, as a live microphone would.
+    def __init__(self, buffer, paths, chunk_ms=30, leading_silence_ms=300, trailing_silence_ms=1000):
+        self.buffer = buffer
+        self.paths = list(paths)
+        self.chunk_ms = chunk_ms
+        self.leading_silence_ms = leading_silence_ms
+        self.trailing_silence_ms = trailing_silence_ms
+        rates = set()
+        for path in self.paths:
+            with wave.open(path, 'rb') as wav:
+                rates.add(wav.getframerate())
+        if len(rates) > 1:
+            raise ValueError(f"WAV prompts have different sample rates: {sorted(rates)}")
+        self.sample_rate = rates.pop() if rates else 16000
+        self.turn = threading.Event()
+        self.stop_event = threading.Event()
+        self.prompt_times = []
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def next_turn(self):
+        self.turn.set()
+
+    def feed(self, chunk):
+        self.buffer.write(chunk)
+        time.sleep(self.chunk_ms / 1000)
+
+    def run(self):
+        chunk_frames = int(self.sample_rate * self.chunk_ms / 1000)
+        silence = b'\x00\x00' * chunk_frames
+        for _ in range(self.leading_silence_ms // self.chunk_ms):
+            self.feed(silence)
+        for path in self.paths:
+            self.turn.clear()
+            started = time.perf_counter()
+            with wave.open(path, 'rb') as wav:
+                while not self.stop_event.is_set():
+                    chunk = wav.readframes(chunk_frames)
+                    if not chunk:
+                        break
+                    self.feed(chunk)
+            self.prompt_times.append((started, time.perf_counter()))
+            for _ in range(self.trailing_silence_ms // self.chunk_ms):
+                self.feed(silence)
+            while not self.turn.is_set() and not self.stop_event.is_set():
+                self.feed(silence)
+            if self.stop_event.is_set():
+                break
+        self.buffer.close()
+
+    def stop(self):
+        self.stop_event.set()
+        self.buffer.close()
+
+
+class EnergyVAD:
+    # RMS energy detector with an adaptive noise floor: a chunk is speech when its energy is well above
+    # the recent background level (and above an absolute minimum).
+    def __init__(self, ratio=3.0, min_rms=300.0, floor_adapt=0.05):
+        self.ratio = ratio
+        self.min_rms = min_rms
+        self.floor_adapt = floor_adapt
+        self.noise_floor = None
+
+    def is_speech(self, chunk):
+        samples = np.frombuffer(chunk, dtype=np.int16).astype(np.float32)
+        rms = float(np.sqrt(np.mean(samples * samples))) if len(samples) else 0.0
+        if self.noise_floor is None:
+            self.noise_floor = rms
+        speech = rms > max(self.min_rms, self.noise_floor * self.ratio)
+        if not speech:
+            self.noise_floor += self.floor_adapt * (rms - self.noise_floor)
+        return speech
+
+
+class GoogleStreamingRecognizer:
+    # Google Cloud streaming recognition. The client (and its gRPC channel) is created once and reused
+    # for every utterance; each utterance is one streaming_recognize call fed from a chunk queue.
+    def __init__(self, service_account_file, language_code="en-US"):
+        from google.cloud import speech
+        from google.oauth2 import service_account
+
+        self.speech = speech
+        credentials = service_account.Credentials.from_service_account_file(service_account_file)
+        self.client = speech.SpeechClient(credentials=credentials)
+        self.language_code = language_code
+
+    def start_utterance(self, sample_rate, on_partial=None):
+        return GoogleStreamingSession(self, sample_rate, on_partial)
+
+
+class GoogleStreamingSession:
+    def __init__(self, recognizer, sample_rate, on_partial):
+        speech = recognizer.speech
+        self.chunks = queue.Queue()
+        self.on_partial = on_partial
+        self.final_parts = []
+        self.error = None
+        config = speech.StreamingRecognitionConfig(
+            config=speech.RecognitionConfig(
+                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+                sample_rate_hertz=sample_rate,
+                language_code=recognizer.language_code
+            ),
+            interim_results=True
+        )
+        self.thread = threading.Thread(target=self.run, args=(recognizer, config), daemon=True)
+        self.thread.start()
+
+    def requests(self, speech):
+        while True:
+            chunk = self.chunks.get()
+            if chunk is None:
+                return
+            yield speech.StreamingRecognizeRequest(audio_content=chunk)
+
+    def run(self, recognizer, config):
+        try:
+            responses = recognizer.client.streaming_recognize(config, self.requests(recognizer.speech))
+            for response in responses:
+                for result in response.results:
+                    text = result.alternatives[0].transcript if result.alternatives else ""
+                    if result.is_final:
+                        self.final_parts.append(text.strip())
+                    elif self.on_partial:
+                        self.on_partial(" ".join(self.final_parts + [text.strip()]).strip())
+        except Exception as e:
+            self.error = e
+
+    def feed(self, chunk):
+        self.chunks.put(chunk)
+
+    def finish(self):
+        self.chunks.put(None)
+        self.thread.join()
+        if self.error is not None:
+            print(f"Speech recognition failed: {self.error}")
+        return " ".join(p for p in self.final_parts if p)
+
+
+class OfflineRecognizer:
+    # Local stand-in with no network: emits a partial transcript every partial_ms of audio and returns the
+    # next scripted transcript as the final result (or a description of the utterance if no script is given).
+    def __init__(self, transcripts=None, partial_ms=300):
+        self.transcripts = deque(transcripts or [])
+        self.partial_ms = partial_ms
+
+    def start_utterance(self, sample_rate, on_partial=None):
+        final = self.transcripts.popleft() if self.transcripts else None
+        return OfflineSession(sample_rate, on_partial, final, self.partial_ms)
+
+
+class OfflineSession:
+    def __init__(self, sample_rate, on_partial, final, partial_ms):
+        self.sample_rate = sample_rate
+        self.on_partial = on_partial
+        self.final = final
+        self.partial_ms = partial_ms
+        self.samples = 0
+        self.next_partial = partial_ms
+
+    def duration_ms(self):
+        return 1000 * self.samples / self.sample_rate
+
+    def feed(self, chunk):
+        self.samples += len(chunk) // 2
+        if self.on_partial and self.duration_ms() >= self.next_partial:
+            self.next_partial += self.partial_ms
+            if self.final:
+                words = self.final.split()
+                # Reveal the scripted transcript word by word as audio comes in
+                shown = max(1, int(len(words) * min(1.0, self.duration_ms() / (self.partial_ms * len(words)))))
+                self.on_partial(" ".join(words[:shown]))
+            else:
+                self.on_partial(f"[speech {self.duration_ms():.0f} ms]")
+
+    def finish(self):
+        return self.final if self.final is not None else f"[utterance {self.duration_ms():.0f} ms]"
+
+
+class SpeechPipeline:
+    # Reads the ring buffer, segments utterances with the VAD and streams each one to the recognizer.
+    # Final transcripts are queued for next_transcript(); on_partial gets interim text as it arrives.
+    def __init__(self, source, buffer, recognizer, sample_rate=16000, chunk_ms=30, vad=None, on_partial=None,
+                 start_ms=90, end_silence_ms=600, pre_roll_ms=300, max_utterance_s=15.0):
+        self.source = source
+        self.buffer = buffer
+        self.recognizer = recognizer
+        self.sample_rate = sample_rate
+        self.vad = vad or EnergyVAD()
+        self.on_partial = on_partial
+        self.start_chunks = max(1, start_ms // chunk_ms)
+        self.end_chunks = max(1, end_silence_ms // chunk_ms)
+        self.pre_roll = deque(maxlen=max(1, pre_roll_ms // chunk_ms))
+        self.max_chunks = int(max_utterance_s * 1000 / chunk_ms)
+        self.transcripts = queue.Queue()
+        self.stop_event = threading.Event()
+        self.thread = None
+        # Per-utterance timing, used by latency harnesses: speech start, speech end, final transcript
+        self.utterance_times = deque(maxlen=100)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.source.start()
+        return self
+
+    def run(self):
+        seq = -1
+        session = None
+        speech_run = 0
+        silence_run = 0
+        utterance_chunks = 0
+        started_at = None
+
+        while not self.stop_event.is_set():
+            chunks = self.buffer.read_after(seq, timeout=0.1)
+            if not chunks and self.buffer.closed:
+                break
+            for seq, chunk in chunks:
+                speech = self.vad.is_speech(chunk)
+
+                if session is None:
+                    self.pre_roll.append(chunk)
+                    speech_run = speech_run + 1 if speech else 0
+                    if speech_run >= self.start_chunks:
+                        # Utterance onset: stream the pre-roll so the first syllable isn't clipped
+                        started_at = time.perf_counter()
+                        session = self.recognizer.start_utterance(self.sample_rate, self.on_partial)
+                        for buffered in self.pre_roll:
+                            session.feed(buffered)
+                        utterance_chunks = len(self.pre_roll)
+                        self.pre_roll.clear()
+                        silence_run = 0
+                    continue
+
+                session.feed(chunk)
+                utterance_chunks += 1
+                silence_run = 0 if speech else silence_run + 1
+                if silence_run >= self.end_chunks or utterance_chunks >= self.max_chunks:
+                    ended_at = time.perf_counter()
+                    transcript = session.finish().strip()
+                    finished_at = time.perf_counter()
+                    self.utterance_times.append((started_at, ended_at, finished_at))
+                    telemetry.count('speech.utterances')
+                    telemetry.observe('speech.utterance', ended_at - started_at)
+                    telemetry.observe('speech.final_transcript', finished_at - ended_at)
+                    if transcript:
+                        self.transcripts.put(transcript)
+                    session = None
+                    speech_run = 0
+
+        if session is not None:
+            transcript = session.finish().strip()
+            if transcript:
+                self.transcripts.put(transcript)
+        self.transcripts.put(None)
+
+    def next_transcript(self, timeout=None):
+        # Blocks until the next final transcript; None when the pipeline has stopped or on timeout
+        try:
+            return self.transcripts.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stop(self):
+        self.stop_event.set()
+        self.source.stop()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+
+
+def microphone_pipeline(recognizer, sample_rate=16000, chunk_ms=30, on_partial=None, **kwargs):
+    buffer = AudioRingBuffer()
+    source = MicrophoneStream(buffer, sample_rate=sample_rate, chunk_ms=chunk_ms)
+    return SpeechPipeline(source, buffer, recognizer, sample_rate=sample_rate, chunk_ms=chunk_ms, on_partial=on_partial, **kwargs)
+
+
+def wav_pipeline(path, recognizer, chunk_ms=30, realtime=False, on_partial=None, **kwargs):
+    buffer = AudioRingBuffer(capacity=100000)
+    source = WavFileStream(buffer, path, chunk_ms=chunk_ms, realtime=realtime)
+    return SpeechPipeline(source, buffer, recognizer, sample_rate=source.sample_rate, chunk_ms=chunk_ms,
+                          on_partial=on_partial, **kwargs)
+
+
+def wav_prompt_pipeline(paths, recognizer, chunk_ms=30, on_partial=None, **kwargs):
+    # The WavPromptStream is available as pipeline.source (call next_turn() after each reply)
+    buffer = AudioRingBuffer(capacity=2000)
+    source = WavPromptStream(buffer, paths, chunk_ms=chunk_ms)
+    return SpeechPipeline(source, buffer, recognizer, sample_rate=source.sample_rate, chunk_ms=chunk_ms,
+                          on_partial=on_partial, **kwargs)
+
+
+def default_recognizer():
+    service_account_file = os.path.join(os.path.dirname(__file__), 'graym-426618-3e2d718be5f8.json')
+    return GoogleStreamingRecognizer(service_account_file)
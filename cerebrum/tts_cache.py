@@ -0,0 +1,118 @@
+# cerebrum/tts_cache.py
+# Content-addressed disk cache for synthesized speech. Clips are stored under the SHA-256 of
+# (text, voice params, audio config), so repeated phrases play without a synthesis round-trip.
+# The cache is bounded by total size and evicts the least recently used clips first.
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class TTSCache:
+    def __init__(self, cache_dir='tts_cache', max_bytes=200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self.load_index()
+
+    def load_index(self):
+        # Rebuild the LRU order from file modification times, which are bumped on every hit
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.audio'):
+                path = os.path.join(self.cache_dir, name)
+                stat = os.stat(path)
+                files.append((stat.st_mtime, name[:-len('.audio')], stat.st_size))
+        for _, key, size in sorted(files):
+            self.entries[key] = size
+            self.total_bytes += size
+
+    @staticmethod
+    def make_key(text, *params):
+        # params: anything JSON-serializable describing how the audio was produced (voice, audio config)
+        payload = json.dumps([text] + list(params), sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key + '.audio')
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        path = self.path_for(key)
+        try:
+            with open(path, 'rb') as f:
+                audio = f.read()
+            os.utime(path)
+            return audio
+        except OSError:
+            # Removed behind our back (another process evicted it); treat as a miss
+            with self.lock:
+                self.total_bytes -= self.entries.pop(key, 0)
+                self.hits -= 1
+                self.misses += 1
+            return None
+
+    def put(self, key, audio):
+        # Write to a temporary file first so readers never see a partial clip
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(audio)
+        os.replace(tmp_path, self.path_for(key))
+
+        with self.lock:
+            self.total_bytes -= self.entries.pop(key, 0)
+            self.entries[key] = len(audio)
+            self.total_bytes += len(audio)
+            evicted = []
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                old_key, size = self.entries.popitem(last=False)
+                self.total_bytes -= size
+                self.evictions += 1
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.remove(self.path_for(old_key))
+            except OSError:
+                pass
+
+    def get_or_synthesize(self, key, synthesize):
+        audio = self.get(key)
+        if audio is None:
+            audio = synthesize()
+            self.put(key, audio)
+        return audio
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+                'evictions': self.evictions,
+            }
+
+
+# Usage example
+if __name__ == "__main__":
+    cache = TTSCache(cache_dir='tts_cache_example', max_bytes=1024)
+    key = TTSCache.make_key("Hello petr", {'language_code': 'en-US'})
+    print(len(cache.get_or_synthesize(key, lambda: b'fake audio' * 10)))
+    print(len(cache.get_or_synthesize(key, lambda: b'fake audio' * 10)))
+    print("Cache stats:", cache.stats())
@@ -0,0 +1,288 @@
+# limbic_system/hippocampus.py
+# Memory formation and recall: a hot tier of working memory in process over long-term storage in SQLite
+# (memory/memory_storage.py). New memories and memories that are used go into the hot tier; recall is
+# served from it first and only falls back to storage on a miss. Eviction is LRU with a second chance
+# for frequently recalled memories, and is bounded by entry count and estimated bytes. Consolidation
+# writes hot memories to storage on a background thread in batches: evicted ones immediately, the rest
+# once they are older than max_age, so nothing stays unwritten for long and the hot path never waits
+# on disk.
+#
+# Storage ids only exist once a memory is committed, so a new memory gets a provisional id (negative)
+# until then. recall() accepts either; once the memory is written, the hot tier hands out the storage
+# id and resolve() maps the provisional one to it. A memory stays pending, and is written again with
+# the next consolidation, until storage confirms the write.
+
+import heapq
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Add the project root directory to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from memory.memory_storage import DEFAULT_KIND, Memory, MemoryStorage, MemoryWriteError
+from telemetry.telemetry import telemetry
+
+# Estimated per-entry overhead of the hot tier (record, dict slot, bookkeeping) on top of the text
+ENTRY_OVERHEAD = 200
+
+# How many provisional ids of written memories resolve() remembers (two ints each)
+RESOLVED_IDS = 100000
+
+
+class HotEntry:
+    __slots__ = ('memory', 'size', 'hits', 'consolidated')
+
+    def __init__(self, memory, consolidated):
+        self.memory = memory
+        self.size = ENTRY_OVERHEAD + len(memory.data or '')
+        self.hits = 0
+        self.consolidated = consolidated
+
+
+class Hippocampus:
+    def __init__(self, storage=None, capacity=10000, max_bytes=32 * 1024 * 1024, max_age=30.0,
+                 consolidate_interval=1.0, batch_size=500):
+        # storage: shared MemoryStorage; one is opened (and closed with the hippocampus) if not given
+        self.owns_storage = storage is None
+        self.storage = storage or MemoryStorage()
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.consolidate_interval = consolidate_interval
+        self.batch_size = batch_size
+
+        self.lock = threading.Lock()
+        self.consolidate_lock = threading.Lock()  # one consolidation at a time, so nothing is written twice
+        self.hot = OrderedDict()      # key -> HotEntry, least recently used first; the key is the id the
+                                      # memory had when it entered (provisional for formed memories)
+        self.hot_bytes = 0
+        self.evicted = {}             # provisional id -> Memory, evicted but not yet written; still recallable
+        self.keys = {}                # storage id -> provisional key, for written memories still in the hot tier
+        self.resolved = OrderedDict() # provisional id -> storage id, for the last RESOLVED_IDS written memories
+        self.next_key = -1
+        # Every memory outside the hot tier is at most this old, so newer hot memories answer recent().
+        # This holds as long as memories are formed through the hippocampus rather than stored directly.
+        newest = self.storage.recent(1)
+        self.horizon = newest[0].created_at if newest else float('-inf')
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.consolidated = 0
+        self.consolidations = 0
+        self.lag_last = 0.0
+        self.lag_max = 0.0
+
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+        self.consolidator = threading.Thread(target=self.consolidate_loop, name='hippocampus-consolidation',
+                                             daemon=True)
+        self.consolidator.start()
+        telemetry.register_callback(self.telemetry_gauges)
+
+    def remember(self, data, kind=DEFAULT_KIND, timestamp=None):
+        # Forms a memory in the hot tier; it reaches storage with the next consolidation. Returns its
+        # provisional id.
+        with self.lock:
+            key = self.next_key
+            self.next_key -= 1
+            self.insert(Memory(key, kind, time.time() if timestamp is None else timestamp, data), consolidated=False)
+        return key
+
+    def resolve(self, memory_id):
+        # Storage id of a memory, or None while it is not written yet (or was written too long ago to
+        # be remembered here)
+        if memory_id >= 0:
+            return memory_id
+        with self.lock:
+            entry = self.hot.get(memory_id)
+            if entry is not None:
+                return entry.memory.id if entry.consolidated else None
+            return self.resolved.get(memory_id)
+
+    def insert(self, memory, consolidated):
+        entry = HotEntry(memory, consolidated)
+        old = self.hot.pop(memory.id, None)
+        if old is not None:
+            self.hot_bytes -= old.size
+        self.hot[memory.id] = entry
+        self.hot_bytes += entry.size
+        self.evict()
+
+    def evict(self):
+        # Second chance: a recalled entry at the LRU end is moved back with its hit count halved
+        while self.hot and (len(self.hot) > self.capacity or self.hot_bytes > self.max_bytes):
+            memory_id, entry = next(iter(self.hot.items()))
+            if entry.hits > 1 and len(self.hot) > 1:
+                entry.hits //= 2
+                self.hot.move_to_end(memory_id)
+                continue
+            del self.hot[memory_id]
+            self.hot_bytes -= entry.size
+            self.evictions += 1
+            self.horizon = max(self.horizon, entry.memory.created_at)
+            if entry.memory.id != memory_id:
+                del self.keys[entry.memory.id]
+            if not entry.consolidated:
+                self.evicted[memory_id] = entry.memory
+        if len(self.evicted) >= self.batch_size:
+            self.wakeup.set()
+
+    def recall(self, memory_id):
+        # Memory by storage or provisional id: hot tier, then not-yet-written evictions, then storage
+        # (the result is promoted)
+        with self.lock:
+            key = self.keys.get(memory_id, memory_id)
+            entry = self.hot.get(key)
+            if entry is not None:
+                entry.hits += 1
+                self.hot.move_to_end(key)
+                self.hits += 1
+                return entry.memory
+            memory = self.evicted.get(key)
+            if memory is not None:
+                self.hits += 1
+                return memory
+            self.misses += 1
+            if memory_id < 0:
+                memory_id = self.resolved.get(memory_id)
+                if memory_id is None:
+                    return None
+        with telemetry.span('hippocampus.recall_storage'):
+            found = self.storage.fetch([memory_id])
+        if not found:
+            return None
+        with self.lock:
+            if memory_id not in self.hot and memory_id not in self.keys:
+                self.insert(found[0], consolidated=True)
+        return found[0]
+
+    def recent(self, limit=10, kind=None):
+        # Newest memories first. Hot memories newer than the horizon are the newest overall, so the
+        # answer comes from the hot tier whenever it holds enough of them; otherwise from storage.
+        with self.lock:
+            candidates = [entry.memory for entry in self.hot.values()
+                          if entry.memory.created_at > self.horizon and (kind is None or entry.memory.kind == kind)]
+            if len(candidates) >= limit:
+                self.hits += 1
+                return heapq.nlargest(limit, candidates, key=lambda memory: (memory.created_at, memory.id))
+            self.misses += 1
+        # Storage has everything except memories that are still unwritten
+        try:
+            self.consolidate()
+        except MemoryWriteError as e:
+            print(f"Memory consolidation failed, recent memories may be missing: {e}")
+        with telemetry.span('hippocampus.recent_storage'):
+            return self.storage.recent(limit, kind)
+
+    def due(self, everything=False):
+        # Memories to write now: evicted ones, plus hot ones older than max_age (all still provisional)
+        cutoff = time.time() - self.max_age
+        with self.lock:
+            batch = list(self.evicted.values())
+            for entry in self.hot.values():
+                if not entry.consolidated and (everything or entry.memory.created_at <= cutoff):
+                    batch.append(entry.memory)
+        return batch
+
+    def consolidate(self, everything=True):
+        # Writes due memories to storage and waits until they are committed; returns how many were
+        # written. Memories whose write failed stay pending and are retried next time.
+        with self.consolidate_lock:
+            batch = self.due(everything)
+            if not batch:
+                return 0
+            error = None
+            with telemetry.span('hippocampus.consolidate'):
+                written = self.storage.store_many(batch, handled=True)
+                self.storage.flush(report=False)
+                try:
+                    ids = written.result()
+                except MemoryWriteError as e:
+                    ids, error = e.ids, e
+            written = [(memory, memory_id) for memory, memory_id in zip(batch, ids) if memory_id is not None]
+            with self.lock:
+                for memory, memory_id in written:
+                    self.evicted.pop(memory.id, None)
+                    entry = self.hot.get(memory.id)
+                    if entry is not None:
+                        entry.memory = memory._replace(id=memory_id)
+                        entry.consolidated = True
+                        self.keys[memory_id] = memory.id
+                    self.resolved[memory.id] = memory_id
+                while len(self.resolved) > RESOLVED_IDS:
+                    self.resolved.popitem(last=False)
+                if written:
+                    lag = time.time() - min(memory.created_at for memory, _ in written)
+                    self.consolidated += len(written)
+                    self.consolidations += 1
+                    self.lag_last = lag
+                    self.lag_max = max(self.lag_max, lag)
+            if error is not None:
+                raise error
+            return len(written)
+
+    def consolidate_loop(self):
+        while not self.stop_event.is_set():
+            self.wakeup.wait(self.consolidate_interval)
+            self.wakeup.clear()
+            try:
+                self.consolidate(everything=False)
+            except Exception as e:
+                print(f"Memory consolidation failed: {e}")
+
+    def stats(self):
+        with self.lock:
+            pending = len(self.evicted) + sum(1 for entry in self.hot.values() if not entry.consolidated)
+            requests = self.hits + self.misses
+            return {
+                'hot_entries': len(self.hot),
+                'hot_bytes': self.hot_bytes,
+                'pending_consolidation': pending,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else 0.0,
+                'evictions': self.evictions,
+                'consolidated': self.consolidated,
+                'consolidations': self.consolidations,
+                'consolidation_lag_s': round(self.lag_last, 3),
+                'consolidation_lag_max_s': round(self.lag_max, 3),
+            }
+
+    def telemetry_gauges(self):
+        stats = self.stats()
+        return [(f'hippocampus.{name}', {}, value) for name, value in stats.items()]
+
+    def close(self):
+        # Everything still in working memory is written before the storage is released
+        self.stop_event.set()
+        self.wakeup.set()
+        self.consolidator.join(timeout=5)
+        try:
+            self.consolidate()
+        finally:
+            telemetry.unregister_callback(self.telemetry_gauges)
+            if self.owns_storage:
+                self.storage.close()
+
+
+# Usage example
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as workdir:
+        hippocampus = Hippocampus(MemoryStorage(os.path.join(workdir, 'memory.db')), capacity=3, max_age=1.0)
+        ids = [hippocampus.remember(f"Observation {i}") for i in range(5)]
+        print("Recall from the hot tier:", hippocampus.recall(ids[-1]))
+        print("Recall of an evicted memory:", hippocampus.recall(ids[0]))
+        print("Most recent:", [memory.data for memory in hippocampus.recent(2)])
+        time.sleep(1.5)
+        print("Stored as:", [hippocampus.resolve(memory_id) for memory_id in ids])
+        print("Hippocampus stats:", hippocampus.stats())
+        hippocampus.close()
+        print("Stored in long-term memory:", hippocampus.storage.count())
+        hippocampus.storage.close()
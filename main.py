@@ -7,40 +7,62 @@ import os
 project_root = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(project_root)
 
-from thalamus.thalamus import Thalamus
+# Imported first so the startup profile starts with the process
+from telemetry.startup import startup
+
+with startup.measure('thalamus.thalamus', kind='import'):
+    from thalamus.thalamus import Thalamus
 from memory.memory_storage import MemoryStorage
-import threading
+from memory.visual_log import VisualEpisodicLog
+from telemetry.telemetry import telemetry
+import asyncio
 
-def auditory_processing_thread(thalamus):
-    thalamus.process_auditory_and_generate_response()
+def main(use_voice=True, text_only=False, vision=True):
+    # Metrics are off unless GRAYM_METRICS_PORT (Prometheus text at /metrics) or GRAYM_METRICS_JSONL is set
+    metrics_port = os.getenv('GRAYM_METRICS_PORT')
+    metrics_jsonl = os.getenv('GRAYM_METRICS_JSONL')
+    if metrics_port or metrics_jsonl:
+        telemetry.configure(prometheus_port=int(metrics_port) if metrics_port else None, jsonl_path=metrics_jsonl)
 
-def main(use_voice=True):
-    # Initialize thalamus with the use_voice parameter
-    thalamus = Thalamus(use_voice=use_voice)
+    # Everything the visual lobe detects is logged, so "when was petr last seen" can be answered later
+    episodic_log = None
+    if vision and not text_only:
+        episodic_log = VisualEpisodicLog(os.path.join(project_root, 'visual_log'))
 
-    # Perform speech before processing auditory input
-    # thalamus.perform_speech("System activated. Ready to tackle today's tasks!")
+    # Initialize thalamus with the use_voice parameter; text_only never imports the vision or speech stacks
+    thalamus = Thalamus(use_voice=use_voice, text_only=text_only, vision=vision, episodic_log=episodic_log)
 
-    # Start thread for auditory processing
-    auditory_thread = threading.Thread(target=auditory_processing_thread, args=(thalamus,))
-    auditory_thread.start()
+    # Clients and models initialize in parallel in the background; the startup profile is printed when done
+    thalamus.warm_up()
 
-    # Process visual input in the main thread
-    thalamus.relay_visual_input()
+    # Perform speech before processing auditory input
+    # thalamus.perform_speech("System activated. Ready to tackle today's tasks!")
 
-    # Wait for the auditory thread to complete
-    auditory_thread.join()
+    # Visual, auditory and response processing run concurrently on the thalamus event loop
+    # until the lobes finish or Ctrl+C is pressed; shutdown stops every lobe cleanly
+    try:
+        asyncio.run(thalamus.run())
+    except KeyboardInterrupt:
+        pass
 
     # Relay sensory data through thalamus and process in parietal lobe
     sensory_data = "Sensory data from skin"
     relayed_sensory = thalamus.relay_sensory_input(sensory_data)
+    thalamus.close()
 
     # Memory storage example
     memory_storage = MemoryStorage()
     memory_storage.store_learning('Learning to solve problem X')
+    memory_storage.flush()
     learning_data = memory_storage.retrieve_learning()
     print("Retrieved learning data:", learning_data)
     memory_storage.close()
+    if episodic_log is not None:
+        print("Visual log:", episodic_log.stats())
+        episodic_log.close()
+    telemetry.close()
 
 if __name__ == "__main__":
-    main(use_voice=True)  # Set use_voice to True or False as needed
+    # python main.py [--text-only] [--no-vision] [--no-voice]
+    main(use_voice='--no-voice' not in sys.argv, text_only='--text-only' in sys.argv,
+         vision='--no-vision' not in sys.argv)
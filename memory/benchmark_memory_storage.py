@@ -0,0 +1,112 @@
+# benchmark_memory_storage.py
+# Write and read throughput of MemoryStorage on large tables: the old commit-per-row insert against
+# group commit, then page reads at the start and end of the table, time-range and kind-filtered
+# queries, the most recent memories and a full generator scan. Runs on a temporary database.
+#
+# Usage:
+#   python memory/benchmark_memory_storage.py --rows 1000000
+#   python memory/benchmark_memory_storage.py --rows 5000000 --batch-size 5000 --output memory.json
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+# Add the project root directory to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from memory.memory_storage import MemoryStorage
+
+KINDS = ('learning', 'transcript', 'response', 'arrival')
+
+
+def timed(fn, repeats=1):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return (time.perf_counter() - start) / repeats, result
+
+
+def per_row_commit(path, rows):
+    # The previous store_learning: one INSERT and one commit per memory, default journal
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE IF NOT EXISTS learning (id INTEGER PRIMARY KEY, data TEXT)')
+    start = time.perf_counter()
+    for i in range(rows):
+        connection.execute('INSERT INTO learning (data) VALUES (?)', (f"memory {i}",))
+        connection.commit()
+    elapsed = time.perf_counter() - start
+    connection.close()
+    return elapsed
+
+
+def run_benchmark(rows, batch_size, baseline_rows, repeats, workdir):
+    results = {'rows': rows, 'batch_size': batch_size}
+
+    elapsed = per_row_commit(os.path.join(workdir, 'baseline.db'), baseline_rows)
+    results['insert_per_row_commit'] = {'rows': baseline_rows, 'rows_per_s': round(baseline_rows / elapsed)}
+    print(f"commit per row:  {baseline_rows / elapsed:12,.0f} rows/s ({baseline_rows} rows)")
+
+    storage = MemoryStorage(os.path.join(workdir, 'memory.db'), batch_size=batch_size, flush_interval=0)
+    # One memory per second of simulated history, ending now
+    origin = time.time() - rows
+    start = time.perf_counter()
+    storage.store_many((f"memory {i}", KINDS[i % len(KINDS)], origin + i) for i in range(rows))
+    storage.flush()
+    elapsed = time.perf_counter() - start
+    results['insert_group_commit'] = {'rows': rows, 'rows_per_s': round(rows / elapsed)}
+    print(f"group commit:    {rows / elapsed:12,.0f} rows/s ({rows} rows)")
+
+    queries = {
+        'first_page': lambda: storage.page(limit=100),
+        'last_page': lambda: storage.page(since=origin + rows - 100, limit=100),
+        'recent_10': lambda: storage.recent(10),
+        'recent_10_kind': lambda: storage.recent(10, kind='arrival'),
+        'hour_range': lambda: storage.page(since=origin + rows // 2, until=origin + rows // 2 + 3600, limit=5000),
+        'hour_range_kind': lambda: storage.page(kind='transcript', since=origin + rows // 2,
+                                                until=origin + rows // 2 + 3600, limit=5000),
+        'count_hour': lambda: storage.count(since=origin + rows // 2, until=origin + rows // 2 + 3600),
+    }
+    for name, query in queries.items():
+        elapsed, _ = timed(query, repeats)
+        results[name] = {'ms': round(elapsed * 1000, 3)}
+        print(f"{name:<16} {elapsed * 1000:10.3f} ms")
+
+    # Walking pages deep into the table costs the same per page as the first one
+    memories, cursor = storage.page(since=origin + rows - 10000, limit=1000)
+    elapsed, _ = timed(lambda: storage.page(limit=1000, after=cursor), repeats)
+    results['deep_page_1000'] = {'ms': round(elapsed * 1000, 3)}
+    print(f"{'deep_page_1000':<16} {elapsed * 1000:10.3f} ms")
+
+    start = time.perf_counter()
+    scanned = sum(1 for _ in storage.iter_memories(page_size=5000))
+    elapsed = time.perf_counter() - start
+    results['full_scan'] = {'rows': scanned, 'rows_per_s': round(scanned / elapsed)}
+    print(f"full scan:       {scanned / elapsed:12,.0f} rows/s ({scanned} rows)")
+
+    storage.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MemoryStorage write/read benchmark")
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--baseline-rows', type=int, default=2000, help="Rows for the commit-per-row baseline")
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--output', help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run_benchmark(args.rows, args.batch_size, args.baseline_rows, args.repeats, workdir)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
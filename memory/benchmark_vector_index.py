@@ -0,0 +1,102 @@
+# benchmark_vector_index.py
+# Query latency of the semantic memory index at 10^5 and 10^6 memories: single-query and batched top-k,
+# incremental inserts, save/load, and how fast the hashing embedder turns text into vectors. The index
+# is filled with random unit vectors, so no embedding model or database is needed.
+#
+# Usage:
+#   python memory/benchmark_vector_index.py
+#   python memory/benchmark_vector_index.py --sizes 100000 1000000 --dim 1536 --output vectors.json
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add the project root directory to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from memory.vector_index import HashingEmbedder, VectorIndex, normalize
+
+
+def latency(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    values = np.asarray(samples) * 1000
+    return {'p50_ms': round(float(np.percentile(values, 50)), 3), 'p95_ms': round(float(np.percentile(values, 95)), 3)}
+
+
+def build(size, dim, spare=0, chunk=100000, seed=0):
+    rng = np.random.default_rng(seed)
+    index = VectorIndex(dim, capacity=size + spare)
+    start = time.perf_counter()
+    for offset in range(0, size, chunk):
+        n = min(chunk, size - offset)
+        index.add(np.arange(offset, offset + n), normalize(rng.standard_normal((n, dim), dtype=np.float32)))
+    return index, time.perf_counter() - start
+
+
+def run_benchmark(sizes, dim, k, repeats, batch, workdir):
+    rng = np.random.default_rng(1)
+    results = {'dim': dim, 'k': k, 'sizes': {}}
+
+    embedder = HashingEmbedder(dim)
+    texts = [f"memory number {i} about the kitchen, the robot arm and Petr's tea" for i in range(2000)]
+    start = time.perf_counter()
+    embedder.embed(texts)
+    results['hashing_embedder_texts_per_s'] = round(len(texts) / (time.perf_counter() - start))
+    print(f"hashing embedder: {results['hashing_embedder_texts_per_s']:,} texts/s")
+
+    for size in sizes:
+        index, elapsed = build(size, dim, spare=repeats)
+        queries = normalize(rng.standard_normal((batch, dim), dtype=np.float32))
+        row = {
+            'build_rows_per_s': round(size / elapsed),
+            'megabytes': round(index.vectors[:len(index)].nbytes / 2 ** 20, 1),
+            'query': latency(lambda: index.search(queries[0], k), repeats),
+            f'batch_{batch}_per_query': {key: round(value / batch, 3) for key, value in
+                                         latency(lambda: index.search(queries, k), max(3, repeats // 10)).items()},
+            # Incremental update: one new memory arriving in an index of this size
+            'insert_one': latency(lambda: index.add([size], queries[:1]), repeats),
+        }
+        path = os.path.join(workdir, f'index_{size}')
+        start = time.perf_counter()
+        index.save(path)
+        row['save_s'] = round(time.perf_counter() - start, 3)
+        del index
+        start = time.perf_counter()
+        VectorIndex.load(path)
+        row['load_s'] = round(time.perf_counter() - start, 3)
+        results['sizes'][size] = row
+        print(f"{size:>9,} memories ({row['megabytes']} MB): query p50 {row['query']['p50_ms']} ms "
+              f"p95 {row['query']['p95_ms']} ms, batched p50 {row[f'batch_{batch}_per_query']['p50_ms']} ms/query, "
+              f"insert p50 {row['insert_one']['p50_ms']} ms, save {row['save_s']}s, load {row['load_s']}s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vector index benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--batch', type=int, default=32, help="Queries per batched search")
+    parser.add_argument('--output', help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run_benchmark(args.sizes, args.dim, args.k, args.repeats, args.batch, workdir)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,490 @@
 # memory/memory_storage.py
+# Long-term memory in SQLite, shared by every lobe. Writes are queued to a single writer thread and
+# committed in groups (when batch_size rows are pending or flush_interval seconds have passed), reads
+# use a bounded pool of connections, the database runs in WAL mode so reads don't wait on writes, and
+# every memory carries a kind and a timestamp, both indexed. Reads are paginated by keyset
+# (created_at, id), so a page costs the same at row ten as at row ten million, and iter_memories()
+# streams a whole range page by page instead of loading the table.
+#
+# Ids are assigned by SQLite when a memory is committed, so any number of MemoryStorage instances (or
+# processes) can write to one database; store_learning() and store_many() return futures of the ids.
+# Every commit also stamps its rows with the next commit_seq, which lets incremental consumers
+# (memories_after) follow commit order even when an older memory is written after newer ones.
 
+import queue
 import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+
+Memory = namedtuple('Memory', ['id', 'kind', 'created_at', 'data'])
+
+DEFAULT_KIND = 'learning'
+
+INSERT = 'INSERT INTO learning (data, kind, created_at, commit_seq) VALUES (?, ?, ?, ?)'
+
+
+class MemoryWriteError(Exception):
+    # Raised when memories could not be written; rows are the Memory records that were not stored (id
+    # None), so the caller can retry them (store_many(rows)) or keep them elsewhere. Set on a write's
+    # future, ids holds what it would have returned, with None for the rows that failed.
+    def __init__(self, message, rows, ids=None):
+        super().__init__(message)
+        self.rows = rows
+        self.ids = ids
+
+
+# A queued write: rows of (data, kind, created_at), the future of their ids, and whether the caller
+# handles a failure itself (checks the future) instead of leaving it to flush()
+PendingWrite = namedtuple('PendingWrite', ['rows', 'future', 'handled'])
+
+# A flush() waiting for the writer; with report False it leaves failures to the next reporting flush
+FlushRequest = namedtuple('FlushRequest', ['future', 'report'])
+
+
+def gather(futures, single=False):
+    # One future over the ids of several writes, in order; fails with the failed rows of all of them
+    if len(futures) == 1 and not single:
+        return futures[0]
+    result = Future()
+    lock = threading.Lock()
+    remaining = [len(futures)]
+
+    def done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        ids, failed = [], []
+        for future in futures:
+            error = future.exception()
+            if error is None:
+                ids.extend(future.result())
+            else:
+                ids.extend(error.ids)
+                failed.extend(error.rows)
+        if failed:
+            result.set_exception(MemoryWriteError(f"{len(failed)} memories could not be written", failed,
+                                                  ids[0] if single else ids))
+        else:
+            result.set_result(ids[0] if single else ids)
+
+    for future in futures:
+        future.add_done_callback(done)
+    return result
+
+
+def connect(db_name):
+    # WAL lets readers run alongside the writer; NORMAL sync is safe in WAL mode (a crash can lose
+    # the last commits, never corrupt the database). busy_timeout covers WAL checkpoints.
+    connection = sqlite3.connect(db_name, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.execute('PRAGMA temp_store=MEMORY')
+    connection.execute('PRAGMA cache_size=-16000')  # 16 MB page cache
+    connection.execute('PRAGMA busy_timeout=5000')
+    return connection
+
+
+class ReaderPool:
+    # At most `size` read connections, created on demand. A read checks one out exclusively and
+    # returns it, so no connection is ever used by two threads at once; LIFO order hands a thread
+    # that reads repeatedly the connection it just used, with its page cache still warm.
+    def __init__(self, db_name, size=4, timeout=10.0):
+        self.db_name = db_name
+        self.size = size
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.created = 0
+        self.closed = False
+
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("MemoryStorage is closed")
+            if self.created < self.size:
+                self.created += 1
+                return connect(self.db_name)
+        try:
+            return self.idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No memory reader free after {self.timeout}s ({self.size} in use)")
+
+    def release(self, connection):
+        with self.lock:
+            if not self.closed:
+                self.idle.put(connection)
+                return
+        connection.close()
+
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def close(self):
+        # Idle connections close now, checked-out ones when they are released
+        with self.lock:
+            self.closed = True
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
 
 class MemoryStorage:
-    def __init__(self, db_name='brain_memory.db'):
-        self.connection = sqlite3.connect(db_name)
-        self.cursor = self.connection.cursor()
+    # Safe to share between threads (lobes). All writes go through one writer thread that owns the only
+    # write connection and drains a bounded queue, committing in groups (batch_size rows, or whatever
+    # arrived within flush_interval), so writers never contend for the database lock. Reads use a
+    # bounded pool of reader connections and, thanks to WAL, never wait for the writer.
+    def __init__(self, db_name='brain_memory.db', batch_size=500, flush_interval=0.5, readers=4,
+                 max_pending=10000):
+        self.db_name = db_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.connection = connect(db_name)
         self.create_tables()
+        self.readers = ReaderPool(db_name, size=readers)
+
+        # Bounded, so a burst of writes applies backpressure instead of growing without limit; a
+        # store_many() chunk of up to batch_size rows counts as one pending write
+        self.writes = queue.Queue(maxsize=max_pending)
+        self.closed = False
+        self.written = 0
+        self.commits = 0
+        self.errors = 0
+        self.failed = []  # Memory records that could not be written and that no caller handles yet
+        self.writer = threading.Thread(target=self.write_loop, name='memory-writer', daemon=True)
+        self.writer.start()
 
     def create_tables(self):
-        self.cursor.execute('''
+        cursor = self.connection.cursor()
+        cursor.execute('''
             CREATE TABLE IF NOT EXISTS learning (
                 id INTEGER PRIMARY KEY,
                 data TEXT
             )
         ''')
+        # Databases from before kinds and timestamps get the columns added; old rows keep
+        # created_at 0 (unknown) and the default kind
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(learning)')}
+        if 'kind' not in columns:
+            cursor.execute(f"ALTER TABLE learning ADD COLUMN kind TEXT NOT NULL DEFAULT '{DEFAULT_KIND}'")
+        if 'created_at' not in columns:
+            cursor.execute('ALTER TABLE learning ADD COLUMN created_at REAL NOT NULL DEFAULT 0')
+        if 'commit_seq' not in columns:
+            # Rows written before commit sequences follow in id order
+            cursor.execute('ALTER TABLE learning ADD COLUMN commit_seq INTEGER')
+            cursor.execute('UPDATE learning SET commit_seq = id')
+        cursor.execute('CREATE INDEX IF NOT EXISTS learning_created ON learning (created_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS learning_kind_created ON learning (kind, created_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS learning_commit_seq ON learning (commit_seq, id)')
         self.connection.commit()
 
-    def store_learning(self, data):
-        self.cursor.execute('''
-            INSERT INTO learning (data)
-            VALUES (?)
-        ''', (data,))
-        self.connection.commit()
+    def enqueue(self, item):
+        if self.closed:
+            raise RuntimeError("MemoryStorage is closed")
+        self.writes.put(item)
 
-    def retrieve_learning(self):
-        self.cursor.execute('SELECT data FROM learning')
-        return self.cursor.fetchall()
+    def submit(self, rows, handled):
+        future = Future()
+        self.enqueue(PendingWrite(rows, future, handled))
+        return future
 
-    def close(self):
+    def store_learning(self, data, kind=DEFAULT_KIND, timestamp=None, handled=False):
+        # Queued for the writer: committed with the next group, at the latest after flush_interval.
+        # Returns a future of the memory's id.
+        return gather([self.submit([self.row((data, kind, timestamp), DEFAULT_KIND, time.time())], handled)],
+                      single=True)
+
+    def store_many(self, items, kind=DEFAULT_KIND, handled=False):
+        # items: data strings, (data, kind, timestamp) tuples or Memory records (their id is ignored);
+        # a tuple may leave out the timestamp or the kind and timestamp. Every item is checked before
+        # anything is queued, so a malformed one raises here and nothing is stored. Returns a future of
+        # the ids, in order. With handled=True the caller checks that future and a failure is not
+        # reported again by flush().
+        now = time.time()
+        rows = [self.row(item, kind, now) for item in items]
+        futures = [self.submit(rows[start:start + self.batch_size], handled)
+                   for start in range(0, len(rows), self.batch_size)]
+        return gather(futures or [self.submit([], handled)])
+
+    @staticmethod
+    def row(item, kind, now):
+        if isinstance(item, Memory):
+            return item.data, item.kind, item.created_at
+        if isinstance(item, tuple):
+            if not 1 <= len(item) <= 3:
+                raise ValueError(f"Expected a (data, kind, timestamp) tuple, got {len(item)} fields: {item!r}")
+            data, item_kind, timestamp = item + (None,) * (3 - len(item))
+            item_kind = kind if item_kind is None else item_kind
+            timestamp = now if timestamp is None else timestamp
+            if not isinstance(item_kind, str):
+                raise TypeError(f"Memory kind must be a string, got {type(item_kind).__name__}")
+            if not isinstance(timestamp, (int, float)):
+                raise TypeError(f"Memory timestamp must be a number, got {type(timestamp).__name__}")
+            return data, item_kind, timestamp
+        return item, kind, now
+
+    def flush(self, timeout=None, report=True):
+        # Waits until everything queued before this call has been written. Returns False on timeout and
+        # raises MemoryWriteError if any memory could not be written since the last report (unless
+        # report is False, for callers that only want their own writes hurried along).
+        done = Future()
+        self.enqueue(FlushRequest(done, report))
+        try:
+            return done.result(timeout)
+        except FutureTimeout:
+            return False
+
+    def take_failed(self):
+        with self.lock:
+            failed, self.failed = self.failed, []
+        return failed
+
+    def report(self, waiters):
+        failed = self.take_failed() if any(waiter.report for waiter in waiters) else []
+        for waiter in waiters:
+            if failed and waiter.report:
+                waiter.future.set_exception(MemoryWriteError(f"{len(failed)} memories could not be written", failed))
+            else:
+                waiter.future.set_result(True)
+
+    def write_loop(self):
+        stopping = False
+        while not stopping:
+            item = self.writes.get()
+            writes, rows, waiters = [], 0, []
+            deadline = time.monotonic() + self.flush_interval
+            # Collect a group: up to batch_size rows, until flush_interval has passed, a flush() is
+            # waiting or the queue is closed
+            while True:
+                if item is None:
+                    stopping = True
+                elif isinstance(item, FlushRequest):
+                    waiters.append(item)
+                else:
+                    writes.append(item)
+                    rows += len(item.rows)
+                if stopping or waiters or rows >= self.batch_size:
+                    break
+                try:
+                    item = self.writes.get_nowait()
+                except queue.Empty:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self.writes.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+            if stopping:
+                # Take whatever was queued before close()
+                while True:
+                    try:
+                        item = self.writes.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(item, FlushRequest):
+                        waiters.append(item)
+                    elif item is not None:
+                        writes.append(item)
+            if writes:
+                self.commit(writes)
+            self.report(waiters)
         self.connection.close()
 
+    def begin(self):
+        # The write lock is taken up front, so the commit sequence read here is still the newest one
+        # when the group commits, even with other connections writing to the database
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection.execute('SELECT COALESCE(MAX(commit_seq), 0) + 1 FROM learning').fetchone()[0]
+
+    def commit(self, writes):
+        # Commits a group of writes and resolves their futures with the ids SQLite assigned. Anything
+        # unexpected fails the group's futures instead of the writer thread, which keeps running.
+        try:
+            self.commit_group(writes)
+        except Exception as e:
+            if self.connection.in_transaction:
+                self.connection.rollback()
+            print(f"Memory write failed unexpectedly: {e!r}")
+            with self.lock:
+                self.errors += 1
+            for write in writes:
+                if write.future.done():
+                    continue
+                lost = [Memory(None, kind, created_at, data) for data, kind, created_at in write.rows]
+                if not write.handled:
+                    with self.lock:
+                        self.failed.extend(lost)
+                write.future.set_exception(MemoryWriteError(f"Memory write failed: {e!r}", lost,
+                                                            [None] * len(write.rows)))
+
+    def commit_group(self, writes):
+        rows = [row for write in writes for row in write.rows]
+        try:
+            seq = self.begin()
+            self.connection.executemany(INSERT, [row + (seq,) for row in rows])
+            # Within one transaction every new rowid is the largest yet, so id order is insertion order
+            ids = [row[0] for row in self.connection.execute(
+                'SELECT id FROM learning WHERE commit_seq = ? ORDER BY id', (seq,))]
+            self.connection.commit()
+        except sqlite3.Error as e:
+            self.connection.rollback()
+            print(f"Memory write of {len(rows)} rows failed ({e}), retrying them one by one")
+            ids = self.commit_each(rows)
+        failed = 0
+        offset = 0
+        for write in writes:
+            write_ids = ids[offset:offset + len(write.rows)]
+            offset += len(write.rows)
+            lost = [Memory(None, kind, created_at, data)
+                    for (data, kind, created_at), memory_id in zip(write.rows, write_ids) if memory_id is None]
+            failed += len(lost)
+            if lost:
+                if not write.handled:
+                    with self.lock:
+                        self.failed.extend(lost)
+                write.future.set_exception(
+                    MemoryWriteError(f"{len(lost)} memories could not be written", lost, write_ids))
+            else:
+                write.future.set_result(write_ids)
+        with self.lock:
+            self.written += len(rows) - failed
+            self.commits += 1
+            if failed:
+                self.errors += 1
+
+    def commit_each(self, rows):
+        # One bad row must not take the rest of the group with it; ids are None for rows that failed
+        ids = []
+        try:
+            seq = self.begin()
+            for row in rows:
+                try:
+                    ids.append(self.connection.execute(INSERT, row + (seq,)).lastrowid)
+                except sqlite3.Error:
+                    ids.append(None)
+            self.connection.commit()
+        except sqlite3.Error as e:
+            self.connection.rollback()
+            print(f"Memory write failed: {e}")
+            return [None] * len(rows)
+        return ids
+
+    def query(self, sql, params=()):
+        with self.readers.connection() as connection:
+            return connection.execute(sql, params).fetchall()
+
+    @staticmethod
+    def filters(kind, since, until):
+        clauses, params = [], []
+        if kind is not None:
+            clauses.append('kind = ?')
+            params.append(kind)
+        if since is not None:
+            clauses.append('created_at >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('created_at < ?')
+            params.append(until)
+        return clauses, params
+
+    def page(self, kind=None, since=None, until=None, limit=1000, after=None, newest_first=False):
+        # One page of memories ordered by (created_at, id). after is the cursor returned with the
+        # previous page; the result is (memories, cursor for the next page or None at the end)
+        clauses, params = self.filters(kind, since, until)
+        if after is not None:
+            clauses.append('(created_at, id) < (?, ?)' if newest_first else '(created_at, id) > (?, ?)')
+            params.extend(after)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        order = 'DESC' if newest_first else 'ASC'
+        query = (f'SELECT id, kind, created_at, data FROM learning {where} '
+                 f'ORDER BY created_at {order}, id {order} LIMIT ?')
+        memories = [Memory(*row) for row in self.query(query, params + [limit])]
+        cursor = (memories[-1].created_at, memories[-1].id) if len(memories) == limit else None
+        return memories, cursor
+
+    def iter_memories(self, kind=None, since=None, until=None, page_size=1000, newest_first=False):
+        # Generator over every matching memory, fetched page_size rows at a time
+        cursor = None
+        while True:
+            memories, cursor = self.page(kind, since, until, page_size, cursor, newest_first)
+            yield from memories
+            if cursor is None:
+                return
+
+    def recent(self, limit=10, kind=None):
+        return self.page(kind=kind, limit=limit, newest_first=True)[0]
+
+    def memories_after(self, cursor=None, limit=1000):
+        # Memories in commit order after cursor, for consumers that catch up incrementally. Returns
+        # (memories, cursor to pass next time); a new commit always sorts after every earlier one.
+        seq, last_id = cursor or (0, 0)
+        rows = self.query('SELECT id, kind, created_at, data, commit_seq FROM learning '
+                          'WHERE (commit_seq, id) > (?, ?) ORDER BY commit_seq, id LIMIT ?', (seq, last_id, limit))
+        if not rows:
+            return [], (seq, last_id)
+        return [Memory(*row[:4]) for row in rows], (rows[-1][4], rows[-1][0])
+
+    def fetch(self, ids):
+        # Memories by id, in no particular order
+        memories = []
+        for start in range(0, len(ids), 500):
+            chunk = list(ids[start:start + 500])
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.query(f'SELECT id, kind, created_at, data FROM learning WHERE id IN ({placeholders})', chunk)
+            memories.extend(Memory(*row) for row in rows)
+        return memories
+
+    def count(self, kind=None, since=None, until=None):
+        clauses, params = self.filters(kind, since, until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return self.query(f'SELECT COUNT(*) FROM learning {where}', params)[0][0]
+
+    def retrieve_learning(self, kind=None, since=None, until=None, limit=None):
+        # Same result shape as before, a list of (data,) rows; use limit or iter_memories() for large tables
+        if limit is not None:
+            return [(memory.data,) for memory in self.page(kind, since, until, limit)[0]]
+        return [(memory.data,) for memory in self.iter_memories(kind, since, until)]
+
+    def stats(self):
+        with self.lock:
+            return {'queued': self.writes.qsize(), 'written': self.written, 'commits': self.commits,
+                    'errors': self.errors, 'failed': len(self.failed), 'readers': self.readers.created}
+
+    def close(self, timeout=10.0):
+        # Commits everything already queued, then stops the writer and closes every connection. Raises
+        # MemoryWriteError (after closing) if memories could not be written and no flush() reported them.
+        if self.closed:
+            return
+        self.closed = True
+        self.writes.put(None)
+        self.writer.join(timeout)
+        self.readers.close()
+        failed = self.take_failed()
+        if failed:
+            raise MemoryWriteError(f"{len(failed)} memories could not be written", failed)
+
 # Usage example
 if __name__ == "__main__":
     memory_storage = MemoryStorage()
-    memory_storage.store_learning('Sample learning data')
-    print("Stored data:", memory_storage.retrieve_learning())
+    memory_id = memory_storage.store_learning('Sample learning data')
+    memory_storage.flush()
+    print("Stored as id", memory_id.result())
+    print("Stored data:", memory_storage.retrieve_learning(limit=10))
+    print("Most recent:", memory_storage.recent(3))
     memory_storage.close()
@@ -0,0 +1,136 @@
+# stress_memory_storage.py
+# Concurrency stress test for MemoryStorage: several writer threads (like lobes storing memories) and
+# reader threads hammer one database at the same time. Passes when no operation failed, in particular
+# no "database is locked", and every stored row is in the database after close().
+# --compare also runs the same load the old way: a sqlite3 connection per thread, default journal,
+# commit per row, which is where "database is locked" comes from.
+#
+# Usage:
+#   python memory/stress_memory_storage.py --writers 8 --readers 4 --rows 5000
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+# Add the project root directory to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from memory.memory_storage import MemoryStorage
+
+
+def run_threads(writer, reader, writers, readers):
+    errors = Counter()
+    done = threading.Event()
+
+    def guarded(fn, *args):
+        try:
+            fn(*args)
+        except Exception as e:
+            errors[f"{type(e).__name__}: {e}"] += 1
+
+    def read_until_done():
+        while not done.is_set():
+            guarded(reader)
+
+    read_threads = [threading.Thread(target=read_until_done) for _ in range(readers)]
+    write_threads = [threading.Thread(target=guarded, args=(writer, i)) for i in range(writers)]
+    start = time.perf_counter()
+    for thread in read_threads + write_threads:
+        thread.start()
+    for thread in write_threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    for thread in read_threads:
+        thread.join()
+    return elapsed, errors
+
+
+def stress_pool(path, writers, readers, rows, pool_size):
+    storage = MemoryStorage(path, readers=pool_size)
+    reads = Counter()
+
+    def write(worker):
+        for i in range(rows):
+            storage.store_learning(f"writer {worker} memory {i}", kind=f"writer-{worker}")
+
+    def read():
+        storage.recent(20)
+        storage.count(kind='writer-0')
+        reads['queries'] += 2
+
+    elapsed, errors = run_threads(write, read, writers, readers)
+    storage.close()
+    stats = storage.stats()
+    # A fresh instance shows what close() actually left on disk
+    check = MemoryStorage(path)
+    try:
+        stored = check.count()
+    finally:
+        check.close()
+    return elapsed, errors, stored, reads['queries'], stats
+
+
+def stress_naive(path, writers, readers, rows):
+    # Each thread with its own connection, as the single-connection MemoryStorage would need
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE IF NOT EXISTS learning (id INTEGER PRIMARY KEY, data TEXT)')
+    connection.close()
+
+    def write(worker):
+        connection = sqlite3.connect(path, timeout=0.1)
+        for i in range(rows):
+            connection.execute('INSERT INTO learning (data) VALUES (?)', (f"writer {worker} memory {i}",))
+            connection.commit()
+        connection.close()
+
+    def read():
+        connection = sqlite3.connect(path, timeout=0.1)
+        connection.execute('SELECT COUNT(*) FROM learning').fetchone()
+        connection.close()
+
+    elapsed, errors = run_threads(write, read, writers, readers)
+    connection = sqlite3.connect(path)
+    stored = connection.execute('SELECT COUNT(*) FROM learning').fetchone()[0]
+    connection.close()
+    return elapsed, errors, stored
+
+
+def report(name, expected, elapsed, errors, stored):
+    print(f"{name}: {stored}/{expected} rows in {elapsed:.2f}s ({stored / elapsed:,.0f} rows/s)")
+    for error, count in errors.most_common(5):
+        print(f"  {count} x {error}")
+    return not errors and stored == expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MemoryStorage concurrency stress test")
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=5000, help="Rows per writer thread")
+    parser.add_argument('--pool-size', type=int, default=4, help="Reader connections in the pool")
+    parser.add_argument('--compare', action='store_true', help="Also run the load with a connection per thread")
+    args = parser.parse_args()
+    expected = args.writers * args.rows
+
+    with tempfile.TemporaryDirectory() as workdir:
+        elapsed, errors, stored, queries, stats = stress_pool(os.path.join(workdir, 'pool.db'), args.writers,
+                                                              args.readers, args.rows, args.pool_size)
+        passed = report("pooled MemoryStorage", expected, elapsed, errors, stored)
+        print(f"  {queries} reader queries, {stats['commits']} commits, {stats['readers']} reader connections")
+        if args.compare:
+            naive_rows = min(args.rows, 500)
+            report("connection per thread", args.writers * naive_rows,
+                   *stress_naive(os.path.join(workdir, 'naive.db'), args.writers, args.readers, naive_rows))
+
+    print("PASSED" if passed else "FAILED")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+# memory/vector_index.py
+# Semantic retrieval over long-term memory: "which memories are related to this transcript". Every
+# memory gets an embedding, kept in one contiguous float32 matrix next to an array of memory ids, so a
+# query is a single matrix-vector product plus a partial sort (exact top-k, no Python loop per row).
+# The index is updated incrementally from MemoryStorage in commit order (only memories committed since
+# the last refresh are embedded) and saved as .npy files that load back without re-embedding anything.
+#
+# Embedders are pluggable: anything with a `dim` and embed(texts) -> (n, dim) float32 array.
+# HashingEmbedder is deterministic and local (tests, offline runs); OpenAIEmbedder uses the API.
+
+import json
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+
+TOKEN = re.compile(r"[a-z0-9']+")
+
+
+class HashingEmbedder:
+    # Feature hashing of words and word bigrams into `dim` signed buckets, L2-normalized. Texts sharing
+    # words land close together; the same text always gets the same vector, in every process.
+    def __init__(self, dim=384, bigrams=True):
+        self.dim = dim
+        self.bigrams = bigrams
+
+    def features(self, text):
+        words = TOKEN.findall(text.lower())
+        if self.bigrams:
+            return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        return words
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self.features(text):
+                h = zlib.crc32(feature.encode('utf-8'))
+                vectors[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return normalize(vectors)
+
+
+class OpenAIEmbedder:
+    # Embeddings from the OpenAI API through the pooled LLMClient connection
+    def __init__(self, llm=None, model='text-embedding-3-small', dim=1536):
+        if llm is None:
+            from cerebrum.llm_client import LLMClient
+            llm = LLMClient()
+        self.llm = llm
+        self.model = model
+        self.dim = dim
+
+    def embed(self, texts):
+        response = self.llm.get_client().embeddings.create(model=self.model, input=list(texts))
+        return normalize(np.array([item.embedding for item in response.data], dtype=np.float32))
+
+
+def normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class VectorIndex:
+    # Exact cosine top-k over normalized float32 vectors. Rows are appended into spare capacity (grown
+    # by doubling), so an insert copies nothing but the new rows.
+    def __init__(self, dim, capacity=1024):
+        self.dim = dim
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def reserve(self, capacity):
+        if capacity <= len(self.ids):
+            return
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        ids = np.zeros(capacity, dtype=np.int64)
+        vectors[:self.size] = self.vectors[:self.size]
+        ids[:self.size] = self.ids[:self.size]
+        self.vectors, self.ids = vectors, ids
+
+    def add(self, ids, vectors):
+        # vectors must already be normalized (every embedder returns normalized rows)
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        needed = self.size + len(ids)
+        if needed > len(self.ids):
+            self.reserve(max(needed, 2 * len(self.ids), 1024))
+        self.vectors[self.size:needed] = vectors
+        self.ids[self.size:needed] = ids
+        self.size = needed
+
+    def remove(self, ids):
+        keep = ~np.isin(self.ids[:self.size], np.asarray(ids, dtype=np.int64))
+        kept = int(keep.sum())
+        self.vectors[:kept] = self.vectors[:self.size][keep]
+        self.ids[:kept] = self.ids[:self.size][keep]
+        self.size = kept
+
+    def update(self, ids, vectors):
+        self.remove(ids)
+        self.add(ids, vectors)
+
+    def search(self, query, k=5):
+        # query: one vector or a (n, dim) batch. Returns (ids, scores), best first, shaped like the query.
+        query = np.asarray(query, dtype=np.float32)
+        single = query.ndim == 1
+        queries = query.reshape(-1, self.dim)
+        k = min(k, self.size)
+        if k == 0:
+            empty = (np.zeros((len(queries), 0), dtype=np.int64), np.zeros((len(queries), 0), dtype=np.float32))
+            return (empty[0][0], empty[1][0]) if single else empty
+        scores = queries @ self.vectors[:self.size].T
+        if k < self.size:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(self.size), (len(queries), self.size))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        ids, scores = self.ids[top], np.take_along_axis(top_scores, order, axis=1)
+        return (ids[0], scores[0]) if single else (ids, scores)
+
+    def save(self, path, meta=None):
+        # Written to temporary files first and renamed, so a crash never leaves a torn index
+        os.makedirs(path, exist_ok=True)
+        files = {
+            'vectors.npy': lambda f: np.save(f, self.vectors[:self.size]),
+            'ids.npy': lambda f: np.save(f, self.ids[:self.size]),
+            'meta.json': lambda f: f.write(json.dumps(dict(meta or {}, dim=self.dim, size=self.size)).encode()),
+        }
+        for name, write in files.items():
+            tmp = os.path.join(path, name + '.tmp')
+            with open(tmp, 'wb') as f:
+                write(f)
+            os.replace(tmp, os.path.join(path, name))
+
+    @classmethod
+    def load(cls, path):
+        # Returns (index, meta); the arrays are read straight into memory, nothing is re-embedded
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        index = cls(meta['dim'], capacity=0)
+        # Used as loaded, without a copy; the first insert grows them
+        index.vectors = np.load(os.path.join(path, 'vectors.npy'))
+        index.ids = np.load(os.path.join(path, 'ids.npy'))
+        index.size = len(index.ids)
+        return index, meta
+
+
+class SemanticMemory:
+    # Vector index over a MemoryStorage. refresh() embeds memories stored since the last refresh;
+    # related() refreshes first, so new memories are searchable as soon as they are committed.
+    def __init__(self, storage, embedder=None, index_path=None, batch_size=512):
+        self.storage = storage
+        self.embedder = embedder or HashingEmbedder()
+        self.index_path = index_path
+        self.batch_size = batch_size
+        self.cursor = None  # MemoryStorage.memories_after() position: (commit_seq, id) of the last memory
+        self.lock = threading.Lock()
+        self.index = VectorIndex(self.embedder.dim)
+        if index_path and os.path.exists(os.path.join(index_path, 'meta.json')):
+            index, meta = VectorIndex.load(index_path)
+            if meta['dim'] == self.embedder.dim and meta.get('embedder') == type(self.embedder).__name__:
+                # Indexes saved before commit sequences stored the last id; old rows have commit_seq = id
+                cursor = meta.get('cursor') or (meta.get('last_id', 0),) * 2
+                self.index, self.cursor = index, tuple(cursor)
+            else:
+                print(f"Vector index at {index_path} was built with another embedder, rebuilding")
+
+    def refresh(self):
+        # Embeds new memories in batches; returns how many were added
+        added = 0
+        with self.lock:
+            while True:
+                memories, cursor = self.storage.memories_after(self.cursor, self.batch_size)
+                if not memories:
+                    return added
+                self.index.add([m.id for m in memories], self.embedder.embed([m.data or "" for m in memories]))
+                self.cursor = cursor
+                added += len(memories)
+
+    def related(self, text, k=5, min_score=0.0):
+        # [(Memory, score)], most similar first
+        self.refresh()
+        query = self.embedder.embed([text])[0]
+        with self.lock:
+            ids, scores = self.index.search(query, k)
+        memories = {m.id: m for m in self.storage.fetch(ids.tolist())}
+        return [(memories[i], float(s)) for i, s in zip(ids.tolist(), scores) if s >= min_score and i in memories]
+
+    def save(self):
+        if self.index_path:
+            with self.lock:
+                self.index.save(self.index_path, {'cursor': self.cursor,
+                                                  'embedder': type(self.embedder).__name__})
+
+
+# Usage example
+if __name__ == "__main__":
+    import sys
+    import tempfile
+
+    # Add the project root directory to the Python path
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from memory.memory_storage import MemoryStorage
+
+    with tempfile.TemporaryDirectory() as workdir:
+        storage = MemoryStorage(os.path.join(workdir, 'memory.db'))
+        storage.store_many(["Petr likes green tea in the morning", "The kitchen light is broken",
+                            "Meeting with Anna about the robot arm on Friday", "Petr is allergic to peanuts"])
+        storage.flush()
+        semantic = SemanticMemory(storage, index_path=os.path.join(workdir, 'index'))
+        for memory, score in semantic.related("what does Petr drink", k=2, min_score=0.05):
+            print(f"{score:.2f}  {memory.data}")
+        semantic.save()
+        storage.close()
@@ -0,0 +1,363 @@
+# memory/visual_log.py
+# Episodic log of everything the Occipital Lobe has seen: one fixed-size record per detection (time,
+# source, label, confidence, box) in NumPy arrays. append() only converts a frame's detection arrays and
+# queues them, so the vision loop never waits on I/O; a writer thread appends the queued records to one
+# binary file per time bucket. Each bucket also has a small summary (detections and last sighting per
+# source and label), kept in memory and in index.json, so "when was petr last seen" and counts over
+# whole buckets never read detection data. Old buckets are thinned out (downsampled) after
+# downsample_after seconds and deleted after retention seconds.
+
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+RECORD = np.dtype([('time', '<f8'), ('source', '<u2'), ('label', '<u2'), ('conf', '<f4'), ('box', '<f4', (4,))])
+
+Episode = namedtuple('Episode', ['start', 'end', 'detections'])
+
+
+class BucketSummary:
+    # Per (source code, label code): [detections, last sighting]. Counts are those appended, so they
+    # stay exact after the bucket's records have been downsampled.
+    def __init__(self, start, entries=None, downsampled=False):
+        self.start = start
+        self.entries = entries or {}
+        self.downsampled = downsampled
+
+    def add(self, records):
+        keys = records['source'].astype(np.uint32) << 16 | records['label']
+        for key in np.unique(keys).tolist():
+            mask = keys == key
+            entry = self.entries.setdefault((key >> 16, key & 0xFFFF), [0, 0.0])
+            entry[0] += int(mask.sum())
+            entry[1] = max(entry[1], float(records['time'][mask].max()))
+
+    def to_json(self):
+        return {'start': self.start, 'downsampled': self.downsampled,
+                'entries': [[s, l, c, t] for (s, l), (c, t) in self.entries.items()]}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['start'], {(s, l): [c, t] for s, l, c, t in data['entries']}, data['downsampled'])
+
+
+class VisualEpisodicLog:
+    def __init__(self, directory='visual_log', bucket_seconds=3600, flush_interval=1.0, max_pending=100000,
+                 retention=30 * 86400, downsample_after=86400, downsample_interval=5.0, min_conf=0.0):
+        # Records older than downsample_after keep at most one detection per source and label every
+        # downsample_interval seconds (the most confident one); buckets older than retention are deleted.
+        self.directory = directory
+        self.bucket_seconds = bucket_seconds
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.retention = retention
+        self.downsample_after = downsample_after
+        self.downsample_interval = downsample_interval
+        self.min_conf = min_conf
+        os.makedirs(directory, exist_ok=True)
+
+        self.lock = threading.Lock()        # pending records and the vocabularies
+        self.index_lock = threading.Lock()  # bucket summaries and files
+        self.pending = []
+        self.pending_rows = 0
+        self.dropped = 0
+        self.appended = 0
+        self.written = 0
+        self.flushes = 0
+
+        self.sources, self.labels = [], []
+        self.source_codes, self.label_codes = {}, {}
+        self.buckets = {}  # bucket start -> BucketSummary
+        self.load_index()
+
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+        self.writer = threading.Thread(target=self.write_loop, name='visual-log-writer', daemon=True)
+        self.writer.start()
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def bucket_path(self, start):
+        return self.path(f"bucket_{int(start)}.bin")
+
+    def load_index(self):
+        if not os.path.exists(self.path('index.json')):
+            return
+        with open(self.path('index.json')) as f:
+            index = json.load(f)
+        self.sources, self.labels = index['sources'], index['labels']
+        self.source_codes = {name: i for i, name in enumerate(self.sources)}
+        self.label_codes = {name: i for i, name in enumerate(self.labels)}
+        self.buckets = {bucket['start']: BucketSummary.from_json(bucket) for bucket in index['buckets']}
+
+    def save_index(self):
+        with self.lock:
+            sources, labels = list(self.sources), list(self.labels)
+        index = {'bucket_seconds': self.bucket_seconds, 'sources': sources, 'labels': labels,
+                 'buckets': [bucket.to_json() for _, bucket in sorted(self.buckets.items())]}
+        tmp = self.path('index.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp, self.path('index.json'))
+
+    def code(self, codes, names, name):
+        code = codes.get(name)
+        if code is None:
+            code = codes[name] = len(names)
+            names.append(name)
+        return code
+
+    def append(self, timestamp, source, detections):
+        # detections: {model name: Detections} for one frame, as passed to on_detections. Never blocks on
+        # disk; if the writer falls behind by max_pending records, the oldest queued ones are dropped.
+        chunks = []
+        with self.lock:
+            source_code = self.code(self.source_codes, self.sources, str(source))
+            for model_detections in detections.values():
+                if not len(model_detections):
+                    continue
+                keep = model_detections.conf >= self.min_conf
+                if not keep.any():
+                    continue
+                classes = model_detections.cls[keep]
+                lookup = {int(c): self.code(self.label_codes, self.labels, class_name(model_detections.names, int(c)))
+                          for c in np.unique(classes)}
+                records = np.empty(int(keep.sum()), dtype=RECORD)
+                records['time'] = timestamp
+                records['source'] = source_code
+                records['label'] = [lookup[c] for c in classes.tolist()]
+                records['conf'] = model_detections.conf[keep]
+                records['box'] = model_detections.xyxy[keep]
+                chunks.append(records)
+            for records in chunks:
+                self.pending.append(records)
+                self.pending_rows += len(records)
+                self.appended += len(records)
+            while self.pending_rows > self.max_pending and len(self.pending) > 1:
+                self.dropped += len(self.pending[0])
+                self.pending_rows -= len(self.pending.pop(0))
+
+    def take_pending(self):
+        with self.lock:
+            pending, self.pending, self.pending_rows = self.pending, [], 0
+        return np.concatenate(pending) if pending else np.empty(0, dtype=RECORD)
+
+    def flush(self):
+        # Appends queued records to their bucket files and updates the summaries. Queries wait for the
+        # index lock, so they never see records that have left the queue but are not in a bucket yet.
+        with self.index_lock:
+            records = self.take_pending()
+            if not len(records):
+                return 0
+            starts = np.floor(records['time'] / self.bucket_seconds) * self.bucket_seconds
+            for start in np.unique(starts).tolist():
+                bucket_records = records[starts == start]
+                with open(self.bucket_path(start), 'ab') as f:
+                    f.write(bucket_records.tobytes())
+                bucket = self.buckets.get(start)
+                if bucket is None:
+                    bucket = self.buckets[start] = BucketSummary(start)
+                bucket.add(bucket_records)
+            self.save_index()
+        self.written += len(records)
+        self.flushes += 1
+        return len(records)
+
+    def write_loop(self):
+        last_maintenance = 0.0
+        while not self.stop_event.is_set():
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+                if time.monotonic() - last_maintenance >= 60:
+                    self.maintain()
+                    last_maintenance = time.monotonic()
+            except OSError as e:
+                print(f"Visual log write failed: {e}")
+
+    def maintain(self, now=None):
+        # Deletes buckets past retention and downsamples buckets past downsample_after
+        now = time.time() if now is None else now
+        with self.index_lock:
+            for start, bucket in sorted(self.buckets.items()):
+                end = start + self.bucket_seconds
+                if end <= now - self.retention:
+                    if os.path.exists(self.bucket_path(start)):
+                        os.remove(self.bucket_path(start))
+                    del self.buckets[start]
+                elif end <= now - self.downsample_after and not bucket.downsampled:
+                    self.downsample(start)
+                    bucket.downsampled = True
+            self.save_index()
+
+    def downsample(self, start):
+        records = np.fromfile(self.bucket_path(start), dtype=RECORD)
+        if not len(records):
+            return
+        # Keep the most confident record per (source, label, time slot)
+        slots = np.floor(records['time'] / self.downsample_interval).astype(np.int64)
+        order = np.lexsort((-records['conf'], slots, records['label'], records['source']))
+        ordered = records[order]
+        keys = np.stack([ordered['source'], ordered['label'], slots[order]], axis=1)
+        first = np.ones(len(ordered), dtype=bool)
+        first[1:] = np.any(keys[1:] != keys[:-1], axis=1)
+        kept = ordered[first]
+        kept = kept[np.argsort(kept['time'], kind='stable')]
+        tmp = self.bucket_path(start) + '.tmp'
+        kept.tofile(tmp)
+        os.replace(tmp, self.bucket_path(start))
+
+    def codes_for(self, label_name=None, source=None):
+        with self.lock:
+            label_code = self.label_codes.get(label_name, -1) if label_name is not None else None
+            source_code = self.source_codes.get(str(source), -1) if source is not None else None
+        return label_code, source_code
+
+    def last_seen(self, label_name, source=None):
+        # Time of the most recent detection of label_name (optionally from one source), or None
+        label_code, source_code = self.codes_for(label_name, source)
+        if label_code == -1 or source_code == -1:
+            return None
+        seen = self.filter(self.pending_records(), label_code, source_code)['time']
+        latest = float(seen.max()) if len(seen) else None
+        with self.index_lock:
+            for start in sorted(self.buckets, reverse=True):
+                if latest is not None and latest >= start + self.bucket_seconds:
+                    break
+                times = [t for (s, l), (_, t) in self.buckets[start].entries.items()
+                         if l == label_code and (source_code is None or s == source_code)]
+                if times:
+                    latest = max(times + ([latest] if latest is not None else []))
+                    break
+        return latest
+
+    def pending_records(self):
+        with self.lock:
+            return np.concatenate(self.pending) if self.pending else np.empty(0, dtype=RECORD)
+
+    @staticmethod
+    def filter(records, label_code=None, source_code=None, since=None, until=None):
+        mask = np.ones(len(records), dtype=bool)
+        if label_code is not None:
+            mask &= records['label'] == label_code
+        if source_code is not None:
+            mask &= records['source'] == source_code
+        if since is not None:
+            mask &= records['time'] >= since
+        if until is not None:
+            mask &= records['time'] < until
+        return records[mask]
+
+    def records(self, since=None, until=None, label_name=None, source=None):
+        # Detection records in [since, until), in time order, read only from the buckets that overlap
+        label_code, source_code = self.codes_for(label_name, source)
+        if label_code == -1 or source_code == -1:
+            return np.empty(0, dtype=RECORD)
+        parts = []
+        with self.index_lock:
+            for start in sorted(self.buckets):
+                if (since is not None and start + self.bucket_seconds <= since) or (until is not None and start >= until):
+                    continue
+                if os.path.exists(self.bucket_path(start)):
+                    parts.append(self.filter(np.fromfile(self.bucket_path(start), dtype=RECORD),
+                                             label_code, source_code, since, until))
+            parts.append(self.filter(self.pending_records(), label_code, source_code, since, until))
+        records = np.concatenate(parts)
+        return records[np.argsort(records['time'], kind='stable')]
+
+    def count(self, since=None, until=None, label_name=None, source=None):
+        # Detections in [since, until). Buckets entirely inside the range are answered from their
+        # summaries; only the partially covered ones at the edges are read (downsampled edge buckets
+        # count the records that were kept).
+        label_code, source_code = self.codes_for(label_name, source)
+        if label_code == -1 or source_code == -1:
+            return 0
+        total = 0
+        edges = []
+        with self.index_lock:
+            for start, bucket in self.buckets.items():
+                end = start + self.bucket_seconds
+                if (since is not None and end <= since) or (until is not None and start >= until):
+                    continue
+                if (since is None or start >= since) and (until is None or end <= until):
+                    total += sum(c for (s, l), (c, _) in bucket.entries.items()
+                                 if (label_code is None or l == label_code) and (source_code is None or s == source_code))
+                else:
+                    edges.append(start)
+            for start in edges:
+                if os.path.exists(self.bucket_path(start)):
+                    total += len(self.filter(np.fromfile(self.bucket_path(start), dtype=RECORD),
+                                             label_code, source_code, since, until))
+            total += len(self.filter(self.pending_records(), label_code, source_code, since, until))
+        return total
+
+    def episodes(self, label_name, since=None, until=None, source=None, gap=5.0):
+        # Continuous sightings of label_name: detections less than gap seconds apart form one episode.
+        # The number of episodes in an hour approximates how many times someone passed by.
+        records = self.records(since, until, label_name, source)
+        if not len(records):
+            return []
+        times = records['time']
+        breaks = np.flatnonzero(np.diff(times) > gap) + 1
+        starts = np.concatenate([[0], breaks])
+        ends = np.concatenate([breaks, [len(times)]])
+        return [Episode(float(times[a]), float(times[b - 1]), int(b - a)) for a, b in zip(starts, ends)]
+
+    def stats(self):
+        with self.lock:
+            pending = self.pending_rows
+        with self.index_lock:
+            buckets = len(self.buckets)
+            disk_bytes = sum(os.path.getsize(self.bucket_path(start)) for start in self.buckets
+                             if os.path.exists(self.bucket_path(start)))
+        return {'appended': self.appended, 'written': self.written, 'pending': pending, 'dropped': self.dropped,
+                'flushes': self.flushes, 'buckets': buckets, 'disk_bytes': disk_bytes,
+                'bytes_per_detection': RECORD.itemsize}
+
+    def close(self):
+        self.stop_event.set()
+        self.wakeup.set()
+        self.writer.join(timeout=5)
+        self.flush()
+
+
+def class_name(names, cls):
+    # Class name from a names dict or list, falling back to the id (as cerebrum.occipital_lobe.class_label)
+    if isinstance(names, dict):
+        return names.get(cls, str(cls))
+    return names[cls] if 0 <= cls < len(names) else str(cls)
+
+
+# Usage example
+if __name__ == "__main__":
+    import tempfile
+
+    class FakeDetections:
+        def __init__(self, classes, names):
+            self.cls = np.asarray(classes, dtype=np.int64)
+            self.conf = np.full(len(classes), 0.9, dtype=np.float32)
+            self.xyxy = np.zeros((len(classes), 4), dtype=np.float32)
+            self.names = names
+
+        def __len__(self):
+            return len(self.cls)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        log = VisualEpisodicLog(workdir, bucket_seconds=60, downsample_after=120, retention=600)
+        start = time.time() - 300
+        for i in range(3000):
+            classes = [0, 1] if (i // 100) % 3 == 0 else [1]
+            log.append(start + i * 0.1, 'webcam', {'custom': FakeDetections(classes, {0: 'petr', 1: 'person'})})
+        log.flush()
+        print("petr last seen", round(time.time() - log.last_seen('petr'), 1), "seconds ago")
+        print("person detections in the last minute:", log.count(since=time.time() - 60, label_name='person'))
+        print("petr episodes:", len(log.episodes('petr')))
+        log.maintain()
+        print("Visual log stats:", log.stats())
+        log.close()
@@ -0,0 +1,60 @@
+# telemetry/startup.py
+# Startup profile: how long each module import and each component initialization took, when it started
+# relative to process start-up and on which thread, so parallel warm-up shows up as overlapping rows.
+
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupProfile:
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.records = []  # (kind, name, start offset, duration, thread name, error)
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, name, kind='init'):
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = repr(e)
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            with self.lock:
+                self.records.append((kind, name, start - self.origin, duration, threading.current_thread().name, error))
+
+    def timed_import(self, module_name):
+        # Imports (and records) a module the first time; later calls just return it
+        module = sys.modules.get(module_name)
+        if module is not None:
+            return module
+        with self.measure(module_name, kind='import'):
+            return importlib.import_module(module_name)
+
+    def report(self):
+        with self.lock:
+            records = sorted(self.records, key=lambda record: record[2])
+        if not records:
+            return "No startup records"
+        wall = max(start + duration for _, _, start, duration, _, _ in records)
+        lines = [f"Startup profile (ready after {wall:.2f}s):",
+                 f"  {'kind':<7} {'component':<34} {'start':>8} {'took':>8}  thread"]
+        for kind, name, start, duration, thread, error in records:
+            line = f"  {kind:<7} {name:<34} {start:7.2f}s {duration:7.2f}s  {thread}"
+            if error:
+                line += f"  FAILED {error}"
+            lines.append(line)
+        for kind in ('import', 'init'):
+            total = sum(duration for k, _, _, duration, _, _ in records if k == kind)
+            lines.append(f"  total {kind} time {total:.2f}s")
+        return "\n".join(lines)
+
+
+# Created when this module is first imported, which main.py does before anything else
+startup = StartupProfile()
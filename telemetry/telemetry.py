@@ -0,0 +1,291 @@
+# telemetry/telemetry.py
+# Lightweight tracing and metrics for the Thalamus and the lobes: spans (timed blocks), latency
+# histograms, counters and gauges. Gauges can also be callbacks that are sampled at export time (queue
+# depths, cache statistics). Metrics are exported as Prometheus text on a local HTTP endpoint and/or
+# appended to a JSONL file together with the individual spans.
+#
+# Everything is off until configure() enables it; while off, span() returns a shared no-op context
+# manager and every other call returns after a single attribute check.
+
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets in seconds, from 1 ms to 10 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PREFIX = 'graym_'
+
+
+def metric_name(name):
+    return PREFIX + name.replace('.', '_').replace('-', '_')
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation (None for an empty histogram)
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float('inf')
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum_s': round(self.sum, 6),
+            'mean_s': round(self.sum / self.count, 6) if self.count else None,
+            'p50_le_s': self.quantile(0.5),
+            'p95_le_s': self.quantile(0.95),
+        }
+
+
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    def __init__(self, telemetry, name, labels):
+        self.telemetry = telemetry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        self.telemetry.observe(self.name, duration, **self.labels)
+        self.telemetry.record_span(self.name, self.wall_start, duration, self.labels, exc_type is not None)
+        return False
+
+
+class Telemetry:
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.counters = {}    # (name, label key) -> value
+        self.gauges = {}      # (name, label key) -> value
+        self.histograms = {}  # (name, label key) -> Histogram
+        self.callbacks = []   # fn() -> iterable of (name, labels dict, value), sampled at export
+        self.spans = deque(maxlen=10000)
+        self.started_at = time.time()
+        self.server = None
+        self.jsonl_path = None
+        self.jsonl_thread = None
+        self.stop_event = threading.Event()
+
+    def configure(self, prometheus_port=None, prometheus_host='127.0.0.1', jsonl_path=None, jsonl_interval=5.0):
+        # Turns collection on and starts the requested exporters
+        self.enabled = True
+        if prometheus_port is not None and self.server is None:
+            self.serve(prometheus_port, prometheus_host)
+        if jsonl_path is not None and self.jsonl_thread is None:
+            self.jsonl_path = jsonl_path
+            self.jsonl_thread = threading.Thread(target=self.write_jsonl, args=(jsonl_interval,), daemon=True)
+            self.jsonl_thread.start()
+        return self
+
+    def span(self, name, **labels):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, labels)
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, name, value, **labels):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.gauges[(name, label_key(labels))] = value
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = (name, label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def register_callback(self, fn):
+        # Registered even while disabled (this is cheap and happens once); only called at export
+        with self.lock:
+            self.callbacks.append(fn)
+
+    def unregister_callback(self, fn):
+        with self.lock:
+            if fn in self.callbacks:
+                self.callbacks.remove(fn)
+
+    def record_span(self, name, start, duration, labels, failed):
+        if self.jsonl_path is not None:
+            self.spans.append({'type': 'span', 'name': name, 'start': round(start, 6),
+                               'duration_s': round(duration, 6), 'labels': labels, 'failed': failed})
+
+    def sampled_gauges(self):
+        with self.lock:
+            callbacks = list(self.callbacks)
+            gauges = dict(self.gauges)
+        for fn in callbacks:
+            try:
+                for name, labels, value in fn():
+                    gauges[(name, label_key(labels))] = value
+            except Exception as e:
+                print(f"Telemetry callback failed: {e}")
+        return gauges
+
+    def snapshot(self):
+        gauges = self.sampled_gauges()
+        with self.lock:
+            return {
+                'type': 'snapshot',
+                'time': round(time.time(), 3),
+                'uptime_s': round(time.time() - self.started_at, 3),
+                'counters': {self.series(k): v for k, v in self.counters.items()},
+                'gauges': {self.series(k): v for k, v in gauges.items()},
+                'histograms': {self.series(k): h.summary() for k, h in self.histograms.items()},
+            }
+
+    @staticmethod
+    def series(key):
+        name, labels = key
+        return name + format_labels(labels)
+
+    def prometheus_text(self):
+        gauges = self.sampled_gauges()
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                declare(metric_name(name) + '_total', 'counter')
+                lines.append(f"{metric_name(name)}_total{format_labels(labels)} {value}")
+            for (name, labels), value in sorted(gauges.items()):
+                declare(metric_name(name), 'gauge')
+                lines.append(f"{metric_name(name)}{format_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                base = metric_name(name) + '_seconds'
+                declare(base, 'histogram')
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f"{base}_bucket{format_labels(labels, [('le', le)])} {cumulative}")
+                lines.append(f"{base}_sum{format_labels(labels)} {histogram.sum}")
+                lines.append(f"{base}_count{format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9464, host='127.0.0.1'):
+        telemetry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = telemetry.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"Metrics available at http://{host}:{self.server.server_port}/metrics")
+        return self.server
+
+    def flush_jsonl(self):
+        records = []
+        while self.spans:
+            records.append(self.spans.popleft())
+        records.append(self.snapshot())
+        with open(self.jsonl_path, 'a') as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+    def write_jsonl(self, interval):
+        while not self.stop_event.wait(interval):
+            self.flush_jsonl()
+
+    def close(self):
+        self.stop_event.set()
+        if self.jsonl_thread is not None:
+            self.jsonl_thread.join(timeout=2)
+            self.flush_jsonl()
+            self.jsonl_thread = None
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        self.enabled = False
+
+
+# One instance per process, shared by every lobe
+telemetry = Telemetry()
+
+
+# Usage example
+if __name__ == "__main__":
+    telemetry.configure(jsonl_path='telemetry_example.jsonl', jsonl_interval=1.0)
+    for i in range(20):
+        with telemetry.span('example.work', stage='demo'):
+            time.sleep(0.01 * (i % 4))
+        telemetry.count('example.items')
+    telemetry.register_callback(lambda: [('example.queue_depth', {'queue': 'demo'}, 3)])
+    print(telemetry.prometheus_text())
+    telemetry.close()
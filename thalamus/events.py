@@ -0,0 +1,116 @@
+# thalamus/events.py
+# Typed events and the asyncio event bus the Thalamus relays them over. Every subscriber gets its own
+# bounded queue: 'block' subscribers apply backpressure to the publisher when full, 'latest' subscribers
+# drop the oldest event instead (used for high-rate streams such as visual detections).
+
+import asyncio
+import time
+from collections import namedtuple
+
+# detections: {model name: Detections}; labels: class names present in the frame
+VisualDetection = namedtuple('VisualDetection', ['source', 'frame_id', 'timestamp', 'labels', 'detections'])
+# Someone the vision pipeline greets (e.g. petr) has just arrived
+Arrival = namedtuple('Arrival', ['identity', 'timestamp'])
+Transcript = namedtuple('Transcript', ['text', 'timestamp'])
+Response = namedtuple('Response', ['prompt', 'text', 'timestamp'])
+SpeechDone = namedtuple('SpeechDone', ['text', 'timestamp'])
+
+EVENT_TYPES = (VisualDetection, Arrival, Transcript, Response, SpeechDone)
+
+
+def now():
+    return time.time()
+
+
+class Subscription:
+    # One queue for one or more event types, so a consumer can await several kinds of events in order
+    def __init__(self, event_types, maxsize=16, policy='block'):
+        if policy not in ('block', 'latest'):
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.event_types = event_types
+        self.policy = policy
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    async def put(self, event):
+        if self.policy == 'latest':
+            while self.queue.full():
+                self.queue.get_nowait()
+                self.dropped += 1
+            self.queue.put_nowait(event)
+        else:
+            await self.queue.put(event)
+
+    async def get(self, timeout=None):
+        # None on timeout
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
+
+
+class EventBus:
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.subscriptions = {event_type: [] for event_type in EVENT_TYPES}
+        self.published = {event_type.__name__: 0 for event_type in EVENT_TYPES}
+
+    def bind(self, loop=None):
+        # Publishing from other threads needs the loop the subscribers are awaiting on
+        self.loop = loop or asyncio.get_running_loop()
+
+    def subscribe(self, event_types, maxsize=16, policy='block'):
+        # event_types: an event type or a tuple of them
+        if not isinstance(event_types, tuple):
+            event_types = (event_types,)
+        subscription = Subscription(event_types, maxsize=maxsize, policy=policy)
+        for event_type in event_types:
+            self.subscriptions[event_type].append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        for event_type in subscription.event_types:
+            if subscription in self.subscriptions[event_type]:
+                self.subscriptions[event_type].remove(subscription)
+
+    async def publish(self, event):
+        event_type = type(event)
+        if event_type not in self.subscriptions:
+            raise TypeError(f"Not an event type: {event_type.__name__}")
+        self.published[event_type.__name__] += 1
+        for subscription in list(self.subscriptions[event_type]):
+            await subscription.put(event)
+
+    def publish_threadsafe(self, event, wait=True, timeout=None):
+        # For producers running in worker threads (vision, speech). With wait=True the calling thread
+        # blocks while a 'block' subscriber is full, so backpressure reaches the producer too.
+        if self.loop is None or self.loop.is_closed():
+            return False
+        future = asyncio.run_coroutine_threadsafe(self.publish(event), self.loop)
+        if wait:
+            try:
+                future.result(timeout)
+            except Exception:
+                future.cancel()
+                return False
+        return True
+
+    def all_subscriptions(self):
+        unique = []
+        for subscriptions in self.subscriptions.values():
+            unique.extend(s for s in subscriptions if s not in unique)
+        return unique
+
+    def summary(self):
+        # Per subscription: queue depth / bound and events dropped by 'latest' queues
+        return ", ".join(
+            f"{'+'.join(t.__name__ for t in s.event_types)} {s.queue.qsize()}/{s.queue.maxsize}"
+            + (f" (dropped {s.dropped})" if s.dropped else "")
+            for s in self.all_subscriptions()
+        )
@@ -5,40 +5,147 @@
 
 # thalamus/thalamus.py
 
+import asyncio
+import functools
 import os
+import queue
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Add the project root directory to the Python path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_root)
 
-from cerebrum.occipital_lobe import OccipitalLobe
+# The vision stack (ultralytics, torch, OpenCV) is only imported when the Occipital Lobe is first needed
 from cerebrum.temporal_lobe import TemporalLobe
 from cerebrum.frontal_lobe import FrontalLobe
+from thalamus.events import EventBus, VisualDetection, Arrival, Transcript, Response, SpeechDone, now
+from telemetry.telemetry import telemetry
+from telemetry.startup import startup
+
+LOBES = ('visual', 'auditory', 'text', 'response')
 
 
 class Thalamus:
-    def __init__(self, use_voice=True):
+    def __init__(self, use_voice=True, queue_size=16, show_video=True, video_source=0, vision=True,
+                 frontal_lobe=None, temporal_lobe=None, text_only=False, episodic_log=None):
+        # frontal_lobe / temporal_lobe can be passed in preconfigured (e.g. with local stand-in backends);
+        # vision=False leaves out the Occipital Lobe and the visual lobe task. text_only=True reads typed
+        # input and prints replies: no vision, microphone or speech output, and none of their imports.
+        # episodic_log (memory/visual_log.VisualEpisodicLog) records every detection the visual lobe makes.
         self.visual_input = None
         self.auditory_input = None
         self.sensory_input = None
-        self.frontal_lobe = FrontalLobe(sensory_data={})
+        self.text_only = text_only
+        if text_only:
+            vision = False
+            use_voice = False
+        with startup.measure('FrontalLobe'):
+            self.owns_frontal_lobe = frontal_lobe is None
+            self.frontal_lobe = frontal_lobe or FrontalLobe(sensory_data={})
 
         # Correct paths for OccipitalLobe
         custom_model_path = os.path.join(project_root, 'cerebrum', 'runs', 'detect', 'custom_petr_model', 'weights',
                                          'best.pt')
         data_yaml_path = os.path.join(project_root, 'cerebrum', 'yolo_dataset', 'data.yaml')
+        self.custom_model_path = custom_model_path
+
+        self.data_yaml_path = data_yaml_path
+
+        # Built on first use (or by warm_up()), which is also when the vision stack is imported
+        self.vision = vision
+        self.episodic_log = episodic_log
+        self.occipital_backend = None
+        self.occipital_lock = threading.Lock()
+        with startup.measure('TemporalLobe'):
+            self.temporal_lobe = temporal_lobe or TemporalLobe(frontal_lobe=self.frontal_lobe, use_voice=use_voice)
+        self.console_lines = None
+
+        # Event relay: lobes run as asyncio tasks and talk through bounded queues on the bus. Blocking
+        # work (vision, recognition, LLM + speech) runs on a dedicated executor, never on the event loop.
+        self.bus = EventBus()
+        self.queue_size = queue_size
+        # The video window is drawn from an executor thread; OpenCV on macOS needs show_video=False
+        self.show_video = show_video
+        self.video_source = video_source
+        self.executor = None
+        self.tasks = {}
+        self.stop_events = {name: threading.Event() for name in LOBES}
+        self.shutdown_event = None
+
+    def load_occipital_lobe(self):
+        if not self.vision:
+            raise RuntimeError("Vision is disabled for this Thalamus")
+        with self.occipital_lock:
+            if self.occipital_backend is None:
+                module = startup.timed_import('cerebrum.occipital_lobe')
+                with startup.measure('OccipitalLobe'):
+                    self.occipital_backend = module.OccipitalLobe(custom_model_path=self.custom_model_path,
+                                                                  data_yaml_path=self.data_yaml_path,
+                                                                  episodic_log=self.episodic_log,
+                                                                  frontal_lobe=self.frontal_lobe)
+            return self.occipital_backend
+
+    @property
+    def occipital_lobe(self):
+        return self.load_occipital_lobe() if self.vision else None
+
+    def warm_up(self, report=True):
+        # Initializes independent components in parallel in the background: LLM client, TTS client and
+        # audio output, speech recognizer, vision models. Anything used before it is ready simply waits
+        # for (or performs) its own initialization. Returns {component: future}.
+        steps = {'llm client': lambda: self.frontal_lobe.warm_up(speech=False)}
+        if self.temporal_lobe.use_voice:
+            steps['tts client'] = self.frontal_lobe.load_tts
+            steps['audio output'] = self.frontal_lobe.load_audio_output
+        if not self.text_only:
+            steps['speech recognizer'] = self.temporal_lobe.load_recognizer
+        if self.vision:
+            steps['vision models'] = lambda: self.load_occipital_lobe().warm_up()
 
-        self.occipital_lobe = OccipitalLobe(custom_model_path=custom_model_path, data_yaml_path=data_yaml_path)
-        self.temporal_lobe = TemporalLobe(frontal_lobe=self.frontal_lobe, use_voice=use_voice)
+        def measured(name, step):
+            with startup.measure(name):
+                step()
+
+        pool = ThreadPoolExecutor(max_workers=len(steps), thread_name_prefix='warm-up')
+        futures = {name: pool.submit(measured, name, step) for name, step in steps.items()}
+        pool.shutdown(wait=False)
+
+        def finish():
+            for name, future in futures.items():
+                if future.exception() is not None:
+                    print(f"Warm-up of {name} failed: {future.exception()!r}")
+            if report:
+                print(startup.report())
+
+        threading.Thread(target=finish, daemon=True).start()
+        return futures
 
     def relay_visual_input(self):
         print("Relaying visual input to Occipital Lobe...")
         self.occipital_lobe.process_visual_input()
 
+    def relay_multi_camera_input(self, sources, inference_workers=2, handler=None):
+        # Several cameras / streams at once: decoding and inference run in worker processes and the
+        # merged per-source detections are relayed here. visual_input keeps the latest detections per source.
+        print(f"Relaying visual input from {len(sources)} sources...")
+        from cerebrum.multi_camera import MultiCameraIngest, ModelConfig
+        model_configs = [ModelConfig('pretrained', 'yolov8n.pt', 0.25)]
+        if os.path.exists(self.custom_model_path):
+            model_configs.insert(0, ModelConfig('custom', self.custom_model_path, 0.1))
+
+        self.visual_input = {}
+        with MultiCameraIngest(sources, model_configs, inference_workers=inference_workers) as ingest:
+            for result in ingest.detections():
+                self.visual_input[result.source] = result
+                if handler:
+                    handler(result)
+
     def relay_auditory_input(self):
         print("Relaying auditory input to Temporal Lobe...")
-        self.auditory_input = self.temporal_lobe.process_speech_input()
+        with telemetry.span('thalamus.relay_auditory'):
+            self.auditory_input = self.temporal_lobe.process_speech_input()
         return self.auditory_input
 
     def relay_sensory_input(self, data):
@@ -48,30 +155,232 @@ class Thalamus:
 
     def perform_speech(self, text):
         print("Performing speech...")
-        self.frontal_lobe.speak(text)
+        with telemetry.span('thalamus.perform_speech'):
+            self.frontal_lobe.speak(text)
 
     def generate_and_speak_response(self, prompt):
         print("Generating and performing response...")
-        response = self.frontal_lobe.generate_response(prompt)
+        # Tokens are spoken sentence by sentence as they stream in
+        with telemetry.span('thalamus.response', trigger='direct'):
+            response = self.frontal_lobe.generate_and_speak(prompt, speak=self.temporal_lobe.use_voice)
         print("Generated response:", response)
-        if self.temporal_lobe.use_voice:
-            self.frontal_lobe.speak(response)
-        else:
+        if not self.temporal_lobe.use_voice:
             print("Response:", response)
 
-    def process_auditory_and_generate_response(self):
-        while True:
-            # Relay auditory input
-            print("Processing auditory input...")
-            auditory_data = self.relay_auditory_input()
-            print("Auditory data received:", auditory_data)
+    async def run(self, lobes=None):
+        # Runs the given lobes concurrently until request_shutdown() is called (or every lobe has ended),
+        # then stops them all. Ctrl+C cancels run() and goes through the same clean shutdown.
+        self.bus.bind()
+        self.shutdown_event = asyncio.Event()
+        telemetry.register_callback(self.telemetry_gauges)
+        if lobes is None:
+            if self.text_only:
+                lobes = ['text', 'response']
+            else:
+                lobes = [name for name in LOBES if name != 'text' and (name != 'visual' or self.vision)]
+        for name in lobes:
+            self.start_lobe(name)
+
+        shutdown_wait = asyncio.ensure_future(self.shutdown_event.wait())
+        try:
+            while self.tasks and not self.shutdown_event.is_set():
+                await asyncio.wait(list(self.tasks.values()) + [shutdown_wait], return_when=asyncio.FIRST_COMPLETED)
+                for name, task in list(self.tasks.items()):
+                    if task.done():
+                        self.tasks.pop(name)
+                        if not task.cancelled() and task.exception() is not None:
+                            print(f"{name} lobe failed: {task.exception()!r}")
+                        else:
+                            print(f"{name} lobe finished")
+        finally:
+            shutdown_wait.cancel()
+            await self.stop()
+            telemetry.unregister_callback(self.telemetry_gauges)
+
+    def telemetry_gauges(self):
+        gauges = [('thalamus.lobe_running', {'lobe': name}, int(name in self.tasks)) for name in LOBES]
+        for subscription in self.bus.all_subscriptions():
+            queue_name = '+'.join(t.__name__ for t in subscription.event_types)
+            gauges.append(('thalamus.queue_depth', {'queue': queue_name}, subscription.queue.qsize()))
+            gauges.append(('thalamus.queue_dropped', {'queue': queue_name}, subscription.dropped))
+        for event_type, count in self.bus.published.items():
+            gauges.append(('thalamus.events_published', {'event': event_type}, count))
+        return gauges
+
+    def request_shutdown(self):
+        # Safe to call from any thread
+        if self.shutdown_event is not None and self.bus.loop is not None:
+            self.bus.loop.call_soon_threadsafe(self.shutdown_event.set)
+
+    def start_lobe(self, name):
+        if name not in LOBES:
+            raise ValueError(f"Unknown lobe: {name}")
+        if name == 'visual' and not self.vision:
+            raise RuntimeError("Vision is disabled for this Thalamus")
+        task = self.tasks.get(name)
+        if task is not None and not task.done():
+            return task
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=len(LOBES) + 2, thread_name_prefix='thalamus')
+        # A fresh flag per start, so a restarted lobe never revives a previous run that is still winding down
+        self.stop_events[name] = threading.Event()
+        self.tasks[name] = asyncio.get_running_loop().create_task(getattr(self, f"{name}_lobe")(), name=name)
+        return self.tasks[name]
+
+    async def stop_lobe(self, name, timeout=5.0):
+        # The stop flag lets the lobe (and its work in the executor) wind down; the task is only
+        # cancelled if it has not finished within timeout
+        self.stop_events[name].set()
+        if name == 'response':
+            self.frontal_lobe.stop_speaking()
+        task = self.tasks.pop(name, None)
+        if task is None:
+            return
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+        if not done:
+            print(f"{name} lobe did not stop in {timeout:.0f}s, cancelling")
+            task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"{name} lobe failed: {e!r}")
+
+    async def stop(self):
+        for name in reversed(LOBES):
+            await self.stop_lobe(name)
+        if self.executor is not None:
+            # Waits for the executor threads, which exit promptly once their stop flags are set
+            await asyncio.get_running_loop().run_in_executor(None, functools.partial(self.executor.shutdown, wait=True))
+            self.executor = None
+        print(f"Thalamus stopped. Events published: {self.bus.published}")
+
+    def close(self):
+        # Releases the lobes this thalamus created; a frontal lobe passed in belongs to the caller
+        with self.occipital_lock:
+            if self.occipital_backend is not None:
+                self.occipital_backend.close()
+        if self.owns_frontal_lobe:
+            self.frontal_lobe.close()
+
+    async def visual_lobe(self):
+        loop = asyncio.get_running_loop()
+        stop_event = self.stop_events['visual']
+
+        # Called from the vision threads: detections use 'latest' queues and never wait on subscribers
+        def on_detections(frame, detections):
+            labels = set()
+            for model_detections in detections.values():
+                labels |= model_detections.class_names()
+            self.visual_input = VisualDetection(frame.source or self.video_source, frame.frame_id, now(),
+                                                sorted(labels), detections)
+            self.bus.publish_threadsafe(self.visual_input, wait=False)
+
+        def on_arrival(identity):
+            self.bus.publish_threadsafe(Arrival(identity, now()), wait=False)
+
+        print("Relaying visual input to Occipital Lobe...")
+        # Importing the vision stack and building the lobe can take seconds, so it happens off the loop
+        occipital_lobe = await loop.run_in_executor(self.executor, self.load_occipital_lobe)
+        await loop.run_in_executor(self.executor, functools.partial(
+            occipital_lobe.process_visual_input, source=self.video_source, headless=not self.show_video,
+            on_detections=on_detections, on_arrival=on_arrival, stop_event=stop_event
+        ))
+
+    async def auditory_lobe(self):
+        loop = asyncio.get_running_loop()
+        stop_event = self.stop_events['auditory']
+        print("Relaying auditory input to Temporal Lobe...")
+        pipeline = await loop.run_in_executor(self.executor, self.temporal_lobe.start_listening)
+        try:
+            while not stop_event.is_set():
+                # Short timeout so a stop request is noticed between utterances
+                transcript = await loop.run_in_executor(self.executor, pipeline.next_transcript, 0.5)
+                if not transcript or not transcript.strip():
+                    continue
+                self.auditory_input = transcript.strip()
+                print("Auditory data received:", self.auditory_input)
+                telemetry.count('thalamus.transcripts')
+                # Waits here while the response queue is full (backpressure)
+                await self.bus.publish(Transcript(self.auditory_input, now()))
+        finally:
+            await loop.run_in_executor(self.executor, self.temporal_lobe.stop_listening)
+
+    async def text_lobe(self):
+        # Typed input instead of the microphone. stdin is read on a daemon thread, since a blocked
+        # readline cannot be interrupted; end of input (Ctrl+D) shuts the Thalamus down.
+        loop = asyncio.get_running_loop()
+        stop_event = self.stop_events['text']
+        if self.console_lines is None:
+            self.console_lines = queue.Queue()
+            threading.Thread(target=self.read_console, daemon=True).start()
+        print("Type a message (Ctrl+D to quit):")
+        while not stop_event.is_set():
+            line = await loop.run_in_executor(self.executor, self.next_console_line, 0.5)
+            if line is None:
+                self.request_shutdown()
+                break
+            if not line.strip():
+                continue
+            self.auditory_input = line.strip()
+            telemetry.count('thalamus.transcripts')
+            await self.bus.publish(Transcript(self.auditory_input, now()))
+
+    def read_console(self):
+        for line in sys.stdin:
+            self.console_lines.put(line)
+        self.console_lines.put(None)
+
+    def next_console_line(self, timeout):
+        # '' on timeout, None at end of input
+        try:
+            return self.console_lines.get(timeout=timeout)
+        except queue.Empty:
+            return ''
+
+    async def response_lobe(self):
+        # Answers transcripts and greets arrivals one at a time, so replies never talk over each other
+        loop = asyncio.get_running_loop()
+        stop_event = self.stop_events['response']
+        events = self.bus.subscribe((Transcript, Arrival), maxsize=self.queue_size)
+        try:
+            while not stop_event.is_set():
+                event = await events.get(timeout=0.5)
+                if event is None:
+                    continue
+                if isinstance(event, Arrival):
+                    print(f"{event.identity} detected")
+                    prompt = f"Generate a short greeting for {event.identity} who just appeared."
+                else:
+                    prompt = event.text
+                speak = self.temporal_lobe.use_voice
+                trigger = 'arrival' if isinstance(event, Arrival) else 'transcript'
+                # Time from the event being published to the reply starting
+                telemetry.observe('thalamus.response_queue_wait', now() - event.timestamp, trigger=trigger)
+                with telemetry.span('thalamus.response', trigger=trigger):
+                    # Greetings are one-off and cacheable, so they neither read nor join the conversation
+                    response = await loop.run_in_executor(self.executor, functools.partial(
+                        self.frontal_lobe.generate_and_speak, prompt, speak=speak,
+                        with_history=trigger == 'transcript'
+                    ))
+                print("Generated response:", response)
+                await self.bus.publish(Response(prompt, response, now()))
+                if speak:
+                    await self.bus.publish(SpeechDone(response, now()))
+        finally:
+            self.bus.unsubscribe(events)
 
-            # Generate response based on the auditory input
-            self.generate_and_speak_response(auditory_data)
+    def report(self):
+        print(f"Running lobes: {sorted(self.tasks)}")
+        print(f"Event queues: {self.bus.summary()}")
 
 
 if __name__ == "__main__":
     thalamus = Thalamus(use_voice=True)
-    thalamus.relay_visual_input()
     thalamus.perform_speech("System activated. Ready to tackle today's tasks?")
-    thalamus.process_auditory_and_generate_response()
+    try:
+        asyncio.run(thalamus.run())
+    except KeyboardInterrupt:
+        pass
+    thalamus.close()